@@ -1,47 +1,17 @@
 """
-Simple test Vercel serverless function for symptom checker backend
+Vercel serverless function for the symptom checker backend.
+
+Serves the app from backend/main.py. Importing it only costs FastAPI: the
+workflow is built on the first request, and the Gemini SDK, LangGraph graph
+and Supabase SDK load when a request first needs them (or on GET /warmup).
 """
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
 import os
+import sys
 
-print("=== SIMPLE TEST BACKEND ===")
-print(f"Python version: {__import__('sys').version}")
-print(f"Working directory: {os.getcwd()}")
-print(f"GOOGLE_API_KEY present: {bool(os.getenv('GOOGLE_API_KEY'))}")
-
-# Create FastAPI app
-app = FastAPI(title="Symptom Checker Backend")
-
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-class ChatRequest(BaseModel):
-    message: str
-    session_id: str = "default"
-
-class ChatResponse(BaseModel):
-    response: str
-    risk_level: str | None = None
-    disclaimer: bool = True
-
-@app.get("/health")
-async def health():
-    return {"status": "healthy", "message": "Simple test backend is working!"}
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
 
-@app.post("/chat")
-async def chat(request: ChatRequest):
-    return ChatResponse(
-        response="Thank you for your message. This is a test response from the simplified backend.",
-        risk_level="low",
-        disclaimer=True
-    )
+from main import app  # noqa: E402,F401
+from telemetry import log_event  # noqa: E402
 
-print("✅ Simple test backend created successfully")
\ No newline at end of file
+log_event("api.startup", google_api_key_present=bool(os.getenv("GOOGLE_API_KEY")))
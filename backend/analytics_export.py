@@ -0,0 +1,443 @@
+"""
+Export interactions incrementally to date/category partitioned Parquet or
+Arrow files for analytics, so reporting queries run on the files instead of
+the live Supabase table.
+
+Each run copies only rows added since the last checkpoint (by id for
+Supabase, re-checking the last ANALYTICS_EXPORT_OVERLAP_IDS ids for late
+commits; by byte offset for JSONL files such as the write-behind journal).
+--follow keeps polling. --report prints the risk distribution by category
+and duration bucket from the exported files. Parquet/Arrow need the optional
+pyarrow package; --format jsonl works without it.
+
+Usage:
+    python analytics_export.py --supabase
+    python analytics_export.py --jsonl data/interactions_journal.jsonl --follow 60
+    python analytics_export.py --report --from 2026-01-01
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from risk_model import duration_bucket, duration_days
+
+load_dotenv()
+
+DEFAULT_EXPORT_DIR = os.path.join(os.path.dirname(__file__), "data", "analytics")
+SOURCE_COLUMNS = "id,session_id,category,age,symptoms,duration,risk_level,created_at"
+PARTITION_KEYS = ("date", "category")
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow", "jsonl": ".jsonl"}
+RISK_LEVELS = ("low", "moderate", "high")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            "Parquet/Arrow export needs the optional pyarrow package (pip install pyarrow); "
+            "use format jsonl without it"
+        ) from e
+    return pyarrow
+
+
+def _schema():
+    pa = _require_pyarrow()
+    # Partition keys live in the directory names, not in the files
+    return pa.schema([
+        ("session_id", pa.string()),
+        ("age", pa.int16()),
+        ("symptoms", pa.list_(pa.string())),
+        ("duration", pa.string()),
+        ("duration_days", pa.float32()),
+        ("duration_bucket", pa.string()),
+        ("risk_level", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+    ])
+
+
+def _parse_timestamp(value) -> datetime | None:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    # build_row writes timezone-aware UTC; rows journaled before that are naive UTC
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def normalize_row(row: dict) -> dict:
+    """An interactions row in export shape: typed age and timestamp, precomputed duration bucket."""
+    created_at = _parse_timestamp(row.get("created_at"))
+    age = row.get("age")
+    days = duration_days(row.get("duration"))
+    return {
+        "date": created_at.date().isoformat() if created_at else "unknown",
+        "category": row.get("category") or "unknown",
+        "session_id": row.get("session_id"),
+        "age": int(age) if age is not None and str(age).isdigit() and int(age) < 150 else None,
+        "symptoms": list(row.get("symptoms") or []),
+        "duration": row.get("duration"),
+        "duration_days": days,
+        "duration_bucket": duration_bucket(days),
+        "risk_level": row.get("risk_level"),
+        "created_at": created_at,
+    }
+
+
+class SupabaseSource:
+    """Tails the interactions table by primary key, one indexed page at a time.
+
+    Each page is a range read on id, so the export never scans the table or
+    holds a long transaction next to live inserts. Ids are handed out when an
+    insert starts, not when it commits, so a row can appear below ids already
+    exported: every pass re-reads the last `overlap` ids and exports only the
+    ones it has not seen. File tags come from a batch counter in the cursor,
+    never from row ids, so a batch of late rows cannot overwrite an earlier
+    file.
+    """
+
+    name = "supabase"
+
+    def __init__(self, client, page_size: int = 5000, overlap: int | None = None):
+        self.client = client
+        self.page_size = page_size
+        self.overlap = overlap if overlap is not None else int(os.getenv("ANALYTICS_EXPORT_OVERLAP_IDS", 1000))
+
+    def batches(self, cursor: dict | None, batch_rows: int):
+        cursor = cursor or {}
+        last_id = cursor.get("last_id", 0)
+        # Ids exported within the overlap window, so re-reading it adds no duplicates
+        seen = set(cursor.get("recent", []))
+        batch = cursor.get("batch", 0)
+        after = max(0, last_id - self.overlap)
+        limit = min(batch_rows, self.page_size)
+        while True:
+            page = (
+                self.client.table("interactions").select(SOURCE_COLUMNS)
+                .gt("id", after).order("id").limit(limit).execute().data
+            )
+            if not page:
+                return
+            after = page[-1]["id"]
+            rows = [row for row in page if row["id"] not in seen]
+            if rows:
+                last_id = max(last_id, rows[-1]["id"])
+                seen.update(row["id"] for row in rows)
+                seen = {row_id for row_id in seen if row_id > last_id - self.overlap}
+                yield rows, {"last_id": last_id, "recent": sorted(seen), "batch": batch + 1}, f"sb-b{batch:012d}"
+                batch += 1
+            if len(page) < limit:
+                return
+
+
+class JsonlSource:
+    """Tails a JSONL file of interactions rows by byte offset.
+
+    Meant for the write-behind journal or exported dumps. Only complete lines
+    are consumed, so a row being appended is picked up on the next pass. If
+    the file is replaced or truncated (the journal is removed once replayed),
+    reading restarts from the top of the new file under the next generation
+    number. A replacement is recognised by inode, by size, or by a changed
+    first line, since a recreated file can get the old inode back. File tags
+    include the generation, so a new file never overwrites an earlier one's
+    parts. Rows replayed from the journal also reach Supabase, so export one
+    of the two, not both.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self.name = f"jsonl:{self.path}"
+
+    def batches(self, cursor: dict | None, batch_rows: int):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        cursor = cursor or {}
+        offset = cursor.get("offset", 0)
+        generation = cursor.get("generation", 0)
+        file_id = hashlib.sha1(self.path.encode()).hexdigest()[:8]
+        head = None
+        with open(self.path, "rb") as f:
+            if offset:
+                head = self._line_hash(f.readline())
+                if cursor.get("inode") != stat.st_ino or stat.st_size < offset or cursor.get("head") != head:
+                    offset, head = 0, None
+                    generation += 1
+            f.seek(offset)
+            while True:
+                start, rows = offset, []
+                while len(rows) < batch_rows:
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        break
+                    if offset == 0:
+                        head = self._line_hash(line)
+                    offset += len(line)
+                    if line.strip():
+                        rows.append(json.loads(line))
+                if offset == start:
+                    return
+                yield (
+                    rows,
+                    {"inode": stat.st_ino, "head": head, "generation": generation, "offset": offset},
+                    f"jl-{file_id}-g{generation:06d}-{start:012d}",
+                )
+                if len(rows) < batch_rows:
+                    return
+
+    @staticmethod
+    def _line_hash(line: bytes) -> str | None:
+        return hashlib.sha1(line).hexdigest()[:16] if line.endswith(b"\n") else None
+
+
+class PartitionWriter:
+    """Writes rows as date=/category= partitioned files in one format.
+
+    Each batch writes one file per partition, named after the source position
+    it starts at, via a temp file and rename: re-running an export after a
+    crash overwrites the same files instead of duplicating rows.
+    """
+
+    def __init__(self, root: str, fmt: str = "parquet"):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        if fmt != "jsonl":
+            _require_pyarrow()
+        self.root = root
+        self.format = fmt
+
+    def partition_dir(self, date: str, category: str) -> str:
+        return os.path.join(self.root, f"date={date}", f"category={category}")
+
+    def write(self, rows: list[dict], tag: str) -> int:
+        partitions = defaultdict(list)
+        for row in rows:
+            partitions[(row.pop("date"), row.pop("category"))].append(row)
+        for (date, category), part in partitions.items():
+            directory = self.partition_dir(date, category)
+            os.makedirs(directory, exist_ok=True)
+            name = f"part-{tag}{FORMATS[self.format]}"
+            # Dot-prefixed so dataset readers skip a temp file left by a crash
+            temp = os.path.join(directory, f".{name}.tmp")
+            self._write_file(temp, part)
+            os.replace(temp, os.path.join(directory, name))
+        return len(partitions)
+
+    def _write_file(self, path: str, rows: list[dict]):
+        if self.format == "jsonl":
+            with open(path, "w", encoding="utf-8") as f:
+                for row in rows:
+                    created_at = row["created_at"]
+                    row["created_at"] = created_at.isoformat() if created_at else None
+                    f.write(json.dumps(row, separators=(",", ":")) + "\n")
+            return
+        pa = _require_pyarrow()
+        table = pa.Table.from_pylist(rows, schema=_schema())
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+
+            pq.write_table(table, path, compression="zstd")
+        else:
+            import pyarrow.feather as feather
+
+            feather.write_feather(table, path, compression="lz4")
+
+
+class Checkpoint:
+    """Per-source cursors in a small JSON file, replaced atomically."""
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.cursors = json.load(f)
+        except FileNotFoundError:
+            self.cursors = {}
+
+    def get(self, source: str) -> dict | None:
+        return self.cursors.get(source)
+
+    def set(self, source: str, cursor: dict):
+        self.cursors[source] = cursor
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.cursors, f)
+        os.replace(self.path + ".tmp", self.path)
+
+
+class AnalyticsExporter:
+    """Incrementally copies new interactions rows from sources into partitioned files.
+
+    Runs outside the API process (`python analytics_export.py`). Each batch of at
+    most batch_rows is normalized, written, and only then checkpointed, so
+    memory stays bounded by the batch size and an interrupted run resumes
+    from the last completed batch.
+    """
+
+    def __init__(self, sources: list, writer: PartitionWriter, checkpoint: Checkpoint, batch_rows: int | None = None):
+        self.sources = sources
+        self.writer = writer
+        self.checkpoint = checkpoint
+        self.batch_rows = batch_rows or int(os.getenv("ANALYTICS_EXPORT_BATCH_ROWS", 50000))
+        self.metrics = {"rows": 0, "batches": 0, "files": 0, "seconds": 0.0}
+
+    def run_once(self) -> dict:
+        start = time.perf_counter()
+        exported = {}
+        for source in self.sources:
+            count = 0
+            for rows, cursor, tag in source.batches(self.checkpoint.get(source.name), self.batch_rows):
+                self.metrics["files"] += self.writer.write([normalize_row(row) for row in rows], tag)
+                self.checkpoint.set(source.name, cursor)
+                self.metrics["batches"] += 1
+                count += len(rows)
+            exported[source.name] = count
+            self.metrics["rows"] += count
+        self.metrics["seconds"] += time.perf_counter() - start
+        return exported
+
+    def follow(self, interval: float):
+        while True:
+            exported = self.run_once()
+            if any(exported.values()):
+                print(f"exported {exported}")
+            time.sleep(interval)
+
+
+def _partition_values(path: str) -> dict:
+    values = {}
+    for part in path.split(os.sep):
+        key, sep, value = part.partition("=")
+        if sep and key in PARTITION_KEYS:
+            values[key] = value
+    return values
+
+
+def _in_range(date: str, date_from: str | None, date_to: str | None) -> bool:
+    return (date_from is None or date >= date_from) and (date_to is None or date <= date_to)
+
+
+def risk_distribution(
+    root: str,
+    fmt: str = "parquet",
+    by: tuple = ("category", "duration_bucket"),
+    date_from: str | None = None,
+    date_to: str | None = None,
+    batch_size: int = 65536,
+) -> dict:
+    """Risk level counts per group over an exported dataset.
+
+    Scans record batches (Arrow formats) or lines (jsonl) and folds each into
+    running counts, so memory depends on the number of groups, not rows.
+    Partitions outside date_from/date_to (ISO dates) are skipped unread.
+    Returns {group tuple: {"low": n, "moderate": n, "high": n, "total": n}}.
+    """
+    counts = Counter()
+    if fmt == "jsonl":
+        for directory, _, files in os.walk(root):
+            partition = _partition_values(directory)
+            if "date" in partition and not _in_range(partition["date"], date_from, date_to):
+                continue
+            for name in files:
+                if not name.endswith(".jsonl"):
+                    continue
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    for line in f:
+                        row = {**json.loads(line), **partition}
+                        counts[(*(row.get(key) for key in by), row.get("risk_level"))] += 1
+    else:
+        pa = _require_pyarrow()
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        partitioning = ds.partitioning(pa.schema([("date", pa.string()), ("category", pa.string())]), flavor="hive")
+        dataset = ds.dataset(root, format="parquet" if fmt == "parquet" else "ipc", partitioning=partitioning)
+        condition = None
+        if date_from:
+            condition = ds.field("date") >= date_from
+        if date_to:
+            upper = ds.field("date") <= date_to
+            condition = upper if condition is None else condition & upper
+        keys = [*by, "risk_level"]
+        for batch in dataset.to_batches(columns=keys, filter=condition, batch_size=batch_size):
+            if batch.num_rows == 0:
+                continue
+            grouped = pa.Table.from_batches([batch]).group_by(keys).aggregate(
+                [("risk_level", "count", pc.CountOptions(mode="all"))]
+            )
+            columns = [grouped.column(key).to_pylist() for key in keys]
+            for values, count in zip(zip(*columns), grouped.column("risk_level_count").to_pylist()):
+                counts[values] += count
+
+    distribution = {}
+    for (*group, risk), count in counts.items():
+        entry = distribution.setdefault(tuple(group), {**dict.fromkeys(RISK_LEVELS, 0), "total": 0})
+        if risk in entry:
+            entry[risk] += count
+        entry["total"] += count
+    return distribution
+
+
+
+def print_report(distribution: dict, by: tuple):
+    header = " / ".join(by)
+    print(f"{header:<44} {'low':>9} {'moderate':>9} {'high':>9} {'total':>10}")
+    for group, counts in sorted(distribution.items(), key=lambda item: tuple(str(v) for v in item[0])):
+        label = " / ".join(str(value) for value in group)
+        total = counts["total"] or 1
+        print(f"{label:<44} " + " ".join(f"{counts[r] / total:>9.1%}" for r in ("low", "moderate", "high"))
+              + f" {counts['total']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--supabase", action="store_true", help="tail the interactions table")
+    parser.add_argument("--jsonl", action="append", default=[], help="tail a JSONL file of interactions rows (repeatable)")
+    parser.add_argument("--output", default=os.getenv("ANALYTICS_EXPORT_DIR") or DEFAULT_EXPORT_DIR)
+    parser.add_argument("--format", choices=list(FORMATS), default=os.getenv("ANALYTICS_EXPORT_FORMAT") or "parquet")
+    parser.add_argument("--batch-rows", type=int)
+    parser.add_argument("--follow", type=float, metavar="SECONDS", help="keep exporting at this interval")
+    parser.add_argument("--report", action="store_true", help="print the risk distribution of the exported files")
+    parser.add_argument("--from", dest="date_from", help="report: first date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="report: last date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    if args.report:
+        by = ("category", "duration_bucket")
+        print_report(risk_distribution(args.output, args.format, by, args.date_from, args.date_to), by)
+        return
+
+    sources = [JsonlSource(path) for path in args.jsonl]
+    if args.supabase:
+        from supabase_client import SupabaseClient
+
+        client = SupabaseClient().connect()
+        if client is None:
+            raise SystemExit("SUPABASE_URL / SUPABASE_KEY are not set")
+        sources.append(SupabaseSource(client))
+    if not sources:
+        raise SystemExit("Nothing to export: pass --supabase and/or --jsonl")
+
+    try:
+        writer = PartitionWriter(args.output, args.format)
+    except ImportError as e:
+        raise SystemExit(str(e))
+    exporter = AnalyticsExporter(
+        sources, writer, Checkpoint(os.path.join(args.output, "_checkpoint.json")), args.batch_rows
+    )
+    if args.follow:
+        exporter.follow(args.follow)
+    exported = exporter.run_once()
+    print(f"✅ Exported {exporter.metrics['rows']} rows into {exporter.metrics['files']} files "
+          f"in {exporter.metrics['seconds']:.1f}s: {exported}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Offline bulk triage: run an NDJSON file of {"session_id", "message", "id"?}
+lines through the workflow and append NDJSON results to an output file.
+
+Lines run with bounded concurrency (lines of one session stay in order) and
+each result is written as soon as it finishes. Re-running with the same
+--output resumes: lines whose id already has an "ok" result are skipped, so
+turns that changed session state are not replayed. Interactions are written
+to Supabase in bulk inserts of --storage-batch-size rows, and webhooks are
+grouped into array POSTs when --webhook-batch-size is above 1 (only if the
+receiver accepts arrays).
+
+Usage:
+    python batch_triage.py intake.ndjson --output results.ndjson --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from dotenv import load_dotenv
+from llm_gateway import is_overload_error
+from resilience import deadline_after, request_timeout
+from session_store import MAX_SESSION_ID_LENGTH
+from telemetry import log_event, tracer
+
+load_dotenv()
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+async def read_ndjson_body(chunks, max_bytes: int) -> list[str]:
+    # Starlette's StreamingResponse listens for disconnects on the same receive
+    # channel, so an HTTP body has to be read in full before results stream out
+    body = bytearray()
+    async for chunk in chunks:
+        body += chunk
+        if len(body) > max_bytes:
+            raise BatchTooLarge(f"batch body exceeds {max_bytes} bytes")
+    return body.decode("utf-8").splitlines()
+
+
+async def iter_lines(lines):
+    for line in lines:
+        yield line
+
+
+def parse_item(index: int, line: str) -> dict:
+    item = json.loads(line)
+    if not isinstance(item, dict) or not isinstance(item.get("message"), str) or not item["message"].strip():
+        raise ValueError("each line needs a non-empty string message")
+    session_id = str(item.get("session_id") or f"batch-{index}")
+    if len(session_id) > MAX_SESSION_ID_LENGTH:
+        raise ValueError(f"session_id longer than {MAX_SESSION_ID_LENGTH} characters")
+    return {
+        "id": str(item.get("id", index)),
+        "session_id": session_id,
+        "message": item["message"],
+    }
+
+
+class BatchRunner:
+    """Runs NDJSON (session_id, message) lines through the workflow.
+
+    Up to `concurrency` turns run at once and results are yielded as they
+    finish, not in input order; every result carries the line's id (the
+    "id" field, or its 0-based index). Lines that cannot be parsed, or are
+    past max_items, get an error result with a null id and their index in
+    "line". Lines for the same session run one at
+    a time in input order on the same worker. Lines are pulled from the
+    async iterable only as fast as workers free up. Provider
+    throttling is retried with backoff. Ids in `skip` are not run, which is
+    how a failed batch resumes without replaying turns that already changed
+    session state.
+    """
+
+    def __init__(self, workflow, concurrency: int | None = None, max_items: int | None = None,
+                 max_retries: int | None = None, metrics: dict | None = None):
+        self.workflow = workflow
+        self.concurrency = concurrency or int(os.getenv("CHAT_BATCH_CONCURRENCY", 16))
+        self.max_items = max_items or int(os.getenv("CHAT_BATCH_MAX_ITEMS", 10000))
+        self.max_bytes = int(os.getenv("CHAT_BATCH_MAX_BYTES", 8 * 1024 * 1024))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("CHAT_BATCH_MAX_RETRIES", 2))
+        self.metrics = metrics if metrics is not None else {}
+        for key in ("batches", "items", "ok", "errors", "skipped", "retries", "seconds"):
+            self.metrics.setdefault(key, 0)
+
+    async def _triage(self, item: dict) -> dict:
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Each line gets the deadline a /chat request would
+                with deadline_after(request_timeout()):
+                    result = await self.workflow.process_message(item["message"], item["session_id"])
+                return {"id": item["id"], "session_id": item["session_id"], "status": "ok",
+                        "response": result["response"], "risk_level": result.get("risk_level")}
+            except Exception as e:
+                if not is_overload_error(e) or attempt == self.max_retries:
+                    log_event("chat_batch.error", error=str(e), session_id=item["session_id"])
+                    return {"id": item["id"], "session_id": item["session_id"], "status": "error", "error": str(e)}
+                self.metrics["retries"] += 1
+                await asyncio.sleep(2 ** attempt)
+
+    async def run(self, lines, skip=frozenset()):
+        """Yield one result dict per input line, then {"summary": {...}}."""
+        start = time.perf_counter()
+        counts = {"items": 0, "ok": 0, "errors": 0, "skipped": 0}
+        ready: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        # Sessions with a line queued or running -> their later lines, in order
+        backlog: dict[str, deque] = {}
+
+        async def produce():
+            index = 0
+            async for line in lines:
+                if not line.strip():
+                    continue
+                if index >= self.max_items:
+                    await results.put({"id": None, "line": index, "status": "error",
+                                       "error": f"batch limit of {self.max_items} lines exceeded"})
+                    break
+                try:
+                    item = parse_item(index, line)
+                except ValueError as e:
+                    # No id of its own, so one from another line cannot be mistaken for it
+                    await results.put({"id": None, "line": index, "status": "error", "error": f"invalid line: {e}"})
+                    index += 1
+                    continue
+                index += 1
+                if item["id"] in skip:
+                    counts["skipped"] += 1
+                    continue
+                if item["session_id"] in backlog:
+                    backlog[item["session_id"]].append(item)
+                else:
+                    backlog[item["session_id"]] = deque()
+                    await ready.put(item)
+            for _ in range(self.concurrency):
+                await ready.put(None)
+
+        async def work():
+            while (item := await ready.get()) is not None:
+                while item is not None:
+                    await results.put(await self._triage(item))
+                    pending = backlog[item["session_id"]]
+                    if pending:
+                        item = pending.popleft()
+                    else:
+                        del backlog[item["session_id"]]
+                        item = None
+
+        tasks = [asyncio.create_task(produce())] + [asyncio.create_task(work()) for _ in range(self.concurrency)]
+
+        async def run_all():
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                await results.put(None)
+
+        runner = asyncio.create_task(run_all())
+        try:
+            while (result := await results.get()) is not None:
+                counts["items"] += 1
+                counts["ok" if result["status"] == "ok" else "errors"] += 1
+                yield result
+            await runner
+        finally:
+            # Client went away or input failed: stop reading and abandon queued
+            # lines, and wait so no turn is still running once the batch returns
+            for task in tasks + [runner]:
+                task.cancel()
+            while not results.empty():
+                results.get_nowait()
+            await asyncio.gather(runner, *tasks, return_exceptions=True)
+            seconds = time.perf_counter() - start
+            self.metrics["batches"] += 1
+            for key, value in counts.items():
+                self.metrics[key] += value
+            self.metrics["seconds"] += seconds
+            tracer.observe("chat_batch.run", seconds)
+        yield {"summary": {
+            **counts,
+            "seconds": round(seconds, 3),
+            "items_per_second": round(counts["items"] / seconds, 1) if seconds else 0.0,
+            "concurrency": self.concurrency,
+        }}
+
+
+
+def completed_ids(path: str) -> set[str]:
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by the crash we are resuming from
+            if result.get("status") == "ok":
+                done.add(result["id"])
+    return done
+
+
+async def read_lines(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield line
+
+
+async def run_file(args):
+    from langgraph_workflow import SymptomCheckerWorkflow
+
+    workflow = SymptomCheckerWorkflow()
+    workflow.supabase.batch_size = args.storage_batch_size
+    if args.webhook_batch_size:
+        workflow.webhook_client.batch_size = args.webhook_batch_size
+    skip = completed_ids(args.output)
+    if skip:
+        print(f"Resuming: {len(skip)} lines already done")
+
+    runner = BatchRunner(workflow, concurrency=args.concurrency, max_items=args.max_items)
+    summary = {}
+    with open(args.output, "a", encoding="utf-8") as out:
+        async for result in runner.run(read_lines(args.input), skip=skip):
+            if "summary" in result:
+                summary = result["summary"]
+                continue
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    # Push out the last partial insert batch and any queued webhooks
+    await workflow.webhook_client.close()
+    await workflow.supabase.close()
+    print(f"✅ {summary['ok']} ok, {summary['errors']} errors, {summary['skipped']} skipped "
+          f"in {summary['seconds']:.1f}s ({summary['items_per_second']} lines/s)")
+    print(f"   storage: {workflow.supabase.stats()}")
+    print(f"   webhooks: {workflow.webhook_client.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="NDJSON file of session_id/message lines")
+    parser.add_argument("--output", required=True, help="NDJSON results file (appended; used to resume)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-items", type=int, default=10**9)
+    parser.add_argument("--storage-batch-size", type=int, default=500)
+    parser.add_argument("--webhook-batch-size", type=int)
+    asyncio.run(run_file(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: incremental analytics export and aggregation at scale.
+
+Writes --rows synthetic interactions rows (30 days, three categories) to a
+JSONL file, exports them with AnalyticsExporter, appends --append more rows
+and exports again (only the new rows should be read), then computes the
+risk distribution by category and duration bucket over the exported files.
+Reports throughput and the process's peak RSS after each phase; RSS should
+stay flat as --rows grows, since every phase works batch by batch.
+
+Uses Parquet when pyarrow is installed, otherwise the jsonl format.
+
+Usage: python benchmarks/bench_analytics_export.py [--rows 1000000] [--append 10000] [--format parquet]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import common  # noqa: F401  (puts the backend on sys.path)
+from analytics_export import AnalyticsExporter, Checkpoint, JsonlSource, PartitionWriter, risk_distribution
+from bench_risk_model import synth_rows
+
+START = datetime(2026, 9, 1)
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def append_rows(path: str, count: int, seed: int):
+    rng = random.Random(seed)
+    with open(path, "a", encoding="utf-8") as f:
+        for chunk_start in range(0, count, 10000):
+            for index, row in enumerate(synth_rows(min(10000, count - chunk_start), 0.05, seed + chunk_start)):
+                row["session_id"] = f"s{seed}-{chunk_start + index}"
+                row["created_at"] = (START + timedelta(seconds=rng.randrange(30 * 86400))).isoformat()
+                f.write(json.dumps(row) + "\n")
+
+
+def main(args):
+    fmt = args.format
+    if fmt is None:
+        try:
+            import pyarrow  # noqa: F401
+            fmt = "parquet"
+        except ImportError:
+            fmt = "jsonl"
+    workdir = tempfile.mkdtemp(prefix="analytics-bench-")
+    try:
+        source_path = os.path.join(workdir, "interactions.jsonl")
+        output = os.path.join(workdir, "export")
+        append_rows(source_path, args.rows, 1)
+        print(f"{args.rows} rows, format {fmt}, batch {args.batch_rows} rows; peak RSS after generating "
+              f"{peak_rss_mb():.0f}MB")
+
+        def export() -> tuple[int, float]:
+            exporter = AnalyticsExporter(
+                [JsonlSource(source_path)], PartitionWriter(output, fmt),
+                Checkpoint(os.path.join(output, "_checkpoint.json")), args.batch_rows,
+            )
+            start = time.perf_counter()
+            exporter.run_once()
+            return exporter.metrics["rows"], time.perf_counter() - start
+
+        rows, seconds = export()
+        print(f"full export         {rows:>9} rows {seconds:>7.1f}s {rows / seconds:>10.0f} rows/s  "
+              f"peak RSS {peak_rss_mb():.0f}MB")
+        append_rows(source_path, args.append, 2)
+        rows, seconds = export()
+        print(f"incremental export  {rows:>9} rows {seconds:>7.2f}s {rows / seconds:>10.0f} rows/s  "
+              f"peak RSS {peak_rss_mb():.0f}MB")
+
+        start = time.perf_counter()
+        distribution = risk_distribution(output, fmt)
+        seconds = time.perf_counter() - start
+        total = sum(counts["total"] for counts in distribution.values())
+        print(f"risk distribution   {total:>9} rows {seconds:>7.1f}s {total / seconds:>10.0f} rows/s  "
+              f"peak RSS {peak_rss_mb():.0f}MB, {len(distribution)} groups")
+        start = time.perf_counter()
+        week = risk_distribution(output, fmt, date_from="2026-09-01", date_to="2026-09-07")
+        print(f"one week (pruned)   {sum(c['total'] for c in week.values()):>9} rows "
+              f"{time.perf_counter() - start:>7.2f}s")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--append", type=int, default=10000)
+    parser.add_argument("--batch-rows", type=int, default=50000)
+    parser.add_argument("--format", choices=["parquet", "arrow", "jsonl"])
+    main(parser.parse_args())
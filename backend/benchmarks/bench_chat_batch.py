@@ -0,0 +1,130 @@
+"""
+Benchmark: N separate /chat calls vs one /chat/batch NDJSON request.
+
+Runs main.py's app in-process (httpx ASGI transport) with the fake Gemini
+model and the in-process Supabase stand-in. Each session sends two lines
+(symptom, then duration), so half the turns complete and store an
+interaction. Reports lines/s, Supabase insert calls, and checks that an
+interrupted batch resumed with the completed ids skipped ends with every
+line done exactly once.
+
+Usage: python benchmarks/bench_chat_batch.py [--sessions 500] [--concurrency 16] [--latency-ms 50]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from contextlib import aclosing
+
+import httpx
+
+from common import make_workflow
+from fake_llm import FakeGeminiChatModel
+from fake_supabase import FakeSupabase
+from batch_triage import BatchRunner
+
+
+def lines(sessions: int) -> list[dict]:
+    items = []
+    for index in range(sessions):
+        items.append({"id": f"{index}-a", "session_id": f"p{index}", "message": f"I have a headache and nausea ({index})"})
+        items.append({"id": f"{index}-b", "session_id": f"p{index}", "message": f"for {index % 9 + 1} days"})
+    return items
+
+
+def fresh_app(latency: float, storage_batch: int):
+    import main
+    from supabase_client import SupabaseClient
+
+    workflow = make_workflow(llm=FakeGeminiChatModel(latency=latency, seed=3))
+    workflow.single_shot = False
+    fake = FakeSupabase()
+    workflow.supabase = SupabaseClient(client=fake, batch_size=storage_batch)
+    main.workflow = workflow
+    return main.app, workflow, fake
+
+
+async def separate_calls(items: list[dict], concurrency: int, latency: float) -> dict:
+    app, workflow, fake = fresh_app(latency, 50)
+    gate = asyncio.Semaphore(concurrency)
+    by_session = {}
+    for item in items:
+        by_session.setdefault(item["session_id"], []).append(item)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def conversation(turns):
+            for item in turns:
+                async with gate:
+                    response = await client.post("/chat", json={"message": item["message"], "session_id": item["session_id"]})
+                    response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(conversation(turns) for turns in by_session.values()))
+        elapsed = time.perf_counter() - start
+    await workflow.supabase.close()
+    return {"lines_per_s": len(items) / elapsed, "inserts": fake.insert_calls, "rows": len(fake.tables.get("interactions", []))}
+
+
+async def batch_call(items: list[dict], concurrency: int, latency: float, storage_batch: int) -> dict:
+    app, workflow, fake = fresh_app(latency, storage_batch)
+    body = "".join(json.dumps(item) + "\n" for item in items).encode()
+    os.environ["CHAT_BATCH_CONCURRENCY"] = str(concurrency)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        response = await client.post("/chat/batch", content=body, headers={"content-type": "application/x-ndjson"})
+        elapsed = time.perf_counter() - start
+    results = [json.loads(line) for line in response.text.splitlines()]
+    ok = sum(1 for r in results if r.get("status") == "ok")
+    await workflow.supabase.close()
+    return {"lines_per_s": len(items) / elapsed, "ok": ok, "summary": results[-1]["summary"],
+            "inserts": fake.insert_calls, "rows": len(fake.tables.get("interactions", []))}
+
+
+async def resume_check(items: list[dict], concurrency: int, latency: float) -> dict:
+    workflow = make_workflow(llm=FakeGeminiChatModel(latency=latency, seed=3))
+
+    async def feed():
+        for item in items:
+            yield json.dumps(item)
+
+    done = []
+    # First attempt breaks off a third of the way through
+    async with aclosing(BatchRunner(workflow, concurrency=concurrency).run(feed())) as first:
+        async for result in first:
+            if "summary" not in result:
+                done.append(result["id"])
+            if len(done) >= len(items) // 3:
+                break
+    skip = set(done)
+    async for result in BatchRunner(workflow, concurrency=concurrency).run(feed(), skip=skip):
+        if "summary" in result:
+            summary = result["summary"]
+        else:
+            done.append(result["id"])
+    return {"first_run": len(skip), "skipped": summary["skipped"], "total": len(done), "unique": len(set(done))}
+
+
+async def main(args):
+    items = lines(args.sessions)
+    latency = args.latency_ms / 1000
+    print(f"{len(items)} lines ({args.sessions} sessions), fake LLM {args.latency_ms:.0f}ms, concurrency {args.concurrency}")
+    r = await separate_calls(items, 1, latency)
+    print(f"  /chat one at a time      {r['lines_per_s']:>8.1f} lines/s  {r['inserts']:>4} inserts for {r['rows']} rows")
+    r = await separate_calls(items, args.concurrency, latency)
+    print(f"  /chat x{args.concurrency:<3} concurrent    {r['lines_per_s']:>8.1f} lines/s  {r['inserts']:>4} inserts for {r['rows']} rows")
+    r = await batch_call(items, args.concurrency, latency, args.storage_batch)
+    print(f"  /chat/batch              {r['lines_per_s']:>8.1f} lines/s  {r['inserts']:>4} inserts for {r['rows']} rows  "
+          f"({r['ok']} ok, summary {r['summary']['items_per_second']} lines/s)")
+    r = await resume_check(items, args.concurrency, latency)
+    print(f"  resume: {r['first_run']} done before the break, {r['skipped']} skipped on resume, "
+          f"{r['total']} results for {r['unique']} unique ids (expected {len(items)})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--storage-batch", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,96 @@
+"""
+Benchmark: cold-start time of the backend app.
+
+Each phase runs in a fresh interpreter so module caches do not carry over:
+
+  import main           what a serverless cold start pays before routing
+  first /health         import plus one request that needs no workflow
+                        (TestClient itself adds httpx to this and later phases)
+  first /chat           import plus a first chat turn against the fake LLM
+                        (builds the workflow, prompt chains and graph lazily)
+  import + warmup()     import plus everything that used to happen at import
+                        time: Gemini SDK, prompt chains, graph, Supabase SDK
+
+Reports the median over --runs, in-process (from the first import) and
+including interpreter startup.
+
+Usage: python benchmarks/bench_cold_start.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PRELUDE = """
+import time
+start = time.perf_counter()
+import common
+"""
+
+PHASES = {
+    "import main": """
+import main
+""",
+    "first /health": """
+import main
+from fastapi.testclient import TestClient
+assert TestClient(main.app).get("/health").status_code == 200
+""",
+    "first /chat": """
+import main
+from fastapi.testclient import TestClient
+from fake_llm import FakeGeminiChatModel
+main.workflow = common.make_workflow(llm=FakeGeminiChatModel(latency=0))
+response = TestClient(main.app).post("/chat", json={"message": "I have a headache for 2 days", "session_id": "cold"})
+assert response.status_code == 200, response.text
+""",
+    "import + warmup()": """
+import main
+main.get_workflow().warmup()
+""",
+}
+
+EPILOGUE = """
+print("ELAPSED", time.perf_counter() - start)
+"""
+
+
+def run_phase(code: str) -> tuple[float, float]:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", PRELUDE + code + EPILOGUE], cwd=BENCH_DIR, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise SystemExit(result.stderr[-2000:])
+    line = next(line for line in result.stdout.splitlines() if line.startswith("ELAPSED"))
+    return float(line.split()[1]), wall
+
+
+def main(args):
+    results = {}
+    for name, code in PHASES.items():
+        samples = [run_phase(code) for _ in range(args.runs)]
+        results[name] = {
+            "in_process_ms": statistics.median(s[0] for s in samples) * 1000,
+            "with_interpreter_ms": statistics.median(s[1] for s in samples) * 1000,
+        }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"median of {args.runs} fresh interpreters")
+    print(f"{'phase':<20} {'in-process ms':>14} {'with interpreter ms':>20}")
+    for name, r in results.items():
+        print(f"{name:<20} {r['in_process_ms']:>14.0f} {r['with_interpreter_ms']:>20.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,76 @@
+"""
+Benchmark: micro-batched vs one-call-per-message LLM extraction.
+
+Runs extraction-only turns (rule tier disabled, no duration so no risk or
+guidance call) from a number of concurrent users against a fake Gemini whose
+concurrency is capped by a fixed-size LLM gateway, as a provider quota would.
+Each batched call costs the base latency plus a little per extra message.
+Reports throughput and latency per batch size at each load level.
+
+Usage:
+    python benchmarks/bench_extraction_batching.py --users 8 32 128 --batch-sizes 1 4 16 \\
+        --window-ms 5 --latency-ms 100 --item-latency-ms 5 --llm-concurrency 8
+"""
+import argparse
+import asyncio
+import time
+
+from common import make_workflow, percentile
+from fake_llm import FakeGeminiChatModel
+from llm_gateway import LLMGateway
+from micro_batcher import MicroBatcher
+
+
+async def run(users: int, batch_size: int, args) -> dict:
+    llm = FakeGeminiChatModel(latency=args.latency_ms / 1000, batch_item_latency=args.item_latency_ms / 1000)
+    workflow = make_workflow(llm=llm)
+    workflow.single_shot = False
+    workflow.rule_extractor.min_confidence = 2.0  # every message goes to the LLM
+    limit = args.llm_concurrency
+    workflow.prompts.gateway = LLMGateway(
+        initial_limit=limit, min_limit=limit, max_limit=limit, max_queue=100000, queue_timeout=60
+    )
+    if batch_size > 1:
+        workflow.extraction_batcher = MicroBatcher(workflow._run_extraction_batch, batch_size, args.window_ms / 1000)
+    latencies: list[float] = []
+
+    async def user(index: int):
+        for turn in range(args.turns):
+            start = time.perf_counter()
+            await workflow.process_message(f"I have a headache and feel dizzy (case {index}-{turn})", f"u{index}-{turn}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(users)))
+    elapsed = time.perf_counter() - start
+    batcher = workflow.extraction_batcher
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "llm_calls": llm.calls,
+        "avg_batch": batcher.stats()["avg_batch_size"] if batcher else 1.0,
+    }
+
+
+async def main(args):
+    print(f"fake LLM {args.latency_ms:.0f}ms + {args.item_latency_ms:.0f}ms/extra item, "
+          f"{args.llm_concurrency} concurrent LLM calls, window {args.window_ms:.0f}ms, {args.turns} turns/user")
+    print(f"{'users':>6} {'batch':>6} {'turns/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'LLM calls':>10} {'avg batch':>10}")
+    for users in args.users:
+        for batch_size in args.batch_sizes:
+            r = await run(users, batch_size, args)
+            print(f"{users:>6} {batch_size:>6} {r['throughput']:>9.1f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+                  f"{r['llm_calls']:>10} {r['avg_batch']:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--item-latency-ms", type=float, default=5)
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
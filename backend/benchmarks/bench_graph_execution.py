@@ -0,0 +1,90 @@
+"""
+Benchmark: per-turn cost of the graph execution modes, and category flips
+under per-message vs sticky routing.
+
+Runs two-turn conversations (symptoms, then duration) through
+process_message on the rule-based paths, so the numbers are the workflow's own
+overhead without LLM latency:
+  graph   start -> router -> symptom node through graph.astream (the default)
+  lean    graph entered at the symptom node for the precomputed category
+  direct  the symptom node called without LangGraph
+
+Then replays urgent and mental wellbeing openers followed by a plain duration
+answer and counts how many sessions lose their category on the follow-up.
+
+Usage: python benchmarks/bench_graph_execution.py [--conversations 2000]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from common import make_workflow, percentile
+
+OPENERS = [
+    "I have a headache and nausea",
+    "I have severe chest pain and shortness of breath",
+    "I feel anxious and hopeless all the time",
+    "my back hurts and I am tired",
+]
+FOLLOW_UPS = ["3 days", "for about a week", "since yesterday", "2 weeks"]
+
+
+def workflow_for(execution: str, routing: str = "per_message"):
+    os.environ["GRAPH_EXECUTION"] = execution
+    os.environ["ROUTING_MODE"] = routing
+    workflow = make_workflow()
+    workflow.warmup()
+    return workflow
+
+
+async def turn_cost(execution: str, conversations: int) -> list[float]:
+    workflow = workflow_for(execution)
+    samples = []
+    for index in range(conversations):
+        for message in (OPENERS[index % len(OPENERS)], FOLLOW_UPS[index % len(FOLLOW_UPS)]):
+            start = time.perf_counter()
+            await workflow.process_message(message, f"{execution}-{index}")
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def flips(routing: str) -> tuple[int, int]:
+    workflow = workflow_for("direct", routing)
+    flipped = total = 0
+    for index, opener in enumerate(OPENERS[1:3] * 25):
+        session_id = f"{routing}-{index}"
+        await workflow.process_message(opener, session_id)
+        first = workflow.sessions.get(session_id)["category"]
+        await workflow.process_message(FOLLOW_UPS[index % len(FOLLOW_UPS)], session_id)
+        total += 1
+        flipped += workflow.sessions.get(session_id)["category"] != first
+    # Escalation still happens in sticky mode
+    await workflow.process_message("I feel anxious and hopeless", "escalate")
+    await workflow.process_message("now I also have chest pain", "escalate")
+    assert workflow.sessions.get("escalate")["category"] == "urgent_symptom"
+    return flipped, total
+
+
+async def main(args):
+    print(f"{args.conversations} two-turn conversations, rule-based paths (no LLM)")
+    print(f"{'execution':<10} {'mean (us)':>10} {'p50 (us)':>10} {'p99 (us)':>10} {'vs graph':>9}")
+    baseline = None
+    for execution in ("graph", "lean", "direct"):
+        # Untimed pass first so imports and caches are warm
+        await turn_cost(execution, 50)
+        samples = await turn_cost(execution, args.conversations)
+        mean = sum(samples) / len(samples)
+        baseline = baseline or mean
+        print(f"{execution:<10} {mean * 1e6:>10.1f} {percentile(samples, 50) * 1e6:>10.1f} "
+              f"{percentile(samples, 99) * 1e6:>10.1f} {baseline / mean:>8.2f}x")
+    print()
+    for routing in ("per_message", "sticky"):
+        flipped, total = await flips(routing)
+        print(f"{routing:<12} {flipped}/{total} urgent or mental wellbeing sessions changed category on a duration answer")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
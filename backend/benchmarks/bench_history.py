@@ -0,0 +1,81 @@
+"""
+Benchmark: session size and turn cost for long conversations, with the
+history window (HistoryManager defaults) and without it.
+
+Drives one session through many turns of varied, realistic-length messages
+and reports, at checkpoints, the verbatim messages kept, estimated history
+tokens, in-memory bytes and encoded (stored) bytes of the session, and the
+average turn latency over the preceding turns.
+
+Usage: python benchmarks/bench_history.py [--turns 2000] [--window-tokens 512] [--summary-tokens 256]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from common import make_workflow
+from history import HistoryManager
+from session_state import encode_session, estimate_tokens
+from session_store import InMemorySessionStore, estimate_session_bytes
+
+PHRASES = (
+    "I have had a headache since yesterday", "the pain gets worse in the evening",
+    "I also feel a bit dizzy when I stand up", "my sleep has been poor this week",
+    "I am 34 years old", "it started about five days ago", "no fever so far",
+    "I took some rest but it did not help much", "my appetite is lower than usual",
+)
+
+
+async def run(turns: int, history: HistoryManager, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    store = InMemorySessionStore(max_messages=turns + 1)
+    workflow = make_workflow(session_store=store)
+    workflow.history = history
+    workflow.warmup()
+    rows = []
+    checkpoint = 10
+    samples = []
+    for turn in range(1, turns + 1):
+        message = ", and ".join(rng.sample(PHRASES, rng.randint(1, 3)))
+        start = time.perf_counter()
+        await workflow.process_message(message, "long")
+        samples.append(time.perf_counter() - start)
+        if turn == checkpoint or turn == turns:
+            session = store.get("long")
+            summary = session.get("history_summary") or ""
+            rows.append({
+                "turn": turn,
+                "messages": len(session["messages"]),
+                "tokens": session["messages"].tokens + estimate_tokens(summary),
+                "bytes": estimate_session_bytes(session),
+                "encoded": len(encode_session(session)),
+                "turn_us": sum(samples) / len(samples) * 1e6,
+            })
+            samples = []
+            checkpoint *= 10
+    return rows
+
+
+async def main(args):
+    modes = {
+        "unbounded": HistoryManager(window_tokens=10**9, window_messages=10**9),
+        "windowed": HistoryManager(args.window_tokens, args.window_messages, args.summary_tokens),
+    }
+    for name, history in modes.items():
+        print(f"\n{name}")
+        print(f"{'turn':>7} {'messages':>9} {'tokens':>8} {'bytes':>9} {'encoded':>9} {'turn (us)':>10}")
+        for row in await run(args.turns, history, args.seed):
+            print(f"{row['turn']:>7} {row['messages']:>9} {row['tokens']:>8} {row['bytes']:>9} "
+                  f"{row['encoded']:>9} {row['turn_us']:>10.1f}")
+        print(f"compactions {history.metrics['compactions']}, folded {history.metrics['messages_folded']} messages")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--window-tokens", type=int, default=512)
+    parser.add_argument("--window-messages", type=int, default=20)
+    parser.add_argument("--summary-tokens", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
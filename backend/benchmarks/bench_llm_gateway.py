@@ -0,0 +1,84 @@
+"""
+Benchmark: bursts of /chat turns against a fake Gemini with a concurrency quota,
+with and without the LLM gateway.
+
+The fake model answers 429 once more than --quota calls are in flight. Without
+the gateway those 429s surface as failed turns. With it, the adaptive limit
+backs off towards the quota and calls that cannot be admitted within the
+queue budget are shed to the rule-based paths, so the turn still gets an
+answer.
+
+Usage: python benchmarks/bench_llm_gateway.py --burst 300 --waves 3 --quota 40 --latency-ms 50
+"""
+import argparse
+import asyncio
+import time
+
+from common import make_workflow, percentile
+from fake_llm import FakeGeminiChatModel
+from llm_gateway import LLMGateway
+
+MESSAGE = "I have had a headache and fever for 2 days"
+
+
+async def run(use_gateway: bool, args) -> dict:
+    llm = FakeGeminiChatModel(latency=args.latency_ms / 1000, jitter=args.latency_ms / 5000, max_concurrency=args.quota)
+    workflow = make_workflow(llm=llm)
+    gateway = LLMGateway(
+        initial_limit=args.initial_limit, max_queue=args.queue_max, queue_timeout=args.queue_timeout_ms / 1000
+    )
+    workflow.llm_gateway = gateway
+    workflow.prompts.gateway = gateway if use_gateway else None
+    latencies: list[float] = []
+    failed = 0
+
+    async def turn(session_id: str):
+        nonlocal failed
+        start = time.perf_counter()
+        try:
+            await workflow.process_message(MESSAGE, session_id)
+        except Exception:
+            failed += 1
+        latencies.append(time.perf_counter() - start)
+
+    for wave in range(args.waves):
+        await asyncio.gather(*(turn(f"w{wave}-s{i}") for i in range(args.burst)))
+    stats = gateway.stats()
+    return {
+        "turns": len(latencies),
+        "failed": failed,
+        "provider_429s": llm.rate_limited,
+        "shed": sum(stats["shed"].values()) if use_gateway else 0,
+        "final_limit": stats["limit"] if use_gateway else None,
+        "max_queue_depth": stats["max_queue_depth"],
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=300, help="concurrent turns per wave")
+    parser.add_argument("--waves", type=int, default=3)
+    parser.add_argument("--quota", type=int, default=40, help="fake provider concurrency quota")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--initial-limit", type=float, default=64)
+    parser.add_argument("--queue-max", type=int, default=200)
+    parser.add_argument("--queue-timeout-ms", type=float, default=500)
+    return parser.parse_args(argv)
+
+
+async def main(args):
+    print(f"{args.waves} waves of {args.burst} turns, quota {args.quota}, latency {args.latency_ms:.0f}ms")
+    print(f"{'mode':<12} {'failed':>7} {'429s':>6} {'shed':>6} {'limit':>6} {'queue':>6} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for name, use_gateway in (("direct", False), ("gateway", True)):
+        r = await run(use_gateway, args)
+        limit = f"{r['final_limit']:.1f}" if r["final_limit"] is not None else "-"
+        print(
+            f"{name:<12} {r['failed']:>7} {r['provider_429s']:>6} {r['shed']:>6} {limit:>6} "
+            f"{r['max_queue_depth']:>6} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
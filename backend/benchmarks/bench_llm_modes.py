@@ -0,0 +1,55 @@
+"""
+Benchmark: single-shot structured call vs the multi-call extraction/risk/guidance path.
+
+Each session sends one complete message, so every turn runs the full
+assessment. The rule-based extraction tier and the local risk model are
+switched off, since they would otherwise answer these messages without the
+LLM in both modes, and every message is distinct so the response cache
+does not answer either.
+
+Usage: python benchmarks/bench_llm_modes.py [sessions] [latency_ms]
+"""
+import asyncio
+import sys
+import time
+
+from common import make_workflow, percentile
+from fake_llm import FakeGeminiChatModel
+
+
+
+def message(index: int) -> str:
+    return f"I am {20 + index % 60} and I have had a headache and fever for {index % 9 + 2} days"
+
+
+async def run_mode(single_shot: bool, sessions: int, latency: float) -> dict:
+    llm = FakeGeminiChatModel(latency=latency, jitter=latency * 0.4, seed=1)
+    workflow = make_workflow(llm=llm)
+    workflow.single_shot = single_shot
+    # Measure the LLM paths themselves: the rule tier never counts as confident
+    workflow.rule_extractor.min_confidence = float("inf")
+    workflow.risk_model = None
+    samples = []
+    for index in range(sessions):
+        start = time.perf_counter()
+        await workflow.process_message(message(index), f"session-{index}")
+        samples.append(time.perf_counter() - start)
+    return {
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "llm_calls_per_turn": llm.calls / sessions,
+    }
+
+
+async def main(sessions: int, latency: float):
+    print(f"{sessions} sessions, fake LLM latency {latency * 1000:.0f}ms")
+    print(f"{'mode':<12} {'p50 (ms)':>10} {'p99 (ms)':>10} {'calls/turn':>11}")
+    for name, single_shot in (("multi-call", False), ("single-shot", True)):
+        result = await run_mode(single_shot, sessions, latency)
+        print(f"{name:<12} {result['p50_ms']:>10.1f} {result['p99_ms']:>10.1f} {result['llm_calls_per_turn']:>11.1f}")
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+    asyncio.run(main(sessions, latency_ms / 1000))
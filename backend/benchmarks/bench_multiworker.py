@@ -0,0 +1,178 @@
+"""
+Throughput of /chat as the number of worker processes grows, with sessions
+kept in the shared SQLite store (SESSION_BACKEND=sqlite).
+
+For each worker count N, starts N bench_server.py processes on one SQLite
+file and N client processes. Every conversation sends its second turn to a
+different worker than its first, so a second turn only completes the triage
+(and gets a risk level) if that worker resumed the session from the store.
+Reports throughput, scaling efficiency against one worker, and how many
+sessions were resumed across workers.
+
+Throughput can only scale with N when the host has N free cores; the cpu
+count is included in the output.
+
+Usage:
+    python benchmarks/bench_multiworker.py --workers 1 2 4 --sessions 400 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from common import percentile
+from load_test import FIRST_TURNS, SECOND_TURNS, git_commit, wait_ready
+from stub_servers import free_port
+
+
+def start_workers(count: int, db_path: str, args) -> tuple[list[subprocess.Popen], list[str]]:
+    env = dict(
+        os.environ,
+        SESSION_BACKEND="sqlite",
+        SESSION_SQLITE_PATH=db_path,
+        FAKE_LLM_LATENCY_MS=str(args.llm_latency_ms),
+        FAKE_LLM_JITTER_MS="0",
+        FAKE_SUPABASE_LATENCY_MS="0",
+        STUB_WEBHOOK_URL="",
+    )
+    servers, urls = [], []
+    for _ in range(count):
+        port = free_port()
+        servers.append(subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(__file__), "bench_server.py"), str(port)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+        ))
+        urls.append(f"http://127.0.0.1:{port}")
+    return servers, urls
+
+
+async def drive(urls: list[str], session_ids: range, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+    resumed = 0
+
+    async def send(client, url: str, session_id: str, message: str) -> dict | None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{url}/chat", json={"message": message, "session_id": session_id})
+                body = response.json() if response.status_code == 200 else None
+            except httpx.HTTPError:
+                body = None
+            latencies.append(time.perf_counter() - start)
+            if body is None:
+                errors += 1
+            return body
+
+    async def conversation(client, index: int):
+        nonlocal resumed
+        session_id = f"mw-{index}"
+        first = urls[index % len(urls)]
+        second = urls[(index + 1) % len(urls)]
+        await send(client, first, session_id, FIRST_TURNS[index % len(FIRST_TURNS)])
+        body = await send(client, second, session_id, SECOND_TURNS[index % len(SECOND_TURNS)])
+        if body and body.get("risk_level"):
+            resumed += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=60.0, limits=limits) as client:
+        await asyncio.gather(*(conversation(client, i) for i in session_ids))
+    return {"latencies": latencies, "errors": errors, "resumed": resumed}
+
+
+def client_process(payload):
+    urls, first, count, concurrency = payload
+    return asyncio.run(drive(urls, range(first, first + count), concurrency))
+
+
+async def warm_up(urls: list[str]):
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        for url in urls:
+            await wait_ready(client, url)
+            await client.post(f"{url}/chat", json={"message": "warm up", "session_id": f"warm-{url}"})
+
+
+def run_phase(workers: int, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        servers, urls = start_workers(workers, os.path.join(tmp, "sessions.sqlite3"), args)
+        try:
+            asyncio.run(warm_up(urls))
+            per_client = args.sessions // workers
+            jobs = [(urls, i * per_client, per_client, max(1, args.concurrency // workers)) for i in range(workers)]
+            start = time.perf_counter()
+            with multiprocessing.Pool(workers) as pool:
+                parts = pool.map(client_process, jobs)
+            elapsed = time.perf_counter() - start
+        finally:
+            for server in servers:
+                server.terminate()
+            for server in servers:
+                server.wait(timeout=10)
+    latencies = [value for part in parts for value in part["latencies"]]
+    return {
+        "workers": workers,
+        "conversations": per_client * workers,
+        "requests": len(latencies),
+        "errors": sum(part["errors"] for part in parts),
+        "resumed_across_workers": sum(part["resumed"] for part in parts),
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--sessions", type=int, default=400, help="conversations per phase")
+    parser.add_argument("--concurrency", type=int, default=32, help="total in-flight requests per phase")
+    parser.add_argument("--llm-latency-ms", type=float, default=5,
+                        help="low by default so workers are CPU-bound rather than waiting on the fake LLM")
+    parser.add_argument("--output", default=None,
+                        help="JSON results path (default: benchmarks/results/multiworker-<timestamp>.json)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": {"sessions": args.sessions, "concurrency": args.concurrency, "llm_latency_ms": args.llm_latency_ms},
+        "phases": [],
+    }
+    print(f"cpu count: {os.cpu_count()}")
+    baseline = None
+    for workers in args.workers:
+        phase = run_phase(workers, args)
+        baseline = baseline or phase["throughput_rps"] / workers
+        phase["scaling_efficiency"] = phase["throughput_rps"] / (baseline * workers) if baseline else None
+        results["phases"].append(phase)
+        print(
+            f"{workers:>3} workers  {phase['throughput_rps']:8.1f} req/s  "
+            f"efficiency {phase['scaling_efficiency']:5.2f}  p50 {phase['p50_ms']:7.1f}ms  "
+            f"p95 {phase['p95_ms']:7.1f}ms  errors {phase['errors']:>4}  "
+            f"resumed {phase['resumed_across_workers']}/{phase['conversations']}"
+        )
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results", f"multiworker-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
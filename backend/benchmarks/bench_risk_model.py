@@ -0,0 +1,99 @@
+"""
+Benchmark: local risk classifier vs the per-turn risk LLM call.
+
+Synthesizes interactions rows labeled by the fake model's risk rule (plus
+label noise), trains a RiskModel on most of them and reports holdout
+accuracy, the share of rows it is confident on (those skip the LLM), and
+prediction latency. Then runs complete turns through the multi-call workflow
+with and without the model to compare LLM calls and latency per turn.
+
+Usage: python benchmarks/bench_risk_model.py [--rows 5000] [--noise 0.05] [--latency-ms 50]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from common import make_workflow, percentile
+from fake_llm import FakeGeminiChatModel, risk_for
+from risk_model import evaluate, train
+from rule_extractor import RuleExtractor
+
+CATEGORIES = (("general_symptom", 0.6), ("urgent_symptom", 0.15), ("mental_wellbeing_symptom", 0.25))
+DURATIONS = ("today", "1 day", "2 days", "a few days", "5 days", "10 days", "1 week", "two weeks", "3 weeks", "1 month", "months")
+
+
+def synth_rows(count: int, noise: float, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    lexicon = RuleExtractor.from_file().synonyms
+    phrases = list(lexicon)
+    rows = []
+    for _ in range(count):
+        category = rng.choices([c for c, _ in CATEGORIES], [w for _, w in CATEGORIES])[0]
+        duration = rng.choice(DURATIONS)
+        risk = risk_for(category, duration)
+        if rng.random() < noise:
+            risk = rng.choice(("low", "moderate", "high"))
+        rows.append({
+            "category": category,
+            "age": str(rng.randint(5, 85)) if rng.random() < 0.6 else None,
+            "symptoms": rng.sample(phrases, rng.randint(1, 3)),
+            "duration": duration,
+            "risk_level": risk,
+        })
+    return rows
+
+
+async def turns(model, count: int, latency: float) -> dict:
+    llm = FakeGeminiChatModel(latency=latency, seed=2)
+    workflow = make_workflow(llm=llm)
+    workflow.single_shot = False
+    workflow.risk_model = model
+    samples = []
+    for index in range(count):
+        # Distinct durations keep the risk response cache from answering instead
+        message = f"I have a headache and a fever for {index + 1} days"
+        start = time.perf_counter()
+        await workflow.process_message(message, f"risk-{index}")
+        samples.append(time.perf_counter() - start)
+    return {"llm_calls": llm.calls / count, "p50_ms": percentile(samples, 50) * 1000}
+
+
+async def main(args):
+    rows = synth_rows(args.rows, args.noise, args.seed)
+    split = int(len(rows) * 0.8)
+    extractor = RuleExtractor.from_file()
+    start = time.perf_counter()
+    model = train(rows[:split], canonicalize=extractor.canonical)
+    print(f"Trained on {split} rows in {time.perf_counter() - start:.1f}s, {len(model.weights)} features")
+    result = evaluate(model, rows[split:])
+    print(f"Holdout {result['rows']} rows (label noise {args.noise:.0%}): accuracy {result['accuracy']:.1%}, "
+          f"confident on {result['confident_share']:.0%} with accuracy {result['confident_accuracy']:.1%}")
+
+    holdout = rows[split:]
+    samples = []
+    for _ in range(20):
+        for row in holdout:
+            t = time.perf_counter()
+            model.predict(row)
+            samples.append(time.perf_counter() - t)
+    t = time.perf_counter()
+    model.predict_batch(holdout)
+    batch_us = (time.perf_counter() - t) / len(holdout) * 1e6
+    print(f"predict: p50 {percentile(samples, 50) * 1e6:.1f}us  p99 {percentile(samples, 99) * 1e6:.1f}us  "
+          f"batch {batch_us:.1f}us/row")
+
+    print(f"\nComplete multi-call turns, fake LLM latency {args.latency_ms:.0f}ms")
+    for name, candidate in (("LLM risk", None), ("local model", model)):
+        r = await turns(candidate, args.turns, args.latency_ms / 1000)
+        print(f"  {name:<12} {r['llm_calls']:.2f} LLM calls/turn  p50 {r['p50_ms']:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,103 @@
+"""
+Benchmark: router keyword classification over a synthetic message corpus.
+
+Compares the compiled KeywordClassifier with the per-keyword substring scan
+router_node used before, on the shipped lexicon and on padded lexicons.
+
+Usage: python benchmarks/bench_router.py [corpus_size]
+"""
+import json
+import random
+import sys
+import time
+
+import common  # noqa: F401  (puts backend on sys.path)
+from keyword_classifier import DEFAULT_LEXICON_PATH, KeywordClassifier
+
+FILLER = [
+    "I have", "my", "since yesterday", "it hurts", "a bit of", "really", "for 3 days",
+    "headache", "fever", "cough", "back pain", "rash", "nausea", "tired", "dizzy",
+    "and", "but", "also", "not sure", "sometimes", "at night", "after eating",
+]
+SIGNALS = [
+    "chest pain", "no chest pain", "severe pain", "bleeding", "can't breathe",
+    "stressed", "anxiety", "feeling down", "worried", "panic", "sadly",
+]
+
+
+URGENT_KEYWORDS = [
+    "chest pain", "heart attack", "stroke", "severe", "emergency",
+    "can't breathe", "difficulty breathing", "unconscious", "severe pain",
+    "bleeding", "severe injury", "poisoning", "overdose"
+]
+MENTAL_KEYWORDS = [
+    "stress", "anxiety", "depression", "sad", "worried", "panic",
+    "emotional", "mental health", "feeling down", "overwhelmed",
+    "suicidal", "self-harm"
+]
+
+
+def make_legacy_classifier(urgent_keywords: list[str], mental_keywords: list[str]):
+    # The substring scan router_node used before KeywordClassifier
+    def classify(message: str) -> str:
+        user_message = message.lower()
+        if any(keyword in user_message for keyword in urgent_keywords):
+            return "urgent_symptom"
+        if any(keyword in user_message for keyword in mental_keywords):
+            return "mental_wellbeing_symptom"
+        return "general_symptom"
+    return classify
+
+
+def extended_lexicon(lexicon: dict, extra_terms: int, seed: int = 11) -> dict:
+    # Pad both categories with pseudo-words to show how cost scales with lexicon size
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    extended = json.loads(json.dumps(lexicon))
+    for index in range(extra_terms):
+        term = "".join(rng.choices(letters, k=rng.randint(5, 10)))
+        category = "urgent_symptom" if index % 2 else "mental_wellbeing_symptom"
+        extended["categories"][category]["terms"][term] = 1.0
+    return extended
+
+
+def build_corpus(size: int, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        words = rng.choices(FILLER, k=rng.randint(4, 14))
+        if rng.random() < 0.4:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(SIGNALS))
+        corpus.append(" ".join(words))
+    return corpus
+
+
+def bench(name: str, classify, corpus: list[str]) -> list[str]:
+    start = time.perf_counter()
+    labels = [classify(message) for message in corpus]
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {elapsed:8.3f}s  {elapsed / len(corpus) * 1e6:6.2f} us/msg")
+    return labels
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    corpus = build_corpus(size)
+    with open(DEFAULT_LEXICON_PATH, encoding="utf-8") as f:
+        lexicon = json.load(f)
+    print(f"corpus: {size} messages")
+
+    print("\n-- shipped lexicon --")
+    legacy = bench("legacy scan", make_legacy_classifier(URGENT_KEYWORDS, MENTAL_KEYWORDS), corpus)
+    compiled = bench("compiled", KeywordClassifier(lexicon).classify, corpus)
+    changed = sum(1 for a, b in zip(legacy, compiled) if a != b)
+    print(f"label differences (negation / word boundaries): {changed}")
+
+    for extra in (200, 1000):
+        padded = extended_lexicon(lexicon, extra)
+        terms = padded["categories"]
+        print(f"\n-- lexicon + {extra} terms --")
+        bench("legacy scan", make_legacy_classifier(
+            list(terms["urgent_symptom"]["terms"]), list(terms["mental_wellbeing_symptom"]["terms"])
+        ), corpus)
+        bench("compiled", KeywordClassifier(padded).classify, corpus)
@@ -0,0 +1,114 @@
+"""
+Benchmark: the deterministic extraction tier against the labeled set in
+extraction_labeled.jsonl.
+
+Reports how many messages the rules are confident on (those skip the LLM
+extraction call), how accurate they are on that subset and overall, the
+per-message extraction latency, and LLM calls per turn through the workflow
+with the tier on and off, in single-shot and multi-call mode.
+
+Usage: python benchmarks/bench_rule_extraction.py [--show-errors] [--latency-ms 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from common import make_workflow, percentile
+from fake_llm import FakeGeminiChatModel
+from rule_extractor import RuleExtractor
+
+LABELED_PATH = os.path.join(os.path.dirname(__file__), "extraction_labeled.jsonl")
+FIELDS = ("age", "symptoms", "duration")
+
+
+def load_labeled() -> list[dict]:
+    with open(LABELED_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def field_correct(field: str, predicted, expected) -> bool:
+    if field == "symptoms":
+        return set(predicted) == set(expected)
+    return predicted == expected
+
+
+def accuracy(extractor: RuleExtractor, examples: list[dict], show_errors: bool) -> dict:
+    confident = correct_confident = correct_all = 0
+    field_hits = dict.fromkeys(FIELDS, 0)
+    for example in examples:
+        extraction = extractor.extract(example["message"])
+        hits = {field: field_correct(field, extraction[field], example[field]) for field in FIELDS}
+        exact = all(hits.values())
+        correct_all += exact
+        if extractor.is_confident(extraction):
+            confident += 1
+            correct_confident += exact
+            for field, hit in hits.items():
+                field_hits[field] += hit
+            if show_errors and not exact:
+                print(f"  confident but wrong: {example['message']!r} -> "
+                      f"{ {f: extraction[f] for f in FIELDS} }")
+    return {
+        "messages": len(examples),
+        "confident": confident,
+        "confident_exact_accuracy": correct_confident / confident if confident else 0.0,
+        "confident_field_accuracy": {f: hits / confident if confident else 0.0 for f, hits in field_hits.items()},
+        "overall_exact_accuracy": correct_all / len(examples),
+    }
+
+
+def latency(extractor: RuleExtractor, examples: list[dict], rounds: int = 200) -> dict:
+    samples = []
+    for _ in range(rounds):
+        for example in examples:
+            start = time.perf_counter()
+            extractor.extract(example["message"])
+            samples.append(time.perf_counter() - start)
+    return {
+        "mean_us": sum(samples) / len(samples) * 1e6,
+        "p50_us": percentile(samples, 50) * 1e6,
+        "p99_us": percentile(samples, 99) * 1e6,
+    }
+
+
+async def llm_calls(examples: list[dict], single_shot: bool, rules: bool, latency_s: float) -> float:
+    llm = FakeGeminiChatModel(latency=latency_s, seed=1)
+    workflow = make_workflow(llm=llm)
+    workflow.single_shot = single_shot
+    if not rules:
+        workflow.rule_extractor.min_confidence = 2.0  # never confident
+    for index, example in enumerate(examples):
+        await workflow.process_message(example["message"], f"labeled-{index}")
+    return llm.calls / len(examples)
+
+
+async def main(args):
+    examples = load_labeled()
+    extractor = RuleExtractor.from_file()
+    result = accuracy(extractor, examples, args.show_errors)
+    print(f"{result['messages']} labeled messages, confidence threshold {extractor.min_confidence}")
+    print(f"  confident (LLM extraction skipped): {result['confident']} "
+          f"({result['confident'] / result['messages']:.0%})")
+    print(f"  exact accuracy on confident subset: {result['confident_exact_accuracy']:.1%}  "
+          + "  ".join(f"{f} {v:.1%}" for f, v in result["confident_field_accuracy"].items()))
+    print(f"  exact accuracy on all messages (rules alone): {result['overall_exact_accuracy']:.1%}")
+
+    timing = latency(extractor, examples)
+    print(f"  extraction latency: mean {timing['mean_us']:.1f}us  p50 {timing['p50_us']:.1f}us  "
+          f"p99 {timing['p99_us']:.1f}us")
+
+    print(f"\nLLM calls per first turn (fake latency {args.latency_ms:.0f}ms)")
+    print(f"{'mode':<12} {'rules off':>10} {'rules on':>10}")
+    for name, single_shot in (("multi-call", False), ("single-shot", True)):
+        off = await llm_calls(examples, single_shot, False, args.latency_ms / 1000)
+        on = await llm_calls(examples, single_shot, True, args.latency_ms / 1000)
+        print(f"{name:<12} {off:>10.2f} {on:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--show-errors", action="store_true", help="print confident extractions that miss the label")
+    parser.add_argument("--latency-ms", type=float, default=5)
+    asyncio.run(main(parser.parse_args()))
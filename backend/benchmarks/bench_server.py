@@ -0,0 +1,44 @@
+"""
+Runs backend/main.py's app with fake dependencies for load testing.
+
+Gemini is replaced by FakeGeminiChatModel and Supabase by the in-process
+FakeSupabase; the webhook goes to whatever URL is given (normally a stub
+server started by load_test.py). All knobs come from environment variables:
+
+    FAKE_LLM_LATENCY_MS, FAKE_LLM_JITTER_MS, FAKE_LLM_ERROR_RATE,
+    FAKE_SUPABASE_LATENCY_MS, STUB_WEBHOOK_URL
+
+Usage: python benchmarks/bench_server.py <port>
+"""
+import os
+import sys
+
+from common import make_workflow
+from fake_llm import FakeGeminiChatModel
+from fake_supabase import FakeSupabase
+
+
+def build_app():
+    import main
+    from supabase_client import SupabaseClient
+
+    llm = FakeGeminiChatModel(
+        latency=float(os.getenv("FAKE_LLM_LATENCY_MS", 50)) / 1000,
+        jitter=float(os.getenv("FAKE_LLM_JITTER_MS", 20)) / 1000,
+        error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", 0)),
+        seed=int(os.getenv("FAKE_LLM_SEED", 0)),
+    )
+    workflow = make_workflow(llm=llm)
+    workflow.supabase = SupabaseClient(
+        client=FakeSupabase(latency=float(os.getenv("FAKE_SUPABASE_LATENCY_MS", 20)) / 1000)
+    )
+    workflow.webhook_client.webhook_url = os.getenv("STUB_WEBHOOK_URL") or None
+    main.workflow = workflow
+    return main.app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8100
+    uvicorn.run(build_app(), host="127.0.0.1", port=port, log_level="warning", access_log=False)
@@ -0,0 +1,109 @@
+"""
+Benchmark: memory per session with dict states vs compact SessionRecords.
+
+Runs a few hundred real conversations through the workflow (direct
+execution, rule-based paths) to get realistic session states, then fills an
+in-memory store with --sessions copies of them (fresh strings, unique ids)
+once per representation and measures the heap the store holds with
+tracemalloc. With records, the store's default hot window of recently used
+sessions stays as dicts, as it would in production. Also reports the store's own size estimate, the cost of a
+get()+set() round trip, and the per-turn time of a two-turn conversation.
+
+Usage: python benchmarks/bench_session_memory.py [--sessions 50000]
+"""
+import argparse
+import asyncio
+import gc
+import os
+import time
+import tracemalloc
+
+from common import make_workflow, percentile
+from session_state import decode_session, encode_session
+from session_store import InMemorySessionStore
+
+OPENERS = [
+    "I have a headache and nausea since this morning",
+    "I am 34 and my back hurts, I am tired all the time",
+    "I feel anxious and I cannot sleep",
+    "I have a cough and a sore throat and a mild fever",
+]
+FOLLOW_UPS = ["3 days", "for about a week, it gets worse at night", "since yesterday", "2 weeks"]
+
+
+async def template_states(count: int) -> list[bytes]:
+    os.environ["GRAPH_EXECUTION"] = "direct"
+    workflow = make_workflow(session_store=InMemorySessionStore(compact_records=False))
+    templates = []
+    for index in range(count):
+        session_id = f"template-{index}"
+        await workflow.process_message(OPENERS[index % len(OPENERS)], session_id)
+        await workflow.process_message(FOLLOW_UPS[index % len(FOLLOW_UPS)], session_id)
+        templates.append(encode_session(workflow.sessions.get(session_id)))
+    return templates
+
+
+def fill(store: InMemorySessionStore, templates: list[bytes], sessions: int):
+    for index in range(sessions):
+        # Decoding gives every session its own strings, as real traffic would
+        state = decode_session(templates[index % len(templates)])
+        state["session_id"] = f"session-{index}"
+        store.set(state["session_id"], state)
+
+
+def measure_memory(compact: bool, templates: list[bytes], sessions: int) -> tuple[float, float]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = InMemorySessionStore(max_sessions=sessions, memory_budget_bytes=8 * 1024 ** 3, compact_records=compact)
+    fill(store, templates, sessions)
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return held / sessions, store.stats()["estimated_bytes"] / sessions
+
+
+def round_trip(compact: bool, templates: list[bytes], operations: int) -> list[float]:
+    store = InMemorySessionStore(compact_records=compact)
+    fill(store, templates, 1000)
+    samples = []
+    for index in range(operations):
+        session_id = f"session-{index % 1000}"
+        start = time.perf_counter()
+        store.set(session_id, store.get(session_id))
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def turn_cost(compact: bool, conversations: int) -> list[float]:
+    workflow = make_workflow(session_store=InMemorySessionStore(compact_records=compact))
+    samples = []
+    for index in range(conversations):
+        for message in (OPENERS[index % len(OPENERS)], FOLLOW_UPS[index % len(FOLLOW_UPS)]):
+            start = time.perf_counter()
+            await workflow.process_message(message, f"turn-{index}")
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def main(args):
+    templates = await template_states(200)
+    print(f"{args.sessions} sessions from 200 two-turn conversations")
+    print(f"{'representation':<16} {'measured B/session':>19} {'estimated B/session':>20} "
+          f"{'get+set p50 (us)':>17} {'turn mean (us)':>15}")
+    baseline = None
+    for compact in (False, True):
+        measured, estimated = measure_memory(compact, templates, args.sessions)
+        trips = round_trip(compact, templates, 20000)
+        await turn_cost(compact, 50)
+        turns = await turn_cost(compact, 1000)
+        baseline = baseline or measured
+        print(f"{'SessionRecord' if compact else 'dict':<16} {measured:>19.0f} {estimated:>20.0f} "
+              f"{percentile(trips, 50) * 1e6:>17.1f} {sum(turns) / len(turns) * 1e6:>15.1f}")
+    print(f"SessionRecord holds {measured / baseline:.0%} of the dict footprint")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50000)
+    asyncio.run(main(parser.parse_args()))
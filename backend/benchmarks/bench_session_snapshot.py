@@ -0,0 +1,159 @@
+"""
+Benchmark: session snapshot and restore times at 100k sessions, plus a
+restart check.
+
+Fills an in-memory store with three-turn sessions and times a full snapshot,
+an incremental one after 1% of sessions changed, a compaction and a restore
+into an empty store. Then cuts the log mid-record, as a crash during an
+append would, and checks that restore drops only the torn record.
+
+Finally starts bench_server.py with SESSION_SNAPSHOT_PATH set, sends the
+first turn of some conversations, stops the server with SIGTERM, starts a
+new one and sends the second turns: each only gets a risk level if its
+session survived the restart.
+
+Usage: python benchmarks/bench_session_snapshot.py [--sessions 100000]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from load_test import wait_ready
+from session_snapshot import SessionSnapshotter
+from session_store import InMemorySessionStore
+from stub_servers import free_port
+
+
+def make_state(index: int) -> dict:
+    return {
+        "session_id": f"s-{index}",
+        "messages": [
+            {"role": "user", "content": f"I have had a headache and a mild fever for {index % 9 + 1} days"},
+            {"role": "assistant", "content": "How old are you, and have you taken anything for it?"},
+            {"role": "user", "content": f"I am {20 + index % 50}, I took paracetamol this morning"},
+        ],
+        "category": "general_symptom",
+        "age": str(20 + index % 50),
+        "symptoms": ["headache", "fever"],
+        "duration": f"{index % 9 + 1} days",
+        "risk_level": None,
+        "clarification_needed": None,
+        "all_collected": False,
+        "guidance": None,
+        "history_summary": None,
+    }
+
+
+def new_store(sessions: int) -> InMemorySessionStore:
+    return InMemorySessionStore(max_sessions=sessions * 2, memory_budget_bytes=4 * 1024 ** 3)
+
+
+async def measure(args, path: str):
+    store = new_store(args.sessions)
+    snapshotter = SessionSnapshotter(store, path=path)
+    store.track_changes()
+    for index in range(args.sessions):
+        store.set(f"s-{index}", make_state(index))
+
+    start = time.perf_counter()
+    await snapshotter.snapshot()
+    full = time.perf_counter() - start
+    full_bytes = os.path.getsize(path)
+
+    changed = args.sessions // 100
+    for index in range(changed):
+        state = store.get(f"s-{index}")
+        state["risk_level"] = "low"
+        store.set(f"s-{index}", state)
+    start = time.perf_counter()
+    await snapshotter.snapshot()
+    incremental = time.perf_counter() - start
+
+    start = time.perf_counter()
+    snapshotter.compact()
+    compact = time.perf_counter() - start
+    compacted_bytes = os.path.getsize(path)
+
+    restored_store = new_store(args.sessions)
+    start = time.perf_counter()
+    restored = SessionSnapshotter(restored_store, path=path).restore()
+    restore = time.perf_counter() - start
+    assert restored == args.sessions, restored
+    assert restored_store.get("s-0")["risk_level"] == "low"
+    assert restored_store.get(f"s-{args.sessions - 1}")["messages"][2]["content"].startswith("I am")
+
+    print(f"{args.sessions} sessions, log {full_bytes / 1024 ** 2:.1f} MB "
+          f"({full_bytes / args.sessions:.0f} B/session), {compacted_bytes / 1024 ** 2:.1f} MB compacted")
+    print(f"{'full snapshot':<28} {full * 1000:>9.0f} ms")
+    print(f"{f'incremental ({changed} changed)':<28} {incremental * 1000:>9.0f} ms")
+    print(f"{'compaction':<28} {compact * 1000:>9.0f} ms")
+    print(f"{'restore':<28} {restore * 1000:>9.0f} ms")
+
+    # A crash half way through an append leaves a torn record at the end
+    with open(path, "r+b") as f:
+        f.truncate(compacted_bytes - 7)
+    restored = SessionSnapshotter(new_store(args.sessions), path=path).restore()
+    assert restored == args.sessions - 1, restored
+    assert os.path.getsize(path) < compacted_bytes - 7
+    print(f"torn tail: {restored} sessions restored, the partial record was cut off")
+
+
+def start_server(port: int, path: str) -> subprocess.Popen:
+    env = dict(os.environ, SESSION_BACKEND="memory", SESSION_SNAPSHOT_PATH=path,
+               SESSION_SNAPSHOT_INTERVAL_SECONDS="60", FAKE_LLM_LATENCY_MS="5", FAKE_LLM_JITTER_MS="0",
+               FAKE_SUPABASE_LATENCY_MS="0", STUB_WEBHOOK_URL="")
+    return subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(__file__), "bench_server.py"), str(port)],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+
+
+async def restart_check(args, path: str):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient(timeout=30) as client:
+        server = start_server(port, path)
+        try:
+            await wait_ready(client, url)
+            for index in range(args.conversations):
+                await client.post(f"{url}/chat", json={"message": "I have a headache and nausea",
+                                                       "session_id": f"restart-{index}"})
+        finally:
+            # The interval is 60s, so only the shutdown snapshot can have saved these
+            server.send_signal(signal.SIGTERM)
+            code = server.wait(30)
+        server = start_server(port, path)
+        try:
+            await wait_ready(client, url)
+            resumed = 0
+            for index in range(args.conversations):
+                response = await client.post(f"{url}/chat", json={"message": "for 3 days",
+                                                                  "session_id": f"restart-{index}"})
+                resumed += response.json().get("risk_level") is not None
+            restored = (await client.get(f"{url}/sessions/stats")).json()["snapshot"]["restored"]
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(30)
+    print(f"SIGTERM restart: exit code {code}, {restored} sessions restored, "
+          f"{resumed}/{args.conversations} conversations resumed")
+    assert resumed == args.conversations
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        await measure(args, os.path.join(tmpdir, "sessions.log"))
+        await restart_check(args, os.path.join(tmpdir, "restart.log"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--conversations", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,45 @@
+"""
+Microbenchmark: per-turn cost of process_message as a conversation grows.
+
+Usage: python benchmarks/bench_session_turns.py [max_history]
+"""
+import asyncio
+import sys
+import time
+
+from common import make_workflow
+from history import HistoryManager
+from session_store import InMemorySessionStore
+
+
+async def run(max_history: int):
+    # Disable the message cap so the full history stays in the session
+    store = InMemorySessionStore(max_messages=max_history + 1)
+    workflow = make_workflow(session_store=store)
+    workflow.history = HistoryManager(window_tokens=10**9, window_messages=10**9)
+    workflow.warmup()
+    checkpoints = []
+    size = 10
+    while size <= max_history:
+        checkpoints.append(size)
+        size *= 10
+
+    print(f"{'history':>10} {'turn (us)':>12}")
+    turns = 0
+    for checkpoint in checkpoints:
+        while turns < checkpoint - 100:
+            await workflow.process_message("I feel tired", "bench")
+            turns += 1
+        samples = []
+        while turns < checkpoint:
+            start = time.perf_counter()
+            await workflow.process_message("I feel tired", "bench")
+            samples.append(time.perf_counter() - start)
+            turns += 1
+        average = sum(samples) / len(samples) * 1e6
+        print(f"{checkpoint:>10} {average:>12.1f}")
+
+
+if __name__ == "__main__":
+    max_history = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    asyncio.run(run(max_history))
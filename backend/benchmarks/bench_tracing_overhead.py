@@ -0,0 +1,30 @@
+"""
+Microbenchmark: cost of a traced block with tracing disabled and enabled.
+
+Usage: python benchmarks/bench_tracing_overhead.py [iterations]
+"""
+import sys
+import time
+
+import common  # noqa: F401  (puts backend on sys.path)
+from telemetry import Tracer
+
+
+def run(label: str, tracer: Tracer | None, iterations: int):
+    start = time.perf_counter()
+    if tracer is None:
+        for _ in range(iterations):
+            pass
+    else:
+        for _ in range(iterations):
+            with tracer.span("bench"):
+                pass
+    elapsed = time.perf_counter() - start
+    print(f"{label:<18} {elapsed / iterations * 1e9:8.1f} ns/span")
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    run("no instrumentation", None, iterations)
+    run("tracing disabled", Tracer(enabled=False), iterations)
+    run("tracing enabled", Tracer(enabled=True, log_spans=False), iterations)
@@ -0,0 +1,73 @@
+"""
+Negation checks for the keyword router and the rule-based extractor.
+
+Red-flag (urgent) terms may only be dropped after an explicit denial right in
+front of them, and their inflected or hyphenated forms ("chest pains",
+"mini-stroke") must route like the base term. Phrasings that merely contain a negation word, or use one as
+an intensifier, must still route urgent. The extractor keeps such symptoms
+too, and a message whose only symptoms were denied is never confident, so
+the LLM extraction still runs for it.
+
+Usage: python benchmarks/check_negation.py
+"""
+import common  # noqa: F401  (puts backend on sys.path)
+from keyword_classifier import KeywordClassifier
+from rule_extractor import RuleExtractor
+
+ROUTES = [
+    ("I've never had chest pain like this before", "urgent_symptom"),
+    ("it is not stopping bleeding", "urgent_symptom"),
+    ("I haven't had chest pain like this before", "urgent_symptom"),
+    ("no idea why my chest pain started", "urgent_symptom"),
+    ("without any chest pain", "urgent_symptom"),
+    ("I am not sure, I have chest pain", "urgent_symptom"),
+    ("no chest pain, just a cough", "general_symptom"),
+    ("denies chest pain", "general_symptom"),
+    ("I have no chest pain but I feel anxious", "mental_wellbeing_symptom"),
+    ("no fever but severe pain in my side", "urgent_symptom"),
+    # Inflected and hyphenated red flags the substring router used to catch
+    ("chest pains since morning", "urgent_symptom"),
+    ("my friend overdosed on pills", "urgent_symptom"),
+    ("I think I had a mini-stroke", "urgent_symptom"),
+    ("I am severely short of breath", "urgent_symptom"),
+    ("no chest pains, just a cough", "general_symptom"),
+    ("I am in distress", "mental_wellbeing_symptom"),
+    ("sadness everywhere", "mental_wellbeing_symptom"),
+]
+
+# message, symptoms kept, whether the LLM extraction may be skipped
+EXTRACTIONS = [
+    ("I have never had a headache like this for 2 days", ["headache"], True),
+    ("it is not stopping bleeding", ["bleeding"], False),
+    ("I've never had chest pain like this before", ["chest pain"], None),
+    ("no fever but a headache for 2 days", ["headache"], True),
+    ("no fever for 2 days", [], False),
+    ("I am not having any headache", [], False),
+]
+
+
+def check_router():
+    classifier = KeywordClassifier.from_file()
+    for message, expected in ROUTES:
+        assert classifier.classify(message) == expected, (message, classifier.classify(message), expected)
+
+
+def check_extractor():
+    extractor = RuleExtractor.from_file()
+    for message, symptoms, confident in EXTRACTIONS:
+        extraction = extractor.extract(message)
+        assert extraction["symptoms"] == symptoms, (message, extraction)
+        if confident is not None:
+            assert extractor.is_confident(extraction) == confident, (message, extraction)
+
+
+def main():
+    check_router()
+    print("✅ check_router")
+    check_extractor()
+    print("✅ check_extractor")
+    print("✅ Negation checks passed!")
+
+
+if __name__ == "__main__":
+    main()
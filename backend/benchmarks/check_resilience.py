@@ -0,0 +1,165 @@
+"""
+Fault-injection checks for the resilience layer.
+
+Breaks each dependency through its local stand-in (fake Gemini model,
+in-process Supabase fake, stub webhook server) and checks that the circuit
+breakers open, fail fast, probe when half-open and close again on recovery;
+that a request deadline cuts a hung LLM call short and the turn is answered
+by the rule-based paths; and that hedging trims the LLM latency tail within
+its budget.
+
+Usage: python benchmarks/check_resilience.py
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+from common import make_workflow, percentile
+from fake_llm import FakeGeminiChatModel
+from fake_supabase import FakeSupabase
+from stub_servers import StubWebhookServer
+from resilience import CircuitBreaker, HedgePolicy
+from supabase_client import SupabaseClient
+from webhook_client import WebhookClient
+
+STATE = {
+    "session_id": "check",
+    "category": "general_symptom",
+    "age": None,
+    "symptoms": ["headache"],
+    "duration": "2 days",
+    "risk_level": "low",
+}
+
+
+async def check_llm_breaker():
+    llm = FakeGeminiChatModel(latency=0.01, error_rate=1.0)
+    workflow = make_workflow(llm=llm)
+    breaker = workflow.llm_gateway.breaker = CircuitBreaker("llm", failure_threshold=3, reset_timeout=0.2)
+
+    # Provider errors still get an answer, from the rule-based paths, and count against the breaker
+    for index in range(3):
+        result = await workflow.process_message("I have a headache for 2 days", f"broken-{index}")
+        assert result["risk_level"] == "low" and result["response"], result
+    assert breaker.state == "open", breaker.stats()
+
+    # Open: turns are answered by the rule-based paths without calling the model
+    calls = llm.calls
+    start = time.perf_counter()
+    result = await workflow.process_message("I have a headache for 2 days", "fallback")
+    assert time.perf_counter() - start < 0.05
+    assert llm.calls == calls, llm.calls
+    assert result["risk_level"] == "low" and result["response"], result
+    assert workflow.llm_gateway.metrics["shed"]["circuit_open"] > 0
+
+    # Half-open after the reset timeout: the next call probes a healed model and closes the circuit
+    llm.error_rate = 0.0
+    await asyncio.sleep(0.25)
+    await workflow.process_message("I have a fever for 3 days", "recovered")
+    assert breaker.state == "closed" and llm.calls > calls, breaker.stats()
+
+
+async def check_deadline():
+    import main
+
+    llm = FakeGeminiChatModel(latency=5.0)
+    main.workflow = make_workflow(llm=llm)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://check") as client:
+        start = time.perf_counter()
+        response = await client.post(
+            "/chat", json={"message": "I have a cough for 4 days", "session_id": "deadline"},
+            headers={"X-Request-Timeout": "0.3"},
+        )
+        elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.text
+    assert elapsed < 1.0, elapsed
+    assert response.json()["risk_level"] == "low", response.json()
+    gateway = main.workflow.llm_gateway
+    assert gateway.metrics["shed"]["timeout"] + gateway.metrics["shed"]["deadline"] >= 1, gateway.stats()
+    # The client's short deadline is not held against the provider
+    assert gateway.breaker.failures == 0, gateway.breaker.stats()
+
+
+async def tail_latencies(hedge: HedgePolicy | None) -> tuple[list[float], int]:
+    llm = FakeGeminiChatModel(latency=0.02, slow_rate=0.03, slow_latency=0.5, seed=7)
+    workflow = make_workflow(llm=llm)
+    workflow.prompts.hedge = hedge
+    gate = asyncio.Semaphore(8)
+    latencies = []
+
+    async def call(index):
+        async with gate:
+            start = time.perf_counter()
+            await workflow.prompts.ainvoke("extraction", {"message": f"headache for {index % 9 + 1} days"})
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(call(index) for index in range(400)))
+    return latencies, workflow.llm_gateway.metrics["admitted"]
+
+
+async def check_hedging():
+    plain, plain_calls = await tail_latencies(None)
+    hedge = HedgePolicy(percentile=95, min_delay=0.01, budget=0.1, min_samples=20)
+    hedged, hedged_calls = await tail_latencies(hedge)
+    p99_plain, p99_hedged = percentile(plain, 99), percentile(hedged, 99)
+    print(f"   p99 {p99_plain * 1000:.0f}ms -> {p99_hedged * 1000:.0f}ms, "
+          f"{hedged_calls - plain_calls} extra calls, {hedge.stats()}")
+    assert p99_hedged < p99_plain / 2, (p99_plain, p99_hedged)
+    assert hedged_calls - plain_calls <= 0.1 * 400 + 1, hedged_calls
+
+
+async def check_supabase_breaker(tmpdir):
+    fake = FakeSupabase()
+    fake.available = False
+    client = SupabaseClient(client=fake, batch_size=1, flush_interval=60,
+                            journal_path=os.path.join(tmpdir, "journal.jsonl"))
+    client.breaker = CircuitBreaker("supabase", failure_threshold=2, reset_timeout=0.2)
+    for _ in range(6):
+        await client.store_interaction(STATE)
+        await client.flush()
+    # Two failed inserts open the circuit; later flushes go straight to the journal
+    assert fake.insert_calls == 2, fake.insert_calls
+    assert client.metrics["journaled"] == 6 and client.metrics["short_circuited"] == 4, client.metrics
+
+    fake.available = True
+    await asyncio.sleep(0.25)
+    await client.store_interaction(STATE)
+    await client.close()
+    assert client.breaker.state == "closed", client.breaker.stats()
+    assert len(fake.tables["interactions"]) == 7, len(fake.tables.get("interactions", []))
+
+
+async def check_webhook_breaker(server):
+    server.fail_next = 1000
+    client = WebhookClient(webhook_url=server.url, max_retries=0)
+    client.breaker = CircuitBreaker("webhook", failure_threshold=2, reset_timeout=0.3)
+    for _ in range(6):
+        await client.send_webhook(STATE)
+    await asyncio.sleep(0.15)
+    # Open after two failed deliveries: the rest wait in the queue instead of failing
+    assert server.requests == 2 and client.breaker.state == "open", (server.requests, client.stats())
+
+    server.fail_next = 0
+    await client.close()
+    assert client.breaker.state == "closed", client.breaker.stats()
+    assert client.metrics["delivered"] == 4 and client.metrics["failed"] == 2, client.metrics
+
+
+async def main():
+    for check in (check_llm_breaker, check_deadline, check_hedging):
+        await check()
+        print(f"✅ {check.__name__}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        await check_supabase_breaker(tmpdir)
+    print("✅ check_supabase_breaker")
+    with StubWebhookServer() as server:
+        await check_webhook_breaker(server)
+    print("✅ check_webhook_breaker")
+    print("✅ Resilience checks passed!")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
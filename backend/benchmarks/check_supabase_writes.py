@@ -0,0 +1,147 @@
+"""
+Write-behind checks for SupabaseClient against the in-process fake.
+
+Covers bulk coalescing, event-loop responsiveness during slow inserts,
+journal spill during an outage with replay afterwards, a replay that fails
+or crashes half way, and flush on close.
+
+Usage: python benchmarks/check_supabase_writes.py
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import common  # noqa: F401  (puts backend on sys.path)
+from fake_supabase import FakeSupabase
+from supabase_client import SupabaseClient
+
+STATE = {
+    "session_id": "check",
+    "category": "general_symptom",
+    "age": None,
+    "symptoms": ["headache"],
+    "duration": "2 days",
+    "risk_level": "low",
+}
+
+
+def make_client(fake, tmpdir, **kwargs):
+    return SupabaseClient(client=fake, journal_path=os.path.join(tmpdir, "journal.jsonl"), **kwargs)
+
+
+async def check_coalescing(tmpdir):
+    fake = FakeSupabase()
+    client = make_client(fake, tmpdir, batch_size=50, flush_interval=0.05)
+    for _ in range(120):
+        await client.store_interaction(STATE)
+    await client.close()
+    assert len(fake.tables["interactions"]) == 120
+    assert fake.insert_calls <= 4, fake.insert_calls
+
+
+async def check_loop_not_blocked(tmpdir):
+    fake = FakeSupabase(latency=0.3)
+    client = make_client(fake, tmpdir, batch_size=1, flush_interval=0.01)
+    await client.store_interaction(STATE)
+    # Measure the worst scheduling delay while the slow insert runs
+    worst = 0.0
+    deadline = time.perf_counter() + 0.4
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await asyncio.sleep(0.005)
+        worst = max(worst, time.perf_counter() - start - 0.005)
+    await client.close()
+    assert worst < 0.05, worst
+    assert len(fake.tables["interactions"]) == 1
+
+
+async def check_outage_journal_and_replay(tmpdir):
+    fake = FakeSupabase()
+    fake.available = False
+    client = make_client(fake, tmpdir, batch_size=10, flush_interval=0.02)
+    for _ in range(25):
+        await client.store_interaction(STATE)
+    await client.flush()
+    assert client.metrics["journaled"] == 25, client.metrics
+    assert os.path.exists(client.journal_path)
+
+    fake.available = True
+    await client.store_interaction(STATE)
+    await client.close()
+    assert len(fake.tables["interactions"]) == 26, len(fake.tables.get("interactions", []))
+    assert client.metrics["replayed"] == 25, client.metrics
+    assert not os.path.exists(client.journal_path)
+
+
+class SimulatedCrash(BaseException):
+    pass
+
+
+class CrashingSupabase(FakeSupabase):
+    # Dies (like a killed process) on the insert after `crash_after` calls
+    def __init__(self, crash_after: int):
+        super().__init__()
+        self.crash_after = crash_after
+
+    def table(self, name):
+        if self.insert_calls >= self.crash_after:
+            raise SimulatedCrash()
+        return super().table(name)
+
+
+async def check_replay_interrupted(tmpdir):
+    # A replay that fails half way keeps the rows not inserted yet
+    fake = FakeSupabase()
+    client = make_client(fake, tmpdir, batch_size=10)
+    client._append_journal([dict(STATE, session_id=f"row-{index}") for index in range(25)])
+    original = fake.table
+
+    def fail_after_first(name):
+        fake.available = fake.insert_calls < 1
+        return original(name)
+
+    fake.table = fail_after_first
+    await client._replay_journal()
+    assert len(fake.tables["interactions"]) == 10
+    assert os.path.exists(client.replay_path) and not os.path.exists(client.journal_path)
+
+    # A crash mid-replay loses nothing: the next start replays the leftover file
+    crashing = CrashingSupabase(crash_after=0)
+    client = make_client(crashing, tmpdir, batch_size=10)
+    try:
+        await client._replay_journal()
+    except SimulatedCrash:
+        pass
+    assert os.path.exists(client.replay_path)
+
+    fake.table = original
+    fake.available = True
+    client = make_client(fake, tmpdir, batch_size=10)
+    client.start()
+    await client.close()
+    ids = {row["session_id"] for row in fake.tables["interactions"]}
+    assert ids == {f"row-{index}" for index in range(25)}, sorted(ids)
+    assert not os.path.exists(client.replay_path) and not os.path.exists(client.journal_path)
+
+
+async def check_flush_on_close(tmpdir):
+    fake = FakeSupabase()
+    client = make_client(fake, tmpdir, batch_size=1000, flush_interval=60)
+    for _ in range(7):
+        await client.store_interaction(STATE)
+    await client.close()
+    assert len(fake.tables["interactions"]) == 7
+
+
+async def main():
+    for check in (check_coalescing, check_loop_not_blocked, check_outage_journal_and_replay,
+                  check_replay_interrupted, check_flush_on_close):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            await check(tmpdir)
+        print(f"✅ {check.__name__}")
+    print("✅ Supabase write-behind checks passed!")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
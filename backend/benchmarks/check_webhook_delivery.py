@@ -0,0 +1,86 @@
+"""
+Delivery checks for WebhookClient against a local stub webhook server.
+
+Covers plain delivery, retry after 503s, micro-batching, queue overflow and
+drain on shutdown, and shows that send_webhook no longer waits on the
+downstream.
+
+Usage: python benchmarks/check_webhook_delivery.py
+"""
+import asyncio
+import time
+
+import common  # noqa: F401  (puts backend on sys.path)
+from stub_servers import StubWebhookServer
+from webhook_client import WebhookClient
+
+STATE = {
+    "age": "30",
+    "symptoms": ["headache"],
+    "duration": "2 days",
+    "risk_level": "low",
+    "category": "general_symptom",
+}
+
+
+async def check_delivery(server):
+    client = WebhookClient(webhook_url=server.url)
+    await client.send_webhook(STATE)
+    await client.close()
+    assert server.received[-1]["category"] == "general", server.received
+    assert client.metrics["delivered"] == 1
+
+
+async def check_retry(server):
+    server.fail_next = 2
+    client = WebhookClient(webhook_url=server.url, backoff_base=0.01)
+    await client.send_webhook(STATE)
+    await client.close()
+    assert client.metrics["retries"] == 2, client.metrics
+    assert client.metrics["delivered"] == 1
+
+
+async def check_batching(server):
+    before = len(server.received)
+    client = WebhookClient(webhook_url=server.url, batch_size=10, batch_window=0.05)
+    for _ in range(25):
+        await client.send_webhook(STATE)
+    await client.close()
+    batches = server.received[before:]
+    assert sum(len(batch) for batch in batches) == 25, batches
+    assert client.metrics["batches"] <= 4, client.metrics
+
+
+async def check_overflow(server):
+    server.latency = 0.05
+    client = WebhookClient(webhook_url=server.url, queue_size=5, overflow_policy="drop_newest")
+    for _ in range(20):
+        await client.send_webhook(STATE)
+    await client.close()
+    server.latency = 0.0
+    assert client.metrics["dropped"] > 0, client.metrics
+    assert client.metrics["delivered"] + client.metrics["dropped"] == 20, client.metrics
+
+
+async def check_off_request_path(server):
+    server.latency = 0.5
+    client = WebhookClient(webhook_url=server.url)
+    start = time.perf_counter()
+    await client.send_webhook(STATE)
+    enqueue_seconds = time.perf_counter() - start
+    await client.close()
+    server.latency = 0.0
+    assert enqueue_seconds < 0.05, enqueue_seconds
+    assert client.metrics["delivered"] == 1
+
+
+async def main():
+    with StubWebhookServer() as server:
+        for check in (check_delivery, check_retry, check_batching, check_overflow, check_off_request_path):
+            await check(server)
+            print(f"✅ {check.__name__}")
+    print("✅ Webhook delivery checks passed!")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,35 @@
+"""
+Shared helpers for the benchmark scripts in this directory
+"""
+import os
+import sys
+
+# Benchmarks run from the benchmarks/ directory; make backend modules importable
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Never talk to real services from a benchmark
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-fake-key")
+os.environ["SUPABASE_URL"] = ""
+os.environ["SUPABASE_KEY"] = ""
+os.environ["WEBHOOK_URL"] = ""
+
+
+def make_workflow(llm=None, **kwargs):
+    from langgraph_workflow import SymptomCheckerWorkflow
+
+    if llm is not None:
+        return SymptomCheckerWorkflow(llm=llm, **kwargs)
+    # No LLM: exercise the rule-based paths only
+    workflow = SymptomCheckerWorkflow(**kwargs)
+    workflow.llm = None
+    return workflow
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
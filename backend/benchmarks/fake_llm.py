@@ -0,0 +1,156 @@
+"""
+Deterministic stand-in for ChatGoogleGenerativeAI used by the benchmarks.
+
+Answers each workflow prompt (single-shot triage, extraction, risk, guidance)
+with plausible output derived from the message text, after a configurable
+simulated latency. A fraction of calls can be made to fail or to be slow.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+SYMPTOM_VOCABULARY = [
+    "headache", "fever", "cough", "nausea", "rash", "dizziness", "fatigue",
+    "back pain", "sore throat", "chest pain", "stomach ache", "anxiety",
+]
+DURATION_PATTERN = re.compile(r"\b(\d+)\s*(day|days|week|weeks|month|months)\b")
+AGE_PATTERN = re.compile(r"\b(?:i am|i'm|age\s*[:\-]?)\s*(\d{1,3})\b")
+BATCH_ITEM_PATTERN = re.compile(r'^\d+\. (".*")$', re.MULTILINE)
+KNOWN_PATTERN = re.compile(r"^Known (age|symptoms|duration): (.*)$", re.MULTILINE)
+GUIDANCE = (
+    "These symptoms may indicate a potential health concern. "
+    "Consider consulting a healthcare professional, and monitor symptoms and seek help if they persist."
+)
+
+
+class SimulatedLLMError(RuntimeError):
+    pass
+
+
+class SimulatedRateLimitError(SimulatedLLMError):
+    status_code = 429
+
+
+class FakeGeminiChatModel(BaseChatModel):
+    latency: float = 0.05
+    jitter: float = 0.0
+    # A fraction of calls take slow_latency instead, like a provider's long tail
+    slow_rate: float = 0.0
+    slow_latency: float = 1.0
+    error_rate: float = 0.0
+    seed: int = 0
+    token_interval: float = 0.005
+    # Calls beyond this many in flight fail with a 429, like a provider quota (0 = unlimited)
+    max_concurrency: int = 0
+    # Extra latency per additional message in a batched extraction call
+    batch_item_latency: float = 0.0
+    _rng: random.Random = PrivateAttr()
+    _calls: int = PrivateAttr(default=0)
+    _in_flight: int = PrivateAttr(default=0)
+    _rate_limited: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context):
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    @property
+    def rate_limited(self) -> int:
+        return self._rate_limited
+
+    def _delay(self) -> float:
+        if self.slow_rate and self._rng.random() < self.slow_rate:
+            return self.slow_latency
+        return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def _result(self, messages) -> ChatResult:
+        self._calls += 1
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise SimulatedLLMError("simulated Gemini failure")
+        content = respond(messages[0].content, messages[-1].content)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._delay())
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.max_concurrency and self._in_flight >= self.max_concurrency:
+            self._rate_limited += 1
+            raise SimulatedRateLimitError("429 Resource has been exhausted (simulated quota)")
+        self._in_flight += 1
+        delay = self._delay()
+        if self.batch_item_latency and "handling a batch" in messages[0].content:
+            delay += self.batch_item_latency * (len(BATCH_ITEM_PATTERN.findall(messages[-1].content)) - 1)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self._in_flight -= 1
+        return self._result(messages)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        # First token after the full latency, then the rest word by word
+        result = await self._agenerate(messages)
+        words = result.generations[0].message.content.split(" ")
+        for index, word in enumerate(words):
+            if index:
+                await asyncio.sleep(self.token_interval)
+            text = word if index == len(words) - 1 else word + " "
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+
+def extract(text: str) -> dict:
+    lowered = text.lower()
+    duration = DURATION_PATTERN.search(lowered)
+    age = AGE_PATTERN.search(lowered)
+    return {
+        "age": age.group(1) if age else None,
+        "symptoms": [s for s in SYMPTOM_VOCABULARY if s in lowered],
+        "duration": f"{duration.group(1)} {duration.group(2)}" if duration else None,
+    }
+
+
+def risk_for(category: str, duration: str | None) -> str:
+    if "urgent" in category:
+        return "high"
+    if "mental" in category or any(unit in (duration or "") for unit in ("week", "month")):
+        return "moderate"
+    return "low"
+
+
+def respond(system: str, user: str) -> str:
+    if "triage assistant" in system:
+        known = dict(KNOWN_PATTERN.findall(system))
+        category = re.search(r"^Category: (.*)$", system, re.MULTILINE).group(1)
+        result = extract(user)
+        if not result["age"] and known.get("age", "unknown") != "unknown":
+            result["age"] = known["age"]
+        if known.get("symptoms", "none") != "none":
+            result["symptoms"] = known["symptoms"].split(", ") + result["symptoms"]
+        if not result["duration"] and known.get("duration", "unknown") != "unknown":
+            result["duration"] = known["duration"]
+        complete = result["symptoms"] and result["duration"]
+        result["risk_level"] = risk_for(category, result["duration"]) if complete else None
+        result["guidance"] = GUIDANCE if complete else None
+        return json.dumps(result)
+    if "handling a batch" in system:
+        return json.dumps([extract(json.loads(item)) for item in BATCH_ITEM_PATTERN.findall(user)])
+    if "extraction assistant" in system:
+        return json.dumps(extract(user))
+    if "risk awareness assistant" in system:
+        fields = dict(part.split(": ", 1) for part in user.split(", ") if ": " in part)
+        return risk_for(fields.get("Category", ""), fields.get("Duration"))
+    return GUIDANCE
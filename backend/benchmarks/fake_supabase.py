@@ -0,0 +1,49 @@
+"""
+In-process stand-in for the supabase SDK client.
+
+Mimics the synchronous table(...).insert(rows).execute() chain, including a
+blocking network delay, and can be switched unavailable to simulate an outage.
+"""
+import threading
+import time
+
+
+class FakeSupabaseUnavailable(RuntimeError):
+    pass
+
+
+class _Insert:
+    def __init__(self, fake, table: str, rows):
+        self._fake = fake
+        self._table = table
+        self._rows = rows if isinstance(rows, list) else [rows]
+
+    def execute(self):
+        time.sleep(self._fake.latency)
+        with self._fake.lock:
+            self._fake.insert_calls += 1
+            if not self._fake.available:
+                raise FakeSupabaseUnavailable("simulated Supabase outage")
+            self._fake.tables.setdefault(self._table, []).extend(self._rows)
+        return self._rows
+
+
+class _Table:
+    def __init__(self, fake, name: str):
+        self._fake = fake
+        self._name = name
+
+    def insert(self, rows):
+        return _Insert(self._fake, self._name, rows)
+
+
+class FakeSupabase:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.available = True
+        self.insert_calls = 0
+        self.tables: dict[str, list] = {}
+        self.lock = threading.Lock()
+
+    def table(self, name: str) -> _Table:
+        return _Table(self, name)
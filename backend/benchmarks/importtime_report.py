@@ -0,0 +1,84 @@
+"""
+Import-time profile of a backend module, parsed from `python -X importtime`.
+
+Runs the import in a fresh interpreter from the backend directory and
+reports the total, the time per top-level package (self time summed over
+all of its submodules, so nothing is counted twice) and the slowest single
+modules. Use it to spot a heavy dependency creeping back into startup.
+
+Usage: python benchmarks/importtime_report.py [--module main] [--top 15] [--json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(output: str) -> list[dict]:
+    # "import time:       self [us] |  cumulative | imported package", indented by depth
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return modules
+
+
+def profile(module: str) -> list[dict]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def summarize(modules: list[dict], top: int) -> dict:
+    packages = defaultdict(int)
+    for entry in modules:
+        packages[entry["module"].split(".")[0]] += entry["self_us"]
+    return {
+        "total_ms": sum(entry["self_us"] for entry in modules) / 1000,
+        "modules": len(modules),
+        "packages": [
+            {"package": name, "ms": us / 1000}
+            for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        ],
+        "slowest_modules": [
+            {"module": entry["module"], "self_ms": entry["self_us"] / 1000, "cumulative_ms": entry["cumulative_us"] / 1000}
+            for entry in sorted(modules, key=lambda entry: -entry["self_us"])[:top]
+        ],
+    }
+
+
+def main(args):
+    report = summarize(profile(args.module), args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"import {args.module}: {report['total_ms']:.0f}ms across {report['modules']} modules")
+    print(f"\n{'package':<32} {'ms':>8}")
+    for row in report["packages"]:
+        print(f"{row['package']:<32} {row['ms']:>8.1f}")
+    print(f"\n{'module':<56} {'self ms':>8} {'cum ms':>8}")
+    for row in report["slowest_modules"]:
+        print(f"{row['module'][:56]:<56} {row['self_ms']:>8.1f} {row['cumulative_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,200 @@
+"""
+Load test for /chat against a fake Gemini backend and stub Supabase/webhook.
+
+Starts benchmarks/bench_server.py in a subprocess, then drives two-turn
+conversations (symptoms, then duration) at the given concurrency in phases
+of growing session counts. Reports throughput, p50/p95/p99 latency, error
+counts and server RSS growth per session, and writes everything to a JSON
+file so runs can be compared between commits.
+
+Usage:
+    python benchmarks/load_test.py --sessions 500 1000 2000 --concurrency 50 \\
+        --llm-latency-ms 50 --llm-error-rate 0.01 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from common import BACKEND_DIR, percentile
+from stub_servers import StubWebhookServer, free_port
+
+FIRST_TURNS = [
+    "I have a headache and some nausea",
+    "I've been coughing and have a sore throat",
+    "I feel dizzy and have fatigue",
+    "I am 42 and I have back pain",
+    "I've been feeling stressed and anxious, with a headache",
+]
+SECOND_TURNS = ["for 2 days", "about 3 weeks", "for 1 month", "since 5 days"]
+
+
+def rss_bytes(pid: int) -> int | None:
+    # Linux only; other platforms report null memory figures
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_server(port: int, args, webhook_url: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        FAKE_LLM_LATENCY_MS=str(args.llm_latency_ms),
+        FAKE_LLM_JITTER_MS=str(args.llm_jitter_ms),
+        FAKE_LLM_ERROR_RATE=str(args.llm_error_rate),
+        FAKE_SUPABASE_LATENCY_MS=str(args.supabase_latency_ms),
+        STUB_WEBHOOK_URL=webhook_url,
+    )
+    return subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(__file__), "bench_server.py"), str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{base_url}/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("bench server did not become ready")
+
+
+async def run_phase(client, base_url: str, first_session: int, sessions: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def send(session_id: str, message: str):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    f"{base_url}/chat", json={"message": message, "session_id": session_id}
+                )
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    async def conversation(index: int):
+        session_id = f"load-{index}"
+        await send(session_id, FIRST_TURNS[index % len(FIRST_TURNS)])
+        await send(session_id, SECOND_TURNS[index % len(SECOND_TURNS)])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(i) for i in range(first_session, first_session + sessions)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def run(args) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "concurrency": args.concurrency,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_jitter_ms": args.llm_jitter_ms,
+            "llm_error_rate": args.llm_error_rate,
+            "supabase_latency_ms": args.supabase_latency_ms,
+            "webhook_latency_ms": args.webhook_latency_ms,
+        },
+        "phases": [],
+    }
+    with StubWebhookServer(latency=args.webhook_latency_ms / 1000) as webhook:
+        server = start_server(port, args, webhook.url)
+        try:
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(timeout=60.0, limits=limits) as client:
+                await wait_ready(client, base_url)
+                baseline_rss = rss_bytes(server.pid)
+                results["baseline_rss_bytes"] = baseline_rss
+                total_sessions = 0
+                for sessions in args.sessions:
+                    new_sessions = sessions - total_sessions
+                    if new_sessions <= 0:
+                        continue
+                    phase = await run_phase(client, base_url, total_sessions, new_sessions, args.concurrency)
+                    total_sessions = sessions
+                    rss = rss_bytes(server.pid)
+                    phase["total_sessions"] = total_sessions
+                    phase["rss_bytes"] = rss
+                    phase["rss_growth_per_session"] = (
+                        (rss - baseline_rss) / total_sessions if rss is not None and baseline_rss is not None else None
+                    )
+                    results["phases"].append(phase)
+                    print(
+                        f"{total_sessions:>7} sessions  {phase['throughput_rps']:8.1f} req/s  "
+                        f"p50 {phase['p50_ms']:7.1f}ms  p95 {phase['p95_ms']:7.1f}ms  "
+                        f"p99 {phase['p99_ms']:7.1f}ms  errors {phase['errors']:>4}  "
+                        f"rss {(rss or 0) / 2**20:7.1f}MiB"
+                    )
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+        results["webhooks_received"] = len(webhook.received)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[250, 500, 1000],
+                        help="cumulative session counts at which to report (default: 250 500 1000)")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--llm-jitter-ms", type=float, default=20)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--supabase-latency-ms", type=float, default=20)
+    parser.add_argument("--webhook-latency-ms", type=float, default=10)
+    parser.add_argument("--output", default=None,
+                        help="JSON results path (default: benchmarks/results/load-<timestamp>.json)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = asyncio.run(run(args))
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results", f"load-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
@@ -0,0 +1,59 @@
+"""
+Local stub HTTP servers for the benchmark and delivery-check scripts
+"""
+import asyncio
+import random
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubWebhookServer:
+    """Records every POST body; latency, error rate and forced failures are tunable."""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fail_next = 0
+        self.received: list = []
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}/webhook"
+
+        app = FastAPI()
+
+        @app.post("/webhook")
+        async def webhook(request: Request):
+            self.requests += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return Response(status_code=503)
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return Response(status_code=503)
+            self.received.append(await request.json())
+            return {"ok": True}
+
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
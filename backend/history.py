@@ -0,0 +1,95 @@
+import os
+from dotenv import load_dotenv
+from session_state import estimate_tokens
+
+load_dotenv()
+
+SUMMARY_SEPARATOR = " | "
+ELLIPSIS = "… "
+
+
+def rolling_summary(summary: str | None, messages: list[dict], max_tokens: int) -> str:
+    """Fold messages into a running digest capped at max_tokens.
+
+    Deterministic and LLM-free: the user's own words are appended in order
+    and the oldest text is dropped (at a word boundary) once the cap is hit.
+    The structured fields (age, symptoms, duration) already carry what the
+    workflow extracted from those turns.
+    """
+    parts = [summary] if summary else []
+    parts.extend(" ".join(m.get("content", "").split()) for m in messages if m.get("content"))
+    text = SUMMARY_SEPARATOR.join(parts)
+    max_chars = max_tokens * 4
+    if len(text) > max_chars:
+        text = text[len(text) - max_chars + len(ELLIPSIS):]
+        cut = text.find(" ")
+        text = ELLIPSIS + (text[cut + 1:] if 0 <= cut < 40 else text)
+    return text
+
+
+class HistoryManager:
+    """Keeps each session's message history within a token and message budget.
+
+    The newest messages that fit in HISTORY_WINDOW_TOKENS (and at most
+    HISTORY_WINDOW_MESSAGES) stay verbatim; the latest message is always kept.
+    Older ones are folded into the session's history_summary, itself capped
+    at HISTORY_SUMMARY_TOKENS, so a session's memory and any prompt built
+    from its history stay bounded however long the conversation runs.
+    Token counts are cached in the MessageLog, so windowing is a binary
+    search rather than a pass over the history.
+    """
+
+    def __init__(
+        self,
+        window_tokens: int | None = None,
+        window_messages: int | None = None,
+        summary_tokens: int | None = None,
+        summarize=rolling_summary,
+    ):
+        self.window_tokens = window_tokens or int(os.getenv("HISTORY_WINDOW_TOKENS", 512))
+        self.window_messages = window_messages or int(os.getenv("HISTORY_WINDOW_MESSAGES", 20))
+        self.summary_tokens = summary_tokens or int(os.getenv("HISTORY_SUMMARY_TOKENS", 256))
+        self.summarize = summarize
+        self.metrics = {
+            "turns": 0,
+            "compactions": 0,
+            "messages_folded": 0,
+            "tokens_total": 0,
+            "tokens_max": 0,
+            "bytes_total": 0,
+            "bytes_max": 0,
+        }
+
+    def compact(self, state: dict) -> None:
+        """Fold messages outside the window into history_summary, in place."""
+        messages = state["messages"]
+        keep = max(1, min(self.window_messages, messages.tail_within(self.window_tokens)))
+        if len(messages) > keep:
+            folded = messages[:len(messages) - keep]
+            state["history_summary"] = self.summarize(state.get("history_summary"), folded, self.summary_tokens)
+            state["messages"] = messages.tail(keep)
+            self.metrics["compactions"] += 1
+            self.metrics["messages_folded"] += len(folded)
+        self._observe(state)
+
+    def _observe(self, state: dict):
+        summary = state.get("history_summary") or ""
+        tokens = state["messages"].tokens + estimate_tokens(summary)
+        size = state["messages"].content_bytes + len(summary)
+        metrics = self.metrics
+        metrics["turns"] += 1
+        metrics["tokens_total"] += tokens
+        metrics["tokens_max"] = max(metrics["tokens_max"], tokens)
+        metrics["bytes_total"] += size
+        metrics["bytes_max"] = max(metrics["bytes_max"], size)
+
+    def stats(self) -> dict:
+        turns = self.metrics["turns"]
+        return {
+            **self.metrics,
+            # Session size after each turn's compaction, averaged over turns
+            "avg_tokens_per_session": self.metrics["tokens_total"] / turns if turns else 0.0,
+            "avg_bytes_per_session": self.metrics["bytes_total"] / turns if turns else 0.0,
+            "window_tokens": self.window_tokens,
+            "summary_tokens": self.summary_tokens,
+        }
@@ -0,0 +1,115 @@
+import json
+import os
+import re
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(__file__), "lexicons.json")
+DEFAULT_CATEGORY = "general_symptom"
+
+
+def trie_pattern(terms) -> str:
+    # Factor shared prefixes into a trie-shaped regex so the engine rejects a
+    # position after one character instead of trying every term in turn.
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        ends = "" in node
+        branches = []
+        for char in sorted(c for c in node if c):
+            atom = r"\s+" if char == " " else re.escape(char)
+            branches.append(atom + build(node[char]))
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Optional continuation keeps longest-match semantics ("severe pain" over "severe")
+        return f"(?:{body})?" if ends else body
+
+    return build(trie)
+
+
+def negation_pattern(cues, window: int, terminators=()) -> re.Pattern | None:
+    # Matches a negation cue up to `window` words before the end of the searched
+    # text. Negation scope ends at a clause break ("no fever but chest pain").
+    if not cues:
+        return None
+    cue_alternation = "|".join(
+        re.escape(cue).replace(r"\ ", r"\s+") for cue in sorted(cues, key=len, reverse=True)
+    )
+    stop = "|".join(re.escape(t) for t in terminators)
+    word = rf"(?!(?:{stop})\b)[\w'-]+" if stop else r"[\w'-]+"
+    return re.compile(rf"\b(?:{cue_alternation})\s+(?:{word}\s+){{0,{window - 1}}}$")
+
+
+class KeywordClassifier:
+    """Single-pass keyword classifier compiled once from a lexicon file.
+
+    All terms across all categories are merged into one alternation regex
+    with word boundaries. Each hit adds its weight to its category unless a
+    negation cue ("no", "without", ...) appears just before it. Terms of a
+    category marked "negation": "denial" (the red flags) are only dropped
+    after an explicit denial directly in front ("no chest pain", "denies
+    chest pain"), never after looser phrasing such as "never had chest pain
+    like this". Categories are checked in lexicon order and the first one
+    whose score reaches its threshold wins.
+    """
+
+    def __init__(self, lexicon: dict):
+        self.categories = []
+        self.denial_only = set()
+        self.thresholds = {}
+        self.terms = {}
+        for category, spec in lexicon["categories"].items():
+            self.categories.append(category)
+            self.thresholds[category] = float(spec.get("threshold", 1.0))
+            if spec.get("negation") == "denial":
+                self.denial_only.add(category)
+            for term, weight in spec["terms"].items():
+                self.terms[self._normalize(term)] = (category, float(weight))
+
+        self.pattern = re.compile(rf"(?<!\w)(?:{trie_pattern(self.terms)})(?![\w-])")
+
+        self.negation = negation_pattern(
+            lexicon.get("negation_cues", []),
+            int(lexicon.get("negation_window", 3)),
+            lexicon.get("negation_terminators", []),
+        )
+        self.denial = negation_pattern(lexicon.get("denial_cues", []), 1)
+
+    @classmethod
+    def from_file(cls, path: str | None = None) -> "KeywordClassifier":
+        path = path or os.getenv("KEYWORD_LEXICON_PATH") or DEFAULT_LEXICON_PATH
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(text.lower().replace("’", "'").split())
+
+    def score(self, message: str) -> dict[str, float]:
+        text = message.lower().replace("’", "'")
+        scores = dict.fromkeys(self.categories, 0.0)
+        for match in self.pattern.finditer(text):
+            term = match.group(0)
+            category, weight = self.terms.get(term) or self.terms[self._normalize(term)]
+            negation = self.denial if category in self.denial_only else self.negation
+            if negation and negation.search(text, max(0, match.start() - 60), match.start()):
+                continue
+            scores[category] += weight
+        return scores
+
+    def reaches(self, message: str, category: str) -> bool:
+        return self.score(message)[category] >= self.thresholds[category]
+
+    def classify(self, message: str) -> str:
+        scores = self.score(message)
+        for category in self.categories:
+            if scores[category] >= self.thresholds[category]:
+                return category
+        return DEFAULT_CATEGORY
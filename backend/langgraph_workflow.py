@@ -1,11 +1,24 @@
 from typing import TypedDict, Annotated, Literal
-from langgraph.graph import StateGraph, END
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, ValidationError, field_validator
+import contextvars
 import os
+import time
 from dotenv import load_dotenv
 from supabase_client import SupabaseClient
 from webhook_client import WebhookClient
+from session_store import SessionConflict, SessionStore, create_session_store
+from session_state import MessageLog
+from history import HistoryManager
+from keyword_classifier import KeywordClassifier
+from rule_extractor import RuleExtractor
+from risk_model import RiskModel
+from prompts import PromptRegistry
+from llm_gateway import LLMGateway, LLMOverloaded
+from llm_cache import LLMResponseCache, normalize_text
+from resilience import HedgePolicy
+from telemetry import log_event, tracer
+from session_concurrency import RequestCoalescer, SessionLocks
+from micro_batcher import BatchResultError, MicroBatcher
 import json
 
 # Load environment variables
@@ -14,7 +27,7 @@ load_dotenv()
  
 
 class SymptomState(TypedDict):
-    messages: Annotated[list, "append"]
+    messages: Annotated[MessageLog, "append"]
     session_id: str
     category: Literal["general_symptom", "urgent_symptom", "mental_wellbeing_symptom"] | None
     age: str | None
@@ -23,52 +36,282 @@ class SymptomState(TypedDict):
     risk_level: Literal["low", "moderate", "high"] | None
     clarification_needed: str | None
     all_collected: bool
+    guidance: str | None
+    history_summary: str | None
+
+class TurnAssessment(BaseModel):
+    # Schema for single-shot mode: one LLM call covers extraction, risk and guidance
+    age: str | None = None
+    symptoms: list[str] = []
+    duration: str | None = None
+    risk_level: Literal["low", "moderate", "high"] | None = None
+    guidance: str | None = None
+
+    @field_validator("age", mode="before")
+    @classmethod
+    def _age_to_str(cls, value):
+        return str(value) if value is not None else None
+
+    @field_validator("risk_level", mode="before")
+    @classmethod
+    def _normalize_risk(cls, value):
+        return value.strip().lower() if isinstance(value, str) else value
+
+def _strip_code_fence(content: str) -> str:
+    content = content.strip()
+    if content.startswith("```json"):
+        content = content[7:]
+    if content.startswith("```"):
+        content = content[3:]
+    if content.endswith("```"):
+        content = content[:-3]
+    return content.strip()
+
+FALLBACK_GUIDANCE = (
+    "Based on your symptoms and their duration, this may indicate a potential health concern. "
+    "Consider consulting a healthcare professional for proper evaluation. "
+    "Please monitor your symptoms and seek help if they persist."
+)
+
+# Placeholder for the Gemini client until the first call needs it
+_DEFERRED = object()
+
+URGENT_CATEGORY = "urgent_symptom"
+ROUTING_MODES = ("per_message", "sticky")
+# graph: start -> router -> symptom node. lean: the graph is entered at the
+# symptom node for the category routed beforehand. direct: that node is called
+# without LangGraph, which saves its per-invoke overhead on this fixed topology.
+GRAPH_EXECUTIONS = ("graph", "lean", "direct")
+# Re-runs of a turn whose session another worker wrote mid-turn
+TURN_CONFLICT_RETRIES = 2
+# Set while a /chat/stream turn runs its graph: single-shot triage then leaves
+# the guidance to the streamed call instead of returning it in one piece
+_streaming = contextvars.ContextVar("streaming", default=False)
+# Interactions completed by the turn being applied. They are stored and sent
+# only after the session write commits, so a conflicted attempt leaves no trace
+_completed = contextvars.ContextVar("completed")
 
 class SymptomCheckerWorkflow:
-    def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError(
-                "GOOGLE_API_KEY not found in environment variables. "
-                "Please set it in your Vercel project settings."
-            )
-        self.llm = ChatGoogleGenerativeAI(model="gemini-pro", temperature=0.3)
+    def __init__(self, session_store: SessionStore | None = None, llm=None):
+        if llm is None:
+            api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError(
+                    "GOOGLE_API_KEY not found in environment variables. "
+                    "Please set it in your Vercel project settings."
+                )
+        # The Gemini client, prompt chains and graph are built on first use (or
+        # by warmup()) so importing and constructing the workflow stays cheap
+        self._llm = llm if llm is not None else _DEFERRED
+        self._graph = None
+        # Every LLM call is admitted through one gateway; when it sheds a call
+        # the rule-based extraction, risk and guidance paths answer instead
+        self.llm_gateway = LLMGateway()
+        # Each prompt chain is compiled once, on its first call. Hedging sends a
+        # second copy of a call that runs past the prompt's recent p95 latency.
+        hedge = HedgePolicy() if os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true" else None
+        self.prompts = PromptRegistry(lambda: self.llm, gateway=self.llm_gateway, hedge=hedge)
+        self.response_cache = LLMResponseCache()
         self.supabase = SupabaseClient()
         self.webhook_client = WebhookClient()
-        self.graph = self._build_graph()
-        self.sessions = {}  # Store session state
+        self.keyword_classifier = KeywordClassifier.from_file()
+        # Deterministic extraction runs before any LLM call and replaces it when confident
+        self.rule_extractor = RuleExtractor.from_file()
+        self.rule_extraction_metrics = {"messages": 0, "confident": 0, "llm_skipped": 0}
+        # Local risk classifier (None until one is trained); the LLM only sees low-confidence cases
+        self.risk_model = RiskModel.from_file(canonicalize=self.rule_extractor.canonical)
+        self.risk_metrics = {"local": 0, "escalated": 0}
+        # Concurrent extraction calls share one batched LLM request when EXTRACTION_BATCH_SIZE > 1
+        batch_size = int(os.getenv("EXTRACTION_BATCH_SIZE", 1))
+        self.extraction_batcher = (
+            MicroBatcher(
+                self._run_extraction_batch, batch_size,
+                float(os.getenv("EXTRACTION_BATCH_WINDOW_MS", 5)) / 1000
+            )
+            if batch_size > 1 else None
+        )
+        # Single-shot mode asks for extraction, risk and guidance in one call and
+        # falls back to the multi-call path when the output does not validate
+        self.single_shot = os.getenv("LLM_SINGLE_SHOT", "true").lower() == "true"
+        self.sessions = session_store if session_store is not None else create_session_store()  # Store session state
+        # Bounds each session's history: old turns fold into history_summary
+        self.history = HistoryManager()
+        # per_message classifies every message; sticky keeps a session's category
+        # once set and only escalates it when urgent keywords appear
+        self.routing_mode = os.getenv("ROUTING_MODE", "per_message")
+        if self.routing_mode not in ROUTING_MODES:
+            raise ValueError(f"Unknown ROUTING_MODE: {self.routing_mode}")
+        self.execution = os.getenv("GRAPH_EXECUTION", "graph")
+        if self.execution not in GRAPH_EXECUTIONS:
+            raise ValueError(f"Unknown GRAPH_EXECUTION: {self.execution}")
+        self.symptom_nodes = {
+            "general_symptom": self._traced("general_symptom_node", self.general_symptom_node),
+            "urgent_symptom": self._traced("urgent_symptom_node", self.urgent_symptom_node),
+            "mental_wellbeing_symptom": self._traced("mental_wellbeing_node", self.mental_wellbeing_node),
+        }
+        self.session_locks = SessionLocks()
+        self.coalescer = RequestCoalescer()
+        self.stream_metrics = {"streams": 0, "ttft_total_seconds": 0.0, "ttft_max_seconds": 0.0, "ttft_avg_seconds": 0.0}
         
+    @property
+    def llm(self):
+        if self._llm is _DEFERRED:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            self._llm = ChatGoogleGenerativeAI(model="gemini-pro", temperature=0.3)
+        return self._llm
+
+    @llm.setter
+    def llm(self, value):
+        self._llm = value
+        self.prompts.chains.clear()
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = self._build_graph()
+        return self._graph
+
+    def warmup(self) -> dict:
+        """Build everything deferred at construction; returns seconds per step."""
+        steps = {
+            "llm": lambda: self.llm,
+            "prompts": lambda: self.prompts.compile() if self.llm is not None else None,
+            "graph": lambda: self.graph if self.execution != "direct" else None,
+            "storage": self.supabase.connect,
+        }
+        timings = {}
+        for name, step in steps.items():
+            start = time.perf_counter()
+            step()
+            timings[name] = time.perf_counter() - start
+        return timings
+
     def _build_graph(self):
+        from langgraph.graph import StateGraph, END
+
         workflow = StateGraph(SymptomState)
-        
-        workflow.add_node("start", self.start_node)
-        workflow.add_node("router", self.router_node)
-        workflow.add_node("general_symptom", self.general_symptom_node)
-        workflow.add_node("urgent_symptom", self.urgent_symptom_node)
-        workflow.add_node("mental_wellbeing", self.mental_wellbeing_node)
-        
+        node_names = {
+            "general_symptom": "general_symptom",
+            "urgent_symptom": "urgent_symptom",
+            "mental_wellbeing_symptom": "mental_wellbeing"
+        }
+        for category, name in node_names.items():
+            workflow.add_node(name, self.symptom_nodes[category])
+            workflow.add_edge(name, END)
+
+        if self.execution == "lean":
+            # The category is already in the input, so no start or router hop
+            workflow.set_conditional_entry_point(self.route_to_symptom_node, node_names)
+            return workflow.compile()
+
+        workflow.add_node("start", self._traced("start_node", self.start_node))
+        workflow.add_node("router", self._traced("router_node", self.router_node))
         workflow.set_entry_point("start")
         workflow.add_edge("start", "router")
-        workflow.add_conditional_edges(
-            "router",
-            self.route_to_symptom_node,
-            {
-                "general_symptom": "general_symptom",
-                "urgent_symptom": "urgent_symptom",
-                "mental_wellbeing": "mental_wellbeing"
-            }
-        )
-        workflow.add_edge("general_symptom", END)
-        workflow.add_edge("urgent_symptom", END)
-        workflow.add_edge("mental_wellbeing", END)
-        
+        workflow.add_conditional_edges("router", self.route_to_symptom_node, node_names)
+
         return workflow.compile()
     
+    @staticmethod
+    def _traced(name: str, node):
+        async def traced_node(state: SymptomState):
+            with tracer.span(name):
+                return await node(state)
+        return traced_node
+    
     async def process_message(self, message: str, session_id: str):
+        # A double-submitted message shares the first submission's result,
+        # including one first submitted to the stream endpoint
+        return await self.coalescer.run(
+            (session_id, message), lambda: self._process_message(message, session_id),
+            from_events=lambda events: {key: events[-1][1][key] for key in ("response", "risk_level")}
+        )
+    
+    async def _process_message(self, message: str, session_id: str):
+        # Turns for one session run one at a time, in arrival order
+        async with self.session_locks.hold(session_id):
+            session = await self._run_turn(message, session_id)
+            
+            # Generate response
+            response = await self._generate_response(session)
+        
+        return {
+            "response": response,
+            "risk_level": session.get("risk_level")
+        }
+    
+    async def process_message_stream(self, message: str, session_id: str):
+        # Yields (event, data) pairs: risk_level once the graph has run, then
+        # guidance tokens as the LLM produces them, then done. A duplicate of
+        # an in-flight turn replays its events instead of running it again.
+        async for event, data in self.coalescer.stream(
+            (session_id, message), lambda: self._process_message_stream(message, session_id),
+            from_result=self._result_events
+        ):
+            yield event, dict(data)
+    
+    @staticmethod
+    def _result_events(result: dict) -> list[tuple[str, dict]]:
+        return [
+            ("risk_level", {"risk_level": result["risk_level"]}),
+            ("token", {"text": result["response"]}),
+            ("done", result),
+        ]
+    
+    async def _process_message_stream(self, message: str, session_id: str):
+        start = time.perf_counter()
+        async with self.session_locks.hold(session_id):
+            token = _streaming.set(True)
+            try:
+                session = await self._run_turn(message, session_id)
+            finally:
+                # Reset before yielding: the caller's context must not keep it
+                _streaming.reset(token)
+            yield "risk_level", {"risk_level": session.get("risk_level")}
+            
+            chunks = []
+            async for token in self._stream_response(session):
+                if not chunks:
+                    self._record_ttft(time.perf_counter() - start)
+                chunks.append(token)
+                yield "token", {"text": token}
+        
+        yield "done", {
+            "response": "".join(chunks).strip(),
+            "risk_level": session.get("risk_level")
+        }
+    
+    def _record_ttft(self, seconds: float):
+        metrics = self.stream_metrics
+        metrics["streams"] += 1
+        metrics["ttft_total_seconds"] += seconds
+        metrics["ttft_max_seconds"] = max(metrics["ttft_max_seconds"], seconds)
+        metrics["ttft_avg_seconds"] = metrics["ttft_total_seconds"] / metrics["streams"]
+    
+    async def _run_turn(self, message: str, session_id: str) -> dict:
+        # Session locks are per process; on a shared store another worker can
+        # write the session mid-turn, and the turn is re-run on its state
+        for attempt in range(TURN_CONFLICT_RETRIES + 1):
+            try:
+                session, completed = await self._apply_turn(message, session_id)
+            except SessionConflict:
+                log_event("session.conflict", session_id=session_id, attempt=attempt + 1)
+                if attempt == TURN_CONFLICT_RETRIES:
+                    raise
+                continue
+            for interaction in completed:
+                # Store in Supabase, then queue the webhook for background delivery
+                await self.supabase.store_interaction(interaction)
+                await self.webhook_client.send_webhook(interaction)
+            return session
+    
+    async def _apply_turn(self, message: str, session_id: str) -> tuple[dict, list[dict]]:
         # Initialize or get session state
-        if session_id not in self.sessions:
-            self.sessions[session_id] = {
-                "messages": [],
+        session = await self.sessions.aget(session_id)
+        if session is None:
+            session = {
+                "messages": MessageLog(),
                 "session_id": session_id,
                 "category": None,
                 "age": None,
@@ -76,58 +319,59 @@ class SymptomCheckerWorkflow:
                 "duration": None,
                 "risk_level": None,
                 "clarification_needed": None,
-                "all_collected": False
+                "all_collected": False,
+                "guidance": None,
+                "history_summary": None
             }
         
-        # Get current state and add new message
-        current_state = self.sessions[session_id].copy()
-        current_state["messages"] = current_state["messages"].copy()
-        current_state["messages"].append({"role": "user", "content": message})
-        current_state["symptoms"] = current_state["symptoms"].copy()
+        elif not isinstance(session["messages"], MessageLog):
+            session["messages"] = MessageLog(session["messages"])
         
-        # Run graph
-        result = await self.graph.ainvoke(current_state)
+        # Nodes only return the fields they change, so the turn input shares
+        # the message log and symptom list with the stored session.
+        turn_input = dict(session)
+        turn_input["messages"] = session["messages"].append({"role": "user", "content": message})
         
-        # Update session with result
-        self.sessions[session_id] = result
+        # Run graph, collecting per-node deltas
+        delta = {"messages": turn_input["messages"]}
+        completed = []
+        token = _completed.set(completed)
+        try:
+            if self.execution != "graph":
+                with tracer.span("router_node"):
+                    delta["category"] = turn_input["category"] = self._route(session["category"], message)
+            if self.execution == "direct":
+                node_delta = await self.symptom_nodes[turn_input["category"]](turn_input)
+                if node_delta:
+                    delta.update(node_delta)
+            else:
+                async for update in self.graph.astream(turn_input, stream_mode="updates"):
+                    for node_delta in update.values():
+                        if node_delta:
+                            delta.update(node_delta)
+        finally:
+            _completed.reset(token)
         
-        # Generate response
-        response = await self._generate_response(result)
-        
-        return {
-            "response": response,
-            "risk_level": result.get("risk_level")
-        }
+        # Merge deltas back into the session
+        session.update(delta)
+        self.history.compact(session)
+        await self.sessions.aset(session_id, session)
+        return session, completed
     
     async def start_node(self, state: SymptomState):
-        return state
+        return {}
     
     async def router_node(self, state: SymptomState):
-        user_message = state["messages"][-1]["content"].lower()
-        
-        # Emergency/urgent keywords
-        urgent_keywords = [
-            "chest pain", "heart attack", "stroke", "severe", "emergency",
-            "can't breathe", "difficulty breathing", "unconscious", "severe pain",
-            "bleeding", "severe injury", "poisoning", "overdose"
-        ]
-        
-        # Mental wellbeing keywords
-        mental_keywords = [
-            "stress", "anxiety", "depression", "sad", "worried", "panic",
-            "emotional", "mental health", "feeling down", "overwhelmed",
-            "suicidal", "self-harm"
-        ]
-        
-        if any(keyword in user_message for keyword in urgent_keywords):
-            category = "urgent_symptom"
-        elif any(keyword in user_message for keyword in mental_keywords):
-            category = "mental_wellbeing_symptom"
-        else:
-            category = "general_symptom"
-        
-        state["category"] = category
-        return state
+        return {"category": self._route(state["category"], state["messages"][-1]["content"])}
+    
+    def _route(self, previous: str | None, message: str) -> str:
+        # Urgent and mental wellbeing lexicons are loaded from lexicons.json
+        if self.routing_mode == "sticky" and previous is not None:
+            # A follow-up such as "3 days" keeps the session's category
+            if previous != URGENT_CATEGORY and self.keyword_classifier.reaches(message, URGENT_CATEGORY):
+                return URGENT_CATEGORY
+            return previous
+        return self.keyword_classifier.classify(message)
     
     def route_to_symptom_node(self, state: SymptomState):
         return state["category"]
@@ -144,8 +388,29 @@ class SymptomCheckerWorkflow:
     async def _process_symptom_node(self, state: SymptomState, category_type: str):
         user_message = state["messages"][-1]["content"]
         
-        # Extract information from conversation
-        await self._extract_information(state, user_message)
+        # Extract information from conversation, rules first
+        extraction = self.rule_extractor.extract(user_message)
+        self.rule_extraction_metrics["messages"] += 1
+        delta = None
+        use_llm = bool(self.llm)
+        if self.rule_extractor.is_confident(extraction):
+            self.rule_extraction_metrics["confident"] += 1
+            delta = self._rule_updates(state, extraction)
+            merged = {**state, **delta}
+            if use_llm and self.single_shot and merged["symptoms"] and merged["duration"]:
+                # The turn completes: one triage call is cheaper than separate risk and guidance calls
+                delta = None
+            elif use_llm:
+                self.rule_extraction_metrics["llm_skipped"] += 1
+        if delta is None and use_llm and self.single_shot:
+            try:
+                delta = await self._assess_turn(state, user_message, category_type, extraction)
+            except Exception as e:
+                self._llm_failed("triage", e, state["session_id"])
+                use_llm = False
+        if delta is None:
+            delta = await self._extract_information(state, user_message, use_llm=use_llm, extraction=extraction)
+        state = {**state, **delta}
         
         # Check what's missing
         missing_fields = []
@@ -157,96 +422,217 @@ class SymptomCheckerWorkflow:
         # If we have symptoms but no duration, ask for duration
         # If we have both, assess risk and trigger webhook
         if missing_fields:
+            # Guidance is only meaningful once every field is known
+            delta.pop("risk_level", None)
+            delta.pop("guidance", None)
             field = missing_fields[0]
             if field == "symptoms":
-                state["clarification_needed"] = "Could you please describe your symptoms in more detail?"
+                delta["clarification_needed"] = "Could you please describe your symptoms in more detail?"
             elif field == "duration":
-                state["clarification_needed"] = "How long have you been experiencing these symptoms?"
+                delta["clarification_needed"] = "How long have you been experiencing these symptoms?"
         else:
             # All required fields collected
-            state["all_collected"] = True
-            state["risk_level"] = await self._assess_risk_level(state, category_type)
-            
-            # Store in Supabase
-            await self.supabase.store_interaction(state)
-            
-            # Trigger webhook
-            await self.webhook_client.send_webhook(state)
+            delta["all_collected"] = True
+            delta["clarification_needed"] = None
+            delta.setdefault("guidance", None)
+            if not delta.get("risk_level"):
+                delta["risk_level"] = await self._assess_risk_level(state, category_type, use_llm=use_llm)
+            # Stored and sent by _run_turn once the session write commits
+            _completed.get().append({**state, **delta})
         
-        return state
+        return delta
+    
+    async def _cached_prompt(self, name: str, inputs: dict, cache_key: tuple, session_id: str, text: str | None = None):
+        # Returns (content, cost_seconds); cost is None on a cache hit. Callers
+        # store the content themselves once it has been validated.
+        content = self.response_cache.get(cache_key, text=text)
+        if content is not None:
+            return content, None
+        start = time.perf_counter()
+        response = await self.prompts.ainvoke(name, inputs, session_id=session_id)
+        return response.content, time.perf_counter() - start
     
-    async def _extract_information(self, state: SymptomState, message: str):
-        if self.llm:
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", """You are a medical information extraction assistant. Extract the following from the user's message:
-- Age (if mentioned, as a string or null)
-- Symptoms (list of symptoms mentioned)
-- Duration (how long symptoms have been present, as a string)
+    async def _assess_turn(
+        self, state: SymptomState, message: str, category_type: str, extraction: dict
+    ) -> dict | None:
+        streaming = _streaming.get()
+        response = await self.prompts.ainvoke("triage_stream" if streaming else "triage", {
+            "category": category_type,
+            "age": state.get("age") or "unknown",
+            "symptoms": ", ".join(state["symptoms"]) or "none",
+            "duration": state.get("duration") or "unknown",
+            "message": message
+        }, session_id=state["session_id"])
+        try:
+            assessment = TurnAssessment.model_validate_json(_strip_code_fence(response.content))
+        except ValidationError:
+            return None
 
-Return ONLY a JSON object with keys: age, symptoms (array), duration.
-If information is not present, use null for age and empty array for symptoms, null for duration.
-Example: {"age": "25", "symptoms": ["headache", "fever"], "duration": "2 days"}"""),
-                ("user", message)
-            ])
-            chain = prompt | self.llm
-            response = await chain.ainvoke({})
+        updates = {}
+        if assessment.age and not state.get("age"):
+            updates["age"] = assessment.age
+        new_symptoms = [s for s in assessment.symptoms if s not in state["symptoms"]]
+        if new_symptoms:
+            updates["symptoms"] = state["symptoms"] + new_symptoms
+        if assessment.duration and not state.get("duration"):
+            updates["duration"] = assessment.duration
+        self._apply_rule_extraction(state, extraction, updates)
+        if streaming and assessment.risk_level:
+            updates["risk_level"] = assessment.risk_level
+        elif assessment.risk_level and assessment.guidance:
+            updates["risk_level"] = assessment.risk_level
+            updates["guidance"] = assessment.guidance.strip()
+        return updates
+    
+    async def _extract_information(
+        self, state: SymptomState, message: str, use_llm: bool = True, extraction: dict | None = None
+    ) -> dict:
+        # Returns only the fields that changed; state itself is left untouched.
+        if extraction is None:
+            extraction = self.rule_extractor.extract(message)
+        updates = {}
+        if self.llm and use_llm:
+            version = self.prompts.select_version("extraction", state["session_id"])
+            cache_key = ("extraction", version, normalize_text(message))
             try:
-                content = response.content.strip()
-                if content.startswith("```json"):
-                    content = content[7:]
-                if content.startswith("```"):
-                    content = content[3:]
-                if content.endswith("```"):
-                    content = content[:-3]
-                content = content.strip()
-                extracted = json.loads(content)
-                if extracted.get("age") and not state.get("age"):
-                    state["age"] = str(extracted["age"])
-                if extracted.get("symptoms"):
-                    state["symptoms"].extend([s for s in extracted["symptoms"] if s not in state["symptoms"]])
-                if extracted.get("duration") and not state.get("duration"):
-                    state["duration"] = extracted["duration"]
-            except:
-                pass
-        if not state.get("symptoms"):
-            tokens = [t.strip(",.") for t in message.split()]
-            symptoms = [t for t in tokens if len(t) > 4]
+                content, cost = await self._extraction_prompt(message, cache_key, state["session_id"])
+            except Exception as e:
+                self._llm_failed("extraction", e, state["session_id"])
+                content = None
+            if content is not None:
+                try:
+                    extracted = json.loads(_strip_code_fence(content))
+                    if cost is not None:
+                        self.response_cache.put(cache_key, content, cost, text=message)
+                    if extracted.get("age") and not state.get("age"):
+                        updates["age"] = str(extracted["age"])
+                    if extracted.get("symptoms"):
+                        new_symptoms = [s for s in extracted["symptoms"] if s not in state["symptoms"]]
+                        if new_symptoms:
+                            updates["symptoms"] = state["symptoms"] + new_symptoms
+                    if extracted.get("duration") and not state.get("duration"):
+                        updates["duration"] = extracted["duration"]
+                except (ValueError, TypeError, AttributeError) as e:
+                    # Unusable model output: the rule-based extraction below fills in
+                    log_event("extraction.unparseable", error=str(e), session_id=state["session_id"])
+        self._apply_rule_extraction(state, extraction, updates)
+        return updates
+    
+    async def _extraction_prompt(self, message: str, cache_key: tuple, session_id: str):
+        if self.extraction_batcher is None:
+            return await self._cached_prompt(
+                "extraction", {"message": message}, cache_key, session_id, text=message
+            )
+        content = self.response_cache.get(cache_key, text=message)
+        if content is not None:
+            return content, None
+        start = time.perf_counter()
+        # Batched only with messages from sessions pinned to the same prompt versions
+        versions = (cache_key[1], self.prompts.select_version("extraction_batch", session_id))
+        try:
+            content = await self.extraction_batcher.submit(message, versions)
+        except BatchResultError:
+            # The batched answer could not be lined up with its messages; ask for this one alone
+            return await self._cached_prompt(
+                "extraction", {"message": message}, cache_key, session_id, text=message
+            )
+        return content, time.perf_counter() - start
+    
+    async def _run_extraction_batch(self, messages: list[str], versions: tuple[str, str]) -> list[str]:
+        # One LLM call for every message in the batch; returns one JSON object string per message
+        if len(messages) == 1:
+            response = await self.prompts.ainvoke("extraction", {"message": messages[0]}, version=versions[0])
+            return [response.content]
+        numbered = "\n".join(f"{index}. {json.dumps(message)}" for index, message in enumerate(messages, 1))
+        response = await self.prompts.ainvoke(
+            "extraction_batch", {"count": len(messages), "messages": numbered}, version=versions[1]
+        )
+        try:
+            items = json.loads(_strip_code_fence(response.content))
+        except json.JSONDecodeError as e:
+            raise BatchResultError(str(e)) from e
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise BatchResultError("batched extraction did not return a list of objects")
+        return [json.dumps(item) for item in items]
+    
+    @staticmethod
+    def _llm_failed(prompt: str, error: Exception, session_id: str):
+        # The caller falls back to its rule-based path. Shedding is routine
+        # under load; provider errors are logged, and the gateway has already
+        # counted them against the circuit breaker.
+        if not isinstance(error, LLMOverloaded):
+            log_event("llm.error", prompt=prompt, error=str(error), session_id=session_id)
+    
+    @staticmethod
+    def _rule_updates(state: SymptomState, extraction: dict) -> dict:
+        # Used in place of LLM extraction, so new symptoms add to the known ones
+        updates = {}
+        new_symptoms = [s for s in extraction["symptoms"] if s not in state["symptoms"]]
+        if new_symptoms:
+            updates["symptoms"] = state["symptoms"] + new_symptoms
+        if extraction["age"] and not state.get("age"):
+            updates["age"] = extraction["age"]
+        if extraction["duration"] and not state.get("duration"):
+            updates["duration"] = extraction["duration"]
+        return updates
+    
+    @staticmethod
+    def _apply_rule_extraction(state: SymptomState, extraction: dict, updates: dict):
+        # Fills only what the LLM and earlier turns left empty
+        if not (updates.get("symptoms") or state.get("symptoms")):
+            # Last resort for words the lexicon does not know
+            symptoms = extraction["symptoms"] or [w for w in extraction["unknown"] if len(w) > 4][:5]
             if symptoms:
-                state["symptoms"] = symptoms[:5]
-        if not state.get("duration"):
-            import re
-            m = re.search(r"\b(\d+)\s*(day|days|week|weeks|month|months)\b", message.lower())
-            if m:
-                state["duration"] = f"{m.group(1)} {m.group(2)}"
-        if not state.get("age"):
-            import re
-            m2 = re.search(r"\b(?:i am|i'm|age\s*[:\-]?)\s*(\d{1,3})\b", message.lower())
-            if m2:
-                state["age"] = m2.group(1)
+                updates["symptoms"] = symptoms
+        if extraction["duration"] and not (updates.get("duration") or state.get("duration")):
+            updates["duration"] = extraction["duration"]
+        if extraction["age"] and not (updates.get("age") or state.get("age")):
+            updates["age"] = extraction["age"]
     
-    async def _assess_risk_level(self, state: SymptomState, category_type: str) -> Literal["low", "moderate", "high"]:
-        if self.llm:
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", """You are a health risk awareness assistant. Assess the risk level based on:
-- Category: {category}
-- Symptoms: {symptoms}
-- Duration: {duration}
-
-Return ONLY one word: "low", "moderate", or "high".
-Do not provide diagnosis or treatment. Only assess general risk awareness level."""),
-                ("user", f"Category: {category_type}, Symptoms: {', '.join(state['symptoms'])}, Duration: {state['duration']}")
-            ])
-            chain = prompt | self.llm
-            response = await chain.ainvoke({})
-            risk = response.content.strip().lower()
+    async def _assess_risk_level(
+        self, state: SymptomState, category_type: str, use_llm: bool = True
+    ) -> Literal["low", "moderate", "high"]:
+        local_risk = None
+        if self.risk_model is not None:
+            local_risk, confidence = self.risk_model.predict(state)
+            if confidence >= self.risk_model.min_confidence or not (self.llm and use_llm):
+                self.risk_metrics["local"] += 1
+                return local_risk
+            self.risk_metrics["escalated"] += 1
+        if self.llm and use_llm:
+            # Keyed on the full (category, symptoms, duration) tuple; never similarity-matched
+            version = self.prompts.select_version("risk", state["session_id"])
+            cache_key = (
+                "risk", version, category_type,
+                tuple(sorted(normalize_text(s) for s in state["symptoms"])),
+                normalize_text(state["duration"] or "")
+            )
+            try:
+                content, cost = await self._cached_prompt("risk", {
+                    "category": category_type,
+                    "symptoms": ", ".join(state["symptoms"]),
+                    "duration": state["duration"]
+                }, cache_key, state["session_id"])
+            except Exception as e:
+                self._llm_failed("risk", e, state["session_id"])
+                return local_risk or self._rule_risk_level(state, category_type)
+            risk = content.strip().lower()
+            if risk in ["low", "moderate", "high"] and cost is not None:
+                self.response_cache.put(cache_key, risk, cost)
             if risk not in ["low", "moderate", "high"]:
-                if category_type == "urgent":
+                if local_risk:
+                    risk = local_risk
+                elif category_type == "urgent":
                     risk = "high"
                 elif category_type == "mental_wellbeing":
                     risk = "moderate"
                 else:
                     risk = "low"
             return risk
+        return self._rule_risk_level(state, category_type)
+    
+    @staticmethod
+    def _rule_risk_level(state: SymptomState, category_type: str) -> Literal["low", "moderate", "high"]:
         if category_type == "urgent":
             return "high"
         if category_type == "mental_wellbeing":
@@ -256,43 +642,63 @@ Do not provide diagnosis or treatment. Only assess general risk awareness level.
             return "moderate"
         return "low"
     
+    def _guidance_inputs(self, state: SymptomState) -> dict:
+        category_map = {
+            "general_symptom": "general",
+            "urgent_symptom": "urgent",
+            "mental_wellbeing_symptom": "mental_wellbeing"
+        }
+        return {
+            "category": category_map.get(state["category"], "general"),
+            "symptoms": ", ".join(state["symptoms"]),
+            "duration": state["duration"],
+            "risk_level": state["risk_level"]
+        }
+    
+    async def _stream_response(self, state: SymptomState):
+        # Only LLM guidance is streamed token by token; every other response
+        # (clarifications, fallbacks) is one chunk. Single-shot triage leaves
+        # guidance out on streamed turns so it is streamed here too.
+        streams_guidance = (
+            self.llm
+            and state.get("all_collected")
+            and not state.get("clarification_needed")
+            and not state.get("guidance")
+        )
+        if not streams_guidance:
+            yield await self._generate_response(state)
+            return
+        streamed = False
+        try:
+            async for chunk in self.prompts.astream(
+                "guidance", self._guidance_inputs(state), session_id=state["session_id"]
+            ):
+                if chunk.content:
+                    streamed = True
+                    yield chunk.content
+        except Exception as e:
+            if streamed:
+                # Part of the guidance is already out; the client gets an error event
+                raise
+            self._llm_failed("guidance", e, state["session_id"])
+            # Failed before the first token, so the static guidance is the whole reply
+            yield FALLBACK_GUIDANCE
+    
     async def _generate_response(self, state: SymptomState) -> str:
         if state.get("clarification_needed"):
             return state["clarification_needed"]
         if state.get("all_collected"):
-            category_map = {
-                "general_symptom": "general",
-                "urgent_symptom": "urgent",
-                "mental_wellbeing_symptom": "mental_wellbeing"
-            }
-            category = category_map.get(state["category"], "general")
+            if state.get("guidance"):
+                return state["guidance"]
             if self.llm:
-                prompt = ChatPromptTemplate.from_messages([
-                    ("system", """You are a health awareness assistant. Provide general, non-diagnostic guidance.
-
-Rules:
-- DO NOT diagnose diseases
-- DO NOT recommend medicines
-- DO NOT provide treatment steps
-- Use awareness-based language only
-- Allowed phrases: "may indicate a potential health concern", "consider consulting a healthcare professional", "monitor symptoms and seek help if they persist"
-
-Category: {category}
-Symptoms: {symptoms}
-Duration: {duration}
-Risk Level: {risk_level}
-
-Provide supportive, awareness-based guidance in 2-3 sentences."""),
-                    ("user", f"Category: {category}, Symptoms: {', '.join(state['symptoms'])}, Duration: {state['duration']}, Risk: {state['risk_level']}")
-                ])
-                chain = prompt | self.llm
-                response = await chain.ainvoke({})
-                return response.content.strip()
-            return (
-                "Based on your symptoms and their duration, this may indicate a potential health concern. "
-                "Consider consulting a healthcare professional for proper evaluation. "
-                "Please monitor your symptoms and seek help if they persist."
-            )
+                try:
+                    response = await self.prompts.ainvoke(
+                        "guidance", self._guidance_inputs(state), session_id=state["session_id"]
+                    )
+                    return response.content.strip()
+                except Exception as e:
+                    self._llm_failed("guidance", e, state["session_id"])
+            return FALLBACK_GUIDANCE
         elif state.get("symptoms") and not state.get("duration"):
             return "How long have you been experiencing these symptoms?"
         elif not state.get("symptoms"):
@@ -0,0 +1,172 @@
+import json
+import math
+import os
+import re
+import time
+from collections import Counter, OrderedDict
+from dotenv import load_dotenv
+from keyword_classifier import DEFAULT_LEXICON_PATH
+from rule_extractor import NUMBER_WORDS, VAGUE_QUANTITIES, parse_number
+
+load_dotenv()
+
+_WORD = re.compile(r"[a-z0-9']+")
+_UNITS = ("hour", "day", "week", "fortnight", "month", "year")
+
+
+def guard_pattern(lexicon: dict) -> re.Pattern:
+    """Tokens that must match exactly for two texts to share a similarity bucket:
+    numbers (digits or words), duration units, vague quantities and every
+    negation term of the router lexicon."""
+    negations = {
+        " ".join(term.lower().split())
+        for key in ("negation_cues", "denial_cues", "negation_markers")
+        for term in lexicon.get(key, [])
+    }
+    words = sorted(negations | set(VAGUE_QUANTITIES), key=len, reverse=True)
+    alternation = "|".join(re.escape(word).replace(r"\ ", r"\s+") for word in words)
+    units = "|".join(_UNITS)
+    return re.compile(rf"\d+|\b(?:{NUMBER_WORDS}|(?:{units})s?|{alternation})(?![\w'])")
+
+
+def guard_tokens(pattern: re.Pattern, text: str) -> tuple:
+    # "three weeks" and "3 week" pin the same tokens; "two days" does not
+    tokens = []
+    for match in pattern.finditer(text.lower().replace("’", "'")):
+        token = " ".join(match.group(0).replace("-", " ").split())
+        number = parse_number(token)
+        if number is not None and token not in ("a", "an"):
+            token = str(number)
+        elif token.endswith("s") and token[:-1] in _UNITS:
+            token = token[:-1]
+        tokens.append(token)
+    return tuple(tokens)
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def _vectorize(text: str) -> tuple[dict[str, float], float]:
+    words = _WORD.findall(text.lower())
+    features = Counter(words)
+    features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+    return features, norm
+
+
+def _cosine(a: tuple[dict, float], b: tuple[dict, float]) -> float:
+    (va, na), (vb, nb) = a, b
+    if len(va) > len(vb):
+        va, vb = vb, va
+    return sum(weight * vb.get(feature, 0) for feature, weight in va.items()) / (na * nb)
+
+
+class LLMResponseCache:
+    """Size-bounded LRU cache of LLM responses with TTLs.
+
+    The exact tier is keyed on normalized prompt inputs. The optional
+    similarity tier compares bag-of-words vectors of the raw text within a
+    bucket that also pins every number (digits or words), duration unit and
+    negation term of the router lexicon in the text, so "two days" never
+    answers for "three weeks". Set LLM_CACHE_SIMILARITY_THRESHOLD to enable it.
+    """
+
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        ttl_seconds: float | None = None,
+        similarity_threshold: float | None = None,
+        lexicon_path: str | None = None,
+        clock=time.monotonic,
+    ):
+        self.max_entries = max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("LLM_CACHE_TTL_SECONDS", 3600))
+        if similarity_threshold is None:
+            similarity_threshold = float(os.getenv("LLM_CACHE_SIMILARITY_THRESHOLD", 0))
+        self.similarity_threshold = similarity_threshold
+        path = lexicon_path or os.getenv("KEYWORD_LEXICON_PATH") or DEFAULT_LEXICON_PATH
+        with open(path, encoding="utf-8") as f:
+            self._guard = guard_pattern(json.load(f))
+        self._clock = clock
+        # key -> (value, expires_at, cost_seconds, vector, bucket)
+        self._entries: OrderedDict = OrderedDict()
+        # similarity bucket -> keys with a vector in that bucket
+        self._index: dict[tuple, set] = {}
+        self.metrics = {
+            "exact_hits": 0,
+            "similar_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "latency_saved_seconds": 0.0,
+        }
+
+    def _bucket(self, key: tuple, text: str) -> tuple:
+        return key[:-1] + guard_tokens(self._guard, text)
+
+    def get(self, key: tuple, text: str | None = None) -> str | None:
+        entry = self._entries.get(key)
+        if entry is not None and not self._expired(key, entry):
+            self._entries.move_to_end(key)
+            return self._hit("exact_hits", entry)
+        if text is not None and self.similarity_threshold > 0:
+            match = self._nearest(self._bucket(key, text), _vectorize(text))
+            if match is not None:
+                self._entries.move_to_end(match)
+                return self._hit("similar_hits", self._entries[match])
+        self.metrics["misses"] += 1
+        return None
+
+    def put(self, key: tuple, value: str, cost_seconds: float = 0.0, text: str | None = None):
+        if key in self._entries:
+            self._remove(key)
+        vector = bucket = None
+        if text is not None and self.similarity_threshold > 0:
+            vector = _vectorize(text)
+            bucket = self._bucket(key, text)
+            self._index.setdefault(bucket, set()).add(key)
+        self._entries[key] = (value, self._clock() + self.ttl_seconds, cost_seconds, vector, bucket)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.metrics["evictions"] += 1
+
+    def _hit(self, kind: str, entry: tuple) -> str:
+        self.metrics[kind] += 1
+        self.metrics["latency_saved_seconds"] += entry[2]
+        return entry[0]
+
+    def _expired(self, key: tuple, entry: tuple) -> bool:
+        if entry[1] > self._clock():
+            return False
+        self._remove(key)
+        self.metrics["expirations"] += 1
+        return True
+
+    def _nearest(self, bucket: tuple, vector) -> tuple | None:
+        best_key, best_score = None, self.similarity_threshold
+        for key in list(self._index.get(bucket, ())):
+            entry = self._entries[key]
+            if self._expired(key, entry):
+                continue
+            score = _cosine(vector, entry[3])
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def _remove(self, key: tuple):
+        _, _, _, _, bucket = self._entries.pop(key)
+        if bucket is not None:
+            keys = self._index[bucket]
+            keys.discard(key)
+            if not keys:
+                del self._index[bucket]
+
+    def stats(self) -> dict:
+        lookups = self.metrics["exact_hits"] + self.metrics["similar_hits"] + self.metrics["misses"]
+        hits = lookups - self.metrics["misses"]
+        return {
+            **self.metrics,
+            "entries": len(self._entries),
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
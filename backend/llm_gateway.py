@@ -0,0 +1,236 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from resilience import CircuitBreaker, deadline_var, time_left
+from telemetry import log_event
+
+load_dotenv()
+
+
+class LLMOverloaded(Exception):
+    """Raised instead of calling the LLM when the gateway sheds a request."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"LLM call shed: {reason}")
+        self.reason = reason
+
+
+def is_overload_error(error: BaseException) -> bool:
+    # Provider throttling (429 / ResourceExhausted / 503) or a timed-out call
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status in (429, 503):
+        return True
+    name = type(error).__name__
+    return "ResourceExhausted" in name or "RateLimit" in name or "429" in str(error)[:200]
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations, so waiters are served in order."""
+
+    def __init__(self, rate: float, burst: float, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self._clock = clock
+        self._updated = clock()
+
+    def reserve(self) -> float:
+        # Takes a token (possibly on credit) and returns how long to wait for it
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self):
+        self.tokens += 1
+
+
+class LLMGateway:
+    """Admission control shared by every LLM call in the process.
+
+    A call waits, in FIFO order, for a slot under an adaptive concurrency
+    limit (AIMD: +1/limit per success, halved on provider throttling or a
+    call slower than LLM_LATENCY_TARGET_SECONDS) and then for a token from an
+    optional requests-per-second bucket. If the queue is already
+    LLM_QUEUE_MAX deep, or the call would not get through both before its
+    deadline, it raises LLMOverloaded so the caller can take a rule-based path.
+    The same happens while the circuit breaker is open (after repeated provider
+    errors or timeouts) and when an admitted call outlives the request deadline
+    or LLM_CALL_TIMEOUT_SECONDS. Provider throttling is left to the limit.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float | None = None,
+        burst: float | None = None,
+        initial_limit: float | None = None,
+        min_limit: float | None = None,
+        max_limit: float | None = None,
+        max_queue: int | None = None,
+        queue_timeout: float | None = None,
+        latency_target: float | None = None,
+        call_timeout: float | None = None,
+        decrease_cooldown: float = 1.0,
+    ):
+        # 0 disables the rate limiter; set it to the provider quota
+        rate = rate_per_second if rate_per_second is not None else float(os.getenv("LLM_RATE_PER_SECOND", 0))
+        burst = burst or float(os.getenv("LLM_RATE_BURST") or max(rate, 1))
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.min_limit = min_limit or float(os.getenv("LLM_CONCURRENCY_MIN", 2))
+        self.max_limit = max_limit or float(os.getenv("LLM_CONCURRENCY_MAX", 256))
+        self.limit = initial_limit or float(os.getenv("LLM_CONCURRENCY_INITIAL", 32))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("LLM_QUEUE_MAX", 200))
+        self.queue_timeout = queue_timeout or float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", 2.0))
+        self.latency_target = latency_target or float(os.getenv("LLM_LATENCY_TARGET_SECONDS", 5.0))
+        self.call_timeout = call_timeout or float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", 20))
+        self.decrease_cooldown = decrease_cooldown
+        self.breaker = CircuitBreaker("llm")
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        self.metrics = {
+            "admitted": 0,
+            "queued": 0,
+            "max_queue_depth": 0,
+            "shed": {"queue_full": 0, "deadline": 0, "rate_limit": 0, "circuit_open": 0, "timeout": 0},
+            "overload_errors": 0,
+            "limit_decreases": 0,
+        }
+
+    @asynccontextmanager
+    async def slot(self, deadline: float | None = None, bounded: bool = True):
+        # deadline is a time.monotonic() value; defaults to now + queue_timeout,
+        # or the request deadline if that comes first. bounded=False leaves the
+        # call itself untimed (streams, which cannot fall back halfway through).
+        if deadline is None:
+            deadline = time.monotonic() + self.queue_timeout
+            if deadline_var.get() is not None:
+                deadline = min(deadline, deadline_var.get())
+        if deadline <= time.monotonic():
+            self._shed("deadline")
+        if not self.breaker.allow():
+            self._shed("circuit_open")
+        try:
+            await self._acquire(deadline)
+            try:
+                await self._take_token(deadline)
+            except BaseException:
+                self._release()
+                raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.metrics["admitted"] += 1
+        start = time.monotonic()
+        error = None
+        finished = False
+        timeout = time_left(self.call_timeout)
+        # Running out of the request's own time says nothing about the provider
+        provider_timeout = timeout >= self.call_timeout
+        try:
+            if bounded:
+                async with asyncio.timeout(timeout):
+                    yield
+            else:
+                yield
+            finished = True
+        except TimeoutError as e:
+            error = e
+            self.metrics["shed"]["timeout"] += 1
+            raise LLMOverloaded("timeout") from e
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._release()
+            self._adjust(time.monotonic() - start, error)
+            if finished:
+                self.breaker.record_success()
+            elif error is not None and (
+                provider_timeout if isinstance(error, TimeoutError) else not is_overload_error(error)
+            ):
+                self.breaker.record_failure()
+            else:
+                # Throttled (the limit handles that) or cancelled, e.g. a hedge that lost
+                self.breaker.release()
+
+    async def _acquire(self, deadline: float):
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._shed("queue_full")
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.metrics["queued"] += 1
+        self.metrics["max_queue_depth"] = max(self.metrics["max_queue_depth"], len(self._waiters))
+        try:
+            await asyncio.wait_for(future, deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            self._shed("deadline")
+        except asyncio.CancelledError:
+            # Cancelled right after being handed a slot: give it back
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+
+    async def _take_token(self, deadline: float):
+        if self.bucket is None:
+            return
+        wait = self.bucket.reserve()
+        if time.monotonic() + wait > deadline:
+            self.bucket.refund()
+            self._shed("rate_limit")
+        if wait:
+            await asyncio.sleep(wait)
+
+    def _shed(self, reason: str):
+        self.metrics["shed"][reason] += 1
+        raise LLMOverloaded(reason)
+
+    def _release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self.limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def _adjust(self, elapsed: float, error: Exception | None):
+        overloaded = error is not None and is_overload_error(error)
+        if overloaded:
+            self.metrics["overload_errors"] += 1
+        if overloaded or elapsed > self.latency_target:
+            now = time.monotonic()
+            # One decrease per cooldown, not one per call that was in flight at the time
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self._last_decrease = now
+                previous = self.limit
+                self.limit = max(self.min_limit, self.limit / 2)
+                self.metrics["limit_decreases"] += 1
+                log_event("llm_gateway.limit_decreased", previous=round(previous, 2), limit=round(self.limit, 2))
+        elif error is None:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._wake()
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "shed": dict(self.metrics["shed"]),
+            "circuit": self.breaker.stats(),
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+        }
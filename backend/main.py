@@ -1,11 +1,21 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from starlette.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
+import asyncio
 import os
+import json
+import time
+import uuid
 from langgraph_workflow import SymptomCheckerWorkflow
+from batch_triage import BatchRunner, BatchTooLarge, iter_lines, read_ndjson_body
+from llm_gateway import is_overload_error
+from resilience import deadline_after, request_timeout
+from session_snapshot import SessionSnapshotter
+from session_store import MAX_SESSION_ID_LENGTH, SessionConflict
+from telemetry import log_event, request_id_var, tracer
 
 load_dotenv()
 
@@ -25,8 +35,94 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize workflow
-workflow = SymptomCheckerWorkflow()
+# Built on first use (or at startup) rather than at import: importing this
+# module stays cheap, and the Gemini SDK, prompt chains, graph and Supabase
+# SDK load later still, on first need or in the background warmup
+workflow: SymptomCheckerWorkflow | None = None
+
+def get_workflow() -> SymptomCheckerWorkflow:
+    global workflow
+    if workflow is None:
+        workflow = SymptomCheckerWorkflow()
+    return workflow
+
+# Running totals over all /chat/batch requests
+chat_batch_metrics: dict = {}
+
+# Set at startup when SESSION_SNAPSHOT_PATH is configured
+snapshotter: SessionSnapshotter | None = None
+
+def _collector(read):
+    # Scraping /metrics should not be what builds the workflow
+    return lambda: read(workflow) if workflow is not None else {}
+
+tracer.register_collector("session_store", _collector(lambda w: w.sessions.stats()))
+tracer.register_collector("llm_cache", _collector(lambda w: w.response_cache.stats()))
+tracer.register_collector("webhook", _collector(lambda w: w.webhook_client.stats()))
+tracer.register_collector("storage", _collector(lambda w: w.supabase.stats()))
+tracer.register_collector("stream", _collector(lambda w: w.stream_metrics))
+tracer.register_collector("history", _collector(lambda w: w.history.stats()))
+tracer.register_collector("chat_batch", lambda: chat_batch_metrics)
+tracer.register_collector("session_snapshot", lambda: snapshotter.stats() if snapshotter is not None else {})
+tracer.register_collector("session_locks", _collector(lambda w: w.session_locks.stats()))
+tracer.register_collector("coalescer", _collector(lambda w: w.coalescer.stats()))
+tracer.register_collector("llm_gateway", _collector(lambda w: w.llm_gateway.stats()))
+tracer.register_collector("llm_hedge", _collector(lambda w: w.prompts.hedge.stats() if w.prompts.hedge else {}))
+tracer.register_collector("rule_extraction", _collector(lambda w: w.rule_extraction_metrics))
+tracer.register_collector("risk_model", _collector(lambda w: w.risk_metrics))
+tracer.register_collector(
+    "extraction_batch", _collector(lambda w: w.extraction_batcher.stats() if w.extraction_batcher else {})
+)
+
+async def warm_workflow() -> dict:
+    # Imports and client construction are blocking, so they run in a worker thread
+    timings = await asyncio.to_thread(get_workflow().warmup)
+    for step, seconds in timings.items():
+        tracer.observe(f"warmup.{step}", seconds)
+    log_event("warmup.done", **{step: round(seconds, 4) for step, seconds in timings.items()})
+    return timings
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    # Tag everything done for this request (spans, logs, webhooks) with one id
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        # Label by endpoint rather than raw path to keep metric cardinality bounded
+        endpoint = request.scope.get("endpoint")
+        tracer.observe(f"http.{endpoint.__name__ if endpoint else 'unmatched'}", time.perf_counter() - start)
+        request_id_var.reset(token)
+
+@app.on_event("startup")
+async def startup():
+    # Constructing is cheap and surfaces configuration errors at boot; the
+    # heavy parts warm in the background so the first chat does not pay for them
+    global snapshotter
+    get_workflow()
+    # Rows journaled by a previous run (or left mid-replay by a crash) go in first
+    workflow.supabase.start()
+    snapshotter = SessionSnapshotter.from_env(workflow.sessions)
+    if snapshotter is not None:
+        # Sessions from before the restart are back before the first request is served
+        await asyncio.to_thread(snapshotter.restore)
+        snapshotter.start()
+    if os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true":
+        asyncio.create_task(warm_workflow())
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Deliver queued webhooks and buffered interactions, and write the last
+    # session snapshot, before the worker exits (uvicorn runs this on SIGTERM)
+    if snapshotter is not None:
+        await snapshotter.close()
+    if workflow is not None:
+        await workflow.webhook_client.close()
+        await workflow.supabase.close()
 
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 if os.path.isdir(static_dir):
@@ -34,7 +130,7 @@ if os.path.isdir(static_dir):
 
 class ChatRequest(BaseModel):
     message: str
-    session_id: str = "default"
+    session_id: str = Field("default", max_length=MAX_SESSION_ID_LENGTH)
 
 class ChatResponse(BaseModel):
     response: str
@@ -42,21 +138,126 @@ class ChatResponse(BaseModel):
     disclaimer: bool = True
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, x_request_timeout: float | None = Header(None)):
     try:
-        result = await workflow.process_message(request.message, request.session_id)
+        # LLM calls in the turn give up at the deadline and the rule-based paths answer
+        with deadline_after(request_timeout(x_request_timeout)):
+            result = await get_workflow().process_message(request.message, request.session_id)
         return ChatResponse(
             response=result["response"],
             risk_level=result.get("risk_level"),
             disclaimer=True
         )
     except Exception as e:
+        log_event("chat.error", error=str(e), session_id=request.session_id)
+        if isinstance(e, SessionConflict):
+            raise HTTPException(status_code=409, detail="Session was updated concurrently, please retry.")
+        if is_overload_error(e):
+            # Provider throttling is transient; tell the client to retry rather than fail
+            raise HTTPException(status_code=503, detail="Service busy, please retry shortly.", headers={"Retry-After": "1"})
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, x_request_timeout: float | None = Header(None)):
+    # Server-Sent Events: risk_level first, then guidance tokens, then done
+    async def events():
+        try:
+            with deadline_after(request_timeout(x_request_timeout)):
+                async for event, data in get_workflow().process_message_stream(request.message, request.session_id):
+                    if event == "done":
+                        data["disclaimer"] = True
+                    yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/chat/batch")
+async def chat_batch(request: Request):
+    # NDJSON in ({"session_id", "message", "id"?} per line), NDJSON out as each
+    # line finishes, then a summary line. Resubmit the lines whose ids are
+    # missing or errored to resume a batch that broke off.
+    runner = BatchRunner(get_workflow(), metrics=chat_batch_metrics)
+    try:
+        lines = await read_ndjson_body(request.stream(), runner.max_bytes)
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    async def results():
+        try:
+            async for result in runner.run(iter_lines(lines)):
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            yield json.dumps({"status": "error", "error": str(e)}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.get("/chat/batch/stats")
+async def chat_batch_stats():
+    return chat_batch_metrics
+
+@app.get("/stream/stats")
+async def stream_stats():
+    return get_workflow().stream_metrics
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(tracer.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
 
+@app.get("/warmup")
+async def warmup():
+    # For platforms that can ping a fresh instance (or a cron) before real traffic
+    return {"status": "warm", "seconds": await warm_workflow()}
+
+@app.get("/sessions/stats")
+async def session_stats():
+    workflow = get_workflow()
+    return {
+        **workflow.sessions.stats(),
+        "history": workflow.history.stats(),
+        "snapshot": snapshotter.stats() if snapshotter is not None else None,
+    }
+
+@app.get("/prompts/stats")
+async def prompt_stats():
+    return get_workflow().prompts.stats()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return get_workflow().response_cache.stats()
+
+@app.get("/webhooks/stats")
+async def webhook_stats():
+    return get_workflow().webhook_client.stats()
+
+@app.get("/storage/stats")
+async def storage_stats():
+    return get_workflow().supabase.stats()
+
+@app.get("/llm/stats")
+async def llm_stats():
+    workflow = get_workflow()
+    return {
+        **workflow.llm_gateway.stats(),
+        "rule_extraction": workflow.rule_extraction_metrics,
+        "risk_model": {**workflow.risk_metrics, "loaded": workflow.risk_model is not None},
+        "extraction_batch": workflow.extraction_batcher.stats() if workflow.extraction_batcher else None,
+    }
+
+@app.get("/concurrency/stats")
+async def concurrency_stats():
+    workflow = get_workflow()
+    return {"session_locks": workflow.session_locks.stats(), "coalescer": workflow.coalescer.stats()}
+
 @app.get("/")
 async def root():
     index_path = os.path.join(static_dir, "index.html")
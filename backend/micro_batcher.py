@@ -0,0 +1,81 @@
+import asyncio
+import contextvars
+from resilience import deadline_var
+
+
+class BatchResultError(ValueError):
+    """A batch call returned results that cannot be matched to its items."""
+
+
+class MicroBatcher:
+    """Groups concurrent submissions into one call of run_batch(items, key) -> results.
+
+    Only submissions with the same key share a batch; each key has its own
+    window. The first submission for a key opens a window of `window`
+    seconds; the batch is sent when the window closes or as soon as max_size
+    items are waiting, and each result is handed back to the coroutine that
+    submitted the matching item. If the call fails, every waiter in the
+    batch gets the exception. The call runs under the earliest request
+    deadline among the batch's submitters.
+    """
+
+    def __init__(self, run_batch, max_size: int, window: float):
+        self.run_batch = run_batch
+        self.max_size = max_size
+        self.window = window
+        self._pending: dict[object, list[tuple[object, asyncio.Future, float | None]]] = {}
+        self._timers: dict[object, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.metrics = {"batches": 0, "items": 0, "max_batch_size": 0, "full_flushes": 0, "failed_batches": 0}
+
+    async def submit(self, item, key=None):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((item, future, deadline_var.get()))
+        if len(pending) >= self.max_size:
+            self.metrics["full_flushes"] += 1
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if batch:
+            # Fresh context: the batch serves many requests, not the one that closed it
+            task = asyncio.get_running_loop().create_task(self._run(batch, key), context=contextvars.Context())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list, key):
+        deadlines = [deadline for _, _, deadline in batch if deadline is not None]
+        if deadlines:
+            deadline_var.set(min(deadlines))
+        self.metrics["batches"] += 1
+        self.metrics["items"] += len(batch)
+        self.metrics["max_batch_size"] = max(self.metrics["max_batch_size"], len(batch))
+        try:
+            results = await self.run_batch([item for item, _, _ in batch], key)
+            if len(results) != len(batch):
+                raise BatchResultError(f"expected {len(batch)} results, got {len(results)}")
+        except Exception as e:
+            self.metrics["failed_batches"] += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        batches = self.metrics["batches"]
+        return {
+            **self.metrics,
+            "avg_batch_size": self.metrics["items"] / batches if batches else 0.0,
+            "pending": sum(len(pending) for pending in self._pending.values()),
+        }
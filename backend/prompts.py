@@ -0,0 +1,221 @@
+import os
+import time
+import zlib
+from contextlib import nullcontext
+from dotenv import load_dotenv
+from telemetry import tracer
+
+load_dotenv()
+
+GUIDANCE_RULES = """- DO NOT diagnose diseases
+- DO NOT recommend medicines
+- DO NOT provide treatment steps
+- Use awareness-based language only"""
+
+TRIAGE_INTRO = """You are a health awareness triage assistant. Using what is already known and the user's new message, return ONLY a JSON object with keys:
+- age: string or null
+- symptoms: array of all symptoms mentioned so far
+- duration: how long symptoms have been present, as a string, or null
+- risk_level: "low", "moderate" or "high" once symptoms and duration are both known, otherwise null"""
+
+TRIAGE_KNOWN = """
+
+Category: {category}
+Known age: {age}
+Known symptoms: {symptoms}
+Known duration: {duration}"""
+
+# (name, version) -> chat messages. Every template takes its values as input
+# variables so it can be compiled once and reused across requests.
+PROMPTS = {
+    ("triage", "v1"): [
+        ("system", TRIAGE_INTRO + """
+- guidance: 2-3 sentences of supportive, awareness-based guidance once risk_level is set, otherwise null
+
+Rules for guidance:
+""" + GUIDANCE_RULES + TRIAGE_KNOWN),
+        ("user", "{message}")
+    ],
+    # For streamed turns: the guidance is streamed by its own call afterwards
+    ("triage_stream", "v1"): [
+        ("system", TRIAGE_INTRO + TRIAGE_KNOWN),
+        ("user", "{message}")
+    ],
+    ("extraction", "v1"): [
+        ("system", """You are a medical information extraction assistant. Extract the following from the user's message:
+- Age (if mentioned, as a string or null)
+- Symptoms (list of symptoms mentioned)
+- Duration (how long symptoms have been present, as a string)
+
+Return ONLY a JSON object with keys: age, symptoms (array), duration.
+If information is not present, use null for age and empty array for symptoms, null for duration.
+Example: {{"age": "25", "symptoms": ["headache", "fever"], "duration": "2 days"}}"""),
+        ("user", "{message}")
+    ],
+    ("extraction_batch", "v1"): [
+        ("system", """You are a medical information extraction assistant handling a batch of {count} independent messages.
+For each message extract:
+- Age (if mentioned, as a string or null)
+- Symptoms (list of symptoms mentioned)
+- Duration (how long symptoms have been present, as a string)
+
+Messages are numbered and JSON-quoted. Return ONLY a JSON array with exactly {count} objects, one per message
+in the same order, each with keys: age, symptoms (array), duration.
+If information is not present, use null for age and empty array for symptoms, null for duration.
+Example for 2 messages: [{{"age": "25", "symptoms": ["headache"], "duration": "2 days"}}, {{"age": null, "symptoms": [], "duration": null}}]"""),
+        ("user", "{messages}")
+    ],
+    ("risk", "v1"): [
+        ("system", """You are a health risk awareness assistant. Assess the risk level based on:
+- Category: {category}
+- Symptoms: {symptoms}
+- Duration: {duration}
+
+Return ONLY one word: "low", "moderate", or "high".
+Do not provide diagnosis or treatment. Only assess general risk awareness level."""),
+        ("user", "Category: {category}, Symptoms: {symptoms}, Duration: {duration}")
+    ],
+    ("guidance", "v1"): [
+        ("system", """You are a health awareness assistant. Provide general, non-diagnostic guidance.
+
+Rules:
+""" + GUIDANCE_RULES + """
+- Allowed phrases: "may indicate a potential health concern", "consider consulting a healthcare professional", "monitor symptoms and seek help if they persist"
+
+Category: {category}
+Symptoms: {symptoms}
+Duration: {duration}
+Risk Level: {risk_level}
+
+Provide supportive, awareness-based guidance in 2-3 sentences."""),
+        ("user", "Category: {category}, Symptoms: {symptoms}, Duration: {duration}, Risk: {risk_level}")
+    ],
+}
+
+
+def parse_version_weights(spec: str) -> dict[str, dict[str, float]]:
+    # "extraction=v1:0.5|v2:0.5,risk=v2" -> {"extraction": {"v1": 0.5, "v2": 0.5}, "risk": {"v2": 1.0}}
+    weights = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, versions = entry.partition("=")
+        weights[name.strip()] = {}
+        for version in versions.split("|"):
+            label, _, weight = version.partition(":")
+            weights[name.strip()][label.strip()] = float(weight or 1.0)
+    return weights
+
+
+class PromptRegistry:
+    """Prompt chains compiled once per (name, version), with per-version latency counters.
+
+    When a prompt has several weighted versions, each session is pinned to one
+    of them by hashing its id, which gives a stable A/B split. With a gateway,
+    every call first waits for admission and may raise LLMOverloaded.
+    llm may also be a zero-argument callable returning the model; it is only
+    called when the first chain is compiled, which keeps the provider SDK out
+    of startup. With a HedgePolicy, an ainvoke still running after the
+    prompt's recent p95 latency races a second copy of the call.
+    """
+
+    def __init__(self, llm, prompts: dict | None = None, weights: dict | None = None, gateway=None, hedge=None):
+        self.templates = prompts if prompts is not None else PROMPTS
+        self.llm = llm
+        self.chains = {}
+        if weights is None:
+            weights = parse_version_weights(os.getenv("PROMPT_VERSIONS", ""))
+        self.weights = {}
+        for name, version in self.templates:
+            self.weights.setdefault(name, {version: 1.0})
+        for name, versions in weights.items():
+            missing = [v for v in versions if (name, v) not in self.templates]
+            if missing:
+                raise ValueError(f"Unknown prompt version(s) for {name}: {', '.join(missing)}")
+            self.weights[name] = versions
+        self.gateway = gateway
+        self.hedge = hedge
+        self.counters = {
+            key: {"calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            for key in self.templates
+        }
+
+    def _chain(self, key: tuple):
+        chain = self.chains.get(key)
+        if chain is None:
+            llm = self.llm if hasattr(self.llm, "ainvoke") else self.llm()
+            from langchain_core.prompts import ChatPromptTemplate
+
+            chain = self.chains[key] = ChatPromptTemplate.from_messages(self.templates[key]) | llm
+        return chain
+
+    def compile(self):
+        for key in self.templates:
+            self._chain(key)
+
+    def select_version(self, name: str, session_id: str | None = None) -> str:
+        versions = self.weights[name]
+        if len(versions) == 1:
+            return next(iter(versions))
+        total = sum(versions.values())
+        point = zlib.crc32(f"{name}:{session_id}".encode()) % 10000 / 10000 * total
+        for version, weight in versions.items():
+            point -= weight
+            if point < 0:
+                return version
+        return version
+
+    def _admission(self, bounded: bool = True):
+        return self.gateway.slot(bounded=bounded) if self.gateway is not None else nullcontext()
+
+    async def ainvoke(self, name: str, inputs: dict, session_id: str | None = None, version: str | None = None):
+        # version overrides the session's pinned one, e.g. for a call made on behalf of several sessions
+        key = (name, version or self.select_version(name, session_id))
+        if self.hedge is None:
+            return await self._invoke(key, inputs)
+        return await self.hedge.run(key, lambda: self._invoke(key, inputs))
+
+    async def _invoke(self, key: tuple, inputs: dict):
+        counters = self.counters[key]
+        async with self._admission():
+            start = time.perf_counter()
+            try:
+                with tracer.span(f"llm.{key[0]}", version=key[1]):
+                    response = await self._chain(key).ainvoke(inputs)
+            except Exception:
+                counters["errors"] += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                self._record(counters, elapsed)
+            if self.hedge is not None:
+                self.hedge.observe(key, elapsed)
+            return response
+
+    async def astream(self, name: str, inputs: dict, session_id: str | None = None):
+        key = (name, self.select_version(name, session_id))
+        counters = self.counters[key]
+        async with self._admission(bounded=False):
+            start = time.perf_counter()
+            try:
+                with tracer.span(f"llm.{name}.stream", version=key[1]):
+                    async for chunk in self._chain(key).astream(inputs):
+                        yield chunk
+            except Exception:
+                counters["errors"] += 1
+                raise
+            finally:
+                self._record(counters, time.perf_counter() - start)
+
+    @staticmethod
+    def _record(counters: dict, elapsed: float):
+        counters["calls"] += 1
+        counters["total_seconds"] += elapsed
+        counters["max_seconds"] = max(counters["max_seconds"], elapsed)
+
+    def stats(self) -> dict:
+        return {
+            f"{name}:{version}": {
+                **counters,
+                "avg_seconds": counters["total_seconds"] / counters["calls"] if counters["calls"] else 0.0,
+            }
+            for (name, version), counters in self.counters.items()
+        }
@@ -0,0 +1,183 @@
+import asyncio
+import contextvars
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from telemetry import log_event
+
+load_dotenv()
+
+# time.monotonic() by which the current request has to be answered (None: no deadline)
+deadline_var: contextvars.ContextVar[float | None] = contextvars.ContextVar("deadline", default=None)
+
+
+def request_timeout(requested: float | None = None) -> float:
+    # A client may ask for less time than the server allows, never more
+    limit = float(os.getenv("REQUEST_TIMEOUT_SECONDS", 30))
+    return min(requested, limit) if requested and requested > 0 else limit
+
+
+@contextmanager
+def deadline_after(seconds: float | None):
+    # A nested scope can shorten the deadline it inherits but not extend it
+    if seconds is None:
+        yield deadline_var.get()
+        return
+    deadline = time.monotonic() + seconds
+    current = deadline_var.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = deadline_var.set(deadline)
+    try:
+        yield deadline
+    finally:
+        deadline_var.reset(token)
+
+
+def time_left(limit: float | None = None) -> float | None:
+    """Seconds until the current deadline, capped at limit; None when neither is set."""
+    deadline = deadline_var.get()
+    if deadline is None:
+        return limit
+    left = deadline - time.monotonic()
+    return left if limit is None else min(left, limit)
+
+
+class CircuitBreaker:
+    """Fails calls to a dependency fast while it is down.
+
+    Closed: calls go through and consecutive failures are counted. After
+    CIRCUIT_FAILURE_THRESHOLD of them the circuit opens and allow() says no
+    for CIRCUIT_RESET_SECONDS. Then it is half-open: one probe call is let
+    through; its success closes the circuit and its failure opens it again.
+    A caller that got allow() must report record_success, record_failure or,
+    if the call never reached the dependency, release.
+    """
+
+    def __init__(self, name: str, failure_threshold: int | None = None,
+                 reset_timeout: float | None = None, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+        self.reset_timeout = reset_timeout or float(os.getenv("CIRCUIT_RESET_SECONDS", 10.0))
+        self._clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.metrics = {"opened": 0, "rejected": 0, "probes": 0}
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and self._clock() - self._opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            self.metrics["probes"] += 1
+            return True
+        self.metrics["rejected"] += 1
+        return False
+
+    def retry_after(self) -> float:
+        if self.state == "closed":
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - self._clock())
+
+    def record_success(self):
+        if self.state != "closed":
+            log_event("circuit.closed", circuit=self.name)
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            self.state = "open"
+            self._opened_at = self._clock()
+            self.metrics["opened"] += 1
+            log_event("circuit.opened", circuit=self.name, failures=self.failures)
+
+    def release(self):
+        # The call ended without an outcome (cancelled, shed): let another call probe
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {**self.metrics, "state": self.state, "open": self.state != "closed", "failures": self.failures}
+
+
+class HedgePolicy:
+    """When to send a second copy of a slow call, from recent latencies per key.
+
+    The hedge delay is the LLM_HEDGE_PERCENTILE latency of the last
+    LLM_HEDGE_WINDOW successful calls (at least LLM_HEDGE_MIN_DELAY_MS), so only
+    calls already slower than almost all recent ones are duplicated. No key is
+    hedged before LLM_HEDGE_MIN_SAMPLES calls, and at most LLM_HEDGE_BUDGET of
+    all calls get a hedge, which bounds the extra provider load.
+    """
+
+    def __init__(self, percentile: float | None = None, min_delay: float | None = None,
+                 budget: float | None = None, window: int | None = None, min_samples: int | None = None):
+        self.percentile = percentile or float(os.getenv("LLM_HEDGE_PERCENTILE", 95))
+        self.min_delay = min_delay if min_delay is not None else float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", 50)) / 1000
+        self.budget = budget if budget is not None else float(os.getenv("LLM_HEDGE_BUDGET", 0.1))
+        self.window = window or int(os.getenv("LLM_HEDGE_WINDOW", 200))
+        self.min_samples = min_samples or int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+        self._latencies: dict = {}
+        self.metrics = {"calls": 0, "hedged": 0, "hedge_won": 0}
+
+    def observe(self, key, seconds: float):
+        samples = self._latencies.get(key)
+        if samples is None:
+            samples = self._latencies[key] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def delay(self, key) -> float | None:
+        samples = self._latencies.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(self.percentile / 100 * len(ordered)))
+        return max(self.min_delay, ordered[index])
+
+    async def run(self, key, call):
+        """Await call(); if it is still running after delay(key), race a second call() against it."""
+        self.metrics["calls"] += 1
+        delay = self.delay(key)
+        if delay is None:
+            return await call()
+        tasks = [asyncio.ensure_future(call())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                # The budget is checked when the hedge would go out, not when the call starts
+                if self.metrics["hedged"] < self.budget * self.metrics["calls"]:
+                    self.metrics["hedged"] += 1
+                    tasks.append(asyncio.ensure_future(call()))
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if task.exception() is None), next(iter(done)))
+            pending = [task for task in tasks if not task.done()]
+            if winner.exception() is not None and pending:
+                # One copy failed (or was shed); the other may still answer
+                winner = pending[0]
+                await asyncio.wait(pending)
+            if winner is not tasks[0]:
+                self.metrics["hedge_won"] += 1
+            return winner.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "delay_ms": {
+                ":".join(key) if isinstance(key, tuple) else str(key): round(delay * 1000, 1)
+                for key in self._latencies
+                if (delay := self.delay(key)) is not None
+            },
+        }
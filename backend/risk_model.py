@@ -0,0 +1,168 @@
+import json
+import math
+import os
+import random
+import re
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from rule_extractor import DURATION_PATTERN, parse_number
+
+load_dotenv()
+
+DEFAULT_RISK_MODEL_PATH = os.path.join(os.path.dirname(__file__), "models", "risk_model.json")
+RISK_CLASSES = ("low", "moderate", "high")
+
+UNIT_DAYS = {"hour": 1 / 24, "day": 1, "week": 7, "fortnight": 14, "month": 30, "year": 365}
+BARE_UNIT_PATTERN = re.compile(r"\b(hour|day|week|month|year)s\b")
+DURATION_BUCKETS = ((1, "under_1d"), (3, "1_3d"), (7, "4_7d"), (28, "1_4w"), (90, "1_3m"))
+AGE_BUCKETS = ((13, "child"), (18, "teen"), (40, "adult"), (65, "middle"))
+
+
+def duration_days(text: str | None) -> float | None:
+    """Approximate length in days of a duration string like "2 weeks" or "a few days"."""
+    if not text:
+        return None
+    text = text.lower()
+    if "today" in text or "this morning" in text:
+        return 0.5
+    match = DURATION_PATTERN.search(text)
+    if match:
+        number = parse_number(match.group("quantity"))
+        return (number if number is not None else 3) * UNIT_DAYS[match.group("unit").rstrip("s")]
+    match = BARE_UNIT_PATTERN.search(text)
+    if match:
+        # "for weeks", "months"
+        return 2 * UNIT_DAYS[match.group(1)]
+    return None
+
+
+def _bucket(value: float | None, buckets, last: str) -> str:
+    if value is None:
+        return "unknown"
+    for bound, name in buckets:
+        if value <= bound:
+            return name
+    return last
+
+
+def duration_bucket(days: float | None) -> str:
+    return _bucket(days, DURATION_BUCKETS, "over_3m")
+
+
+def risk_features(row: dict, canonicalize=None) -> list[str]:
+    """Sparse feature names for a session state or an interactions row."""
+    features = ["bias", f"category={row.get('category') or 'unknown'}"]
+    symptoms = row.get("symptoms") or []
+    for symptom in symptoms:
+        name = canonicalize(symptom) if canonicalize else " ".join(str(symptom).lower().split())
+        features.append(f"symptom={name}")
+    features.append(f"symptom_count={min(len(symptoms), 3)}")
+    features.append(f"duration={duration_bucket(duration_days(row.get('duration')))}")
+    age = row.get("age")
+    age_value = int(age) if age and str(age).isdigit() else None
+    features.append(f"age={_bucket(age_value, AGE_BUCKETS, 'senior')}")
+    return features
+
+
+class RiskModel:
+    """Multinomial logistic regression over sparse symptom/duration/category features.
+
+    Weights live in a dict of feature -> per-class weights, so scoring one
+    session is a handful of dict lookups and additions (single-digit
+    microseconds) with no numeric dependencies. Trained offline from logged
+    interactions rows with train(); predictions below min_confidence are
+    meant to be escalated to the LLM.
+    """
+
+    def __init__(self, weights: dict, classes=RISK_CLASSES, min_confidence: float | None = None,
+                 canonicalize=None, metadata: dict | None = None):
+        self.weights = weights
+        self.classes = tuple(classes)
+        self.min_confidence = (
+            min_confidence if min_confidence is not None
+            else float(os.getenv("RISK_MODEL_MIN_CONFIDENCE", 0.8))
+        )
+        self.canonicalize = canonicalize
+        self.metadata = metadata or {}
+
+    @classmethod
+    def from_file(cls, path: str | None = None, **kwargs) -> "RiskModel | None":
+        # No trained model is not an error: risk then comes from the LLM as before
+        path = path or os.getenv("RISK_MODEL_PATH") or DEFAULT_RISK_MODEL_PATH
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["weights"], data["classes"], metadata=data.get("metadata"), **kwargs)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"classes": self.classes, "weights": self.weights, "metadata": self.metadata}, f)
+
+    def _scores(self, features: list[str]) -> list[float]:
+        scores = [0.0] * len(self.classes)
+        for feature in features:
+            weights = self.weights.get(feature)
+            if weights is not None:
+                for index, weight in enumerate(weights):
+                    scores[index] += weight
+        return scores
+
+    def predict_proba(self, features: list[str]) -> list[float]:
+        scores = self._scores(features)
+        top = max(scores)
+        exps = [math.exp(score - top) for score in scores]
+        total = sum(exps)
+        return [value / total for value in exps]
+
+    def predict(self, row: dict) -> tuple[str, float]:
+        probabilities = self.predict_proba(risk_features(row, self.canonicalize))
+        best = max(range(len(probabilities)), key=probabilities.__getitem__)
+        return self.classes[best], probabilities[best]
+
+    def predict_batch(self, rows: list[dict]) -> list[tuple[str, float]]:
+        return [self.predict(row) for row in rows]
+
+
+def train(rows: list[dict], epochs: int = 30, learning_rate: float = 0.2, l2: float = 1e-4,
+          seed: int = 0, canonicalize=None) -> RiskModel:
+    """Fit a RiskModel with plain SGD on rows that carry a known risk_level."""
+    examples = [
+        (risk_features(row, canonicalize), RISK_CLASSES.index(row["risk_level"]))
+        for row in rows if row.get("risk_level") in RISK_CLASSES
+    ]
+    if not examples:
+        raise ValueError("no rows with a risk_level to train on")
+    model = RiskModel({}, RISK_CLASSES, canonicalize=canonicalize)
+    rng = random.Random(seed)
+    for epoch in range(epochs):
+        rng.shuffle(examples)
+        rate = learning_rate / (1 + epoch * 0.1)
+        for features, label in examples:
+            probabilities = model.predict_proba(features)
+            for feature in features:
+                weights = model.weights.setdefault(feature, [0.0] * len(RISK_CLASSES))
+                for index in range(len(RISK_CLASSES)):
+                    gradient = probabilities[index] - (1.0 if index == label else 0.0)
+                    weights[index] -= rate * (gradient + l2 * weights[index])
+    model.metadata = {"trained_at": datetime.now(timezone.utc).isoformat(), "rows": len(examples), "epochs": epochs}
+    return model
+
+
+def evaluate(model: RiskModel, rows: list[dict]) -> dict:
+    rows = [row for row in rows if row.get("risk_level") in RISK_CLASSES]
+    correct = confident = confident_correct = 0
+    for row in rows:
+        label, confidence = model.predict(row)
+        hit = label == row["risk_level"]
+        correct += hit
+        if confidence >= model.min_confidence:
+            confident += 1
+            confident_correct += hit
+    return {
+        "rows": len(rows),
+        "accuracy": correct / len(rows) if rows else 0.0,
+        "confident_share": confident / len(rows) if rows else 0.0,
+        "confident_accuracy": confident_correct / confident if confident else 0.0,
+    }
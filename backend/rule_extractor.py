@@ -0,0 +1,186 @@
+import json
+import os
+import re
+from dotenv import load_dotenv
+from keyword_classifier import negation_pattern, trie_pattern
+
+load_dotenv()
+
+DEFAULT_SYMPTOM_LEXICON_PATH = os.path.join(os.path.dirname(__file__), "symptom_lexicon.json")
+
+SMALL_NUMBERS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+# Quantities kept as written rather than turned into a number
+VAGUE_QUANTITIES = ("a few", "few", "several", "a couple of", "couple of", "a couple")
+
+_SMALL = "|".join(sorted(SMALL_NUMBERS, key=len, reverse=True))
+_TENS = "|".join(TENS)
+NUMBER_WORDS = rf"(?:(?:{_TENS})(?:[\s-](?:{_SMALL}))?|{_SMALL})"
+_VAGUE = "|".join(q.replace(" ", r"\s+") for q in VAGUE_QUANTITIES)
+_QUANTITY = rf"(?:\d{{1,3}}|{NUMBER_WORDS}|{_VAGUE}|a|an)"
+_UNIT = r"(?:hour|day|week|fortnight|month|year)s?"
+_NOT_DURATION_UNIT = r"(?!\s*-?\s*(?:hours?|days?|weeks?|months?|%|kgs?|lbs?|pounds|times)\b)"
+
+DURATION_PATTERN = re.compile(
+    rf"\b(?P<quantity>{_QUANTITY})\s*-?\s*(?P<unit>{_UNIT})\b(?!\s*-?\s*old\b)"
+)
+RELATIVE_DURATIONS = {
+    "yesterday": "1 day", "last night": "1 day", "this morning": "today", "today": "today",
+    "last week": "1 week", "last month": "1 month",
+}
+RELATIVE_PATTERN = re.compile(
+    r"\b(?:" + "|".join(k.replace(" ", r"\s+") for k in RELATIVE_DURATIONS) + r")\b"
+)
+AGE_PATTERN = re.compile(
+    rf"\b(?:i\s+am|i'm|im|aged?\s*(?:is\s*)?[:\-]?)\s*(?P<stated>\d{{1,3}}|{NUMBER_WORDS})\b{_NOT_DURATION_UNIT}"
+    rf"|\b(?P<years>\d{{1,3}}|{NUMBER_WORDS})\s*-?\s*(?:years?|yrs?)\s*-?\s*old\b"
+    rf"|\b(?P<short>\d{{1,3}})\s*(?:y/o|yo|y\.o\.)(?!\w)"
+)
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def parse_number(text: str) -> int | None:
+    """Parse "3", "three", "twenty-one", "a"/"an" to an int; None for vague quantities."""
+    text = " ".join(text.replace("-", " ").split())
+    if text.isdigit():
+        return int(text)
+    if text in ("a", "an"):
+        return 1
+    if text in SMALL_NUMBERS:
+        return SMALL_NUMBERS[text]
+    parts = text.split(" ")
+    if parts[0] in TENS and (len(parts) == 1 or (len(parts) == 2 and parts[1] in SMALL_NUMBERS)):
+        return TENS[parts[0]] + (SMALL_NUMBERS[parts[1]] if len(parts) == 2 else 0)
+    if text in ("a couple", "a couple of", "couple of"):
+        return 2
+    return None
+
+
+def format_duration(quantity: str, unit: str) -> str:
+    unit = unit.rstrip("s")
+    if unit == "fortnight":
+        quantity, unit = str((parse_number(quantity) or 1) * 2), "week"
+    number = parse_number(quantity)
+    if number is None:
+        return f"{' '.join(quantity.split())} {unit}s"
+    return f"{number} {unit}" + ("" if number == 1 else "s")
+
+
+class RuleExtractor:
+    """Deterministic extraction of age, symptoms and duration from one message.
+
+    Symptom synonyms from the lexicon are compiled into one trie-shaped regex
+    and mapped to their canonical name; mentions after an explicit denial
+    ("no fever") are dropped, but "not" and "never" alone do not negate
+    ("never had a headache like this"). A message whose only symptoms were
+    negated is never confident, so the LLM reads it. Durations accept digits and number words ("two weeks"). The
+    confidence is the share of words in the message accounted for by a match
+    or a filler word, so a message with anything the lexicon does not know
+    ("my knee is swollen and stiff") stays below RULE_EXTRACTION_MIN_CONFIDENCE
+    and is left to the LLM.
+    """
+
+    def __init__(self, lexicon: dict, min_confidence: float | None = None):
+        self.synonyms = {}
+        for canonical, phrases in lexicon["symptoms"].items():
+            for phrase in [canonical, *phrases]:
+                self.synonyms[self._normalize(phrase)] = canonical
+        self.pattern = re.compile(rf"(?<![\w-])(?:{trie_pattern(self.synonyms)})(?![\w-])")
+        self.negation = negation_pattern(
+            lexicon.get("negation_cues", []),
+            int(lexicon.get("negation_window", 3)),
+            lexicon.get("negation_terminators", []),
+        )
+        self.filler = frozenset(lexicon.get("filler", []))
+        self.min_confidence = (
+            min_confidence if min_confidence is not None
+            else float(os.getenv("RULE_EXTRACTION_MIN_CONFIDENCE", 0.9))
+        )
+
+    @classmethod
+    def from_file(cls, path: str | None = None, **kwargs) -> "RuleExtractor":
+        path = path or os.getenv("SYMPTOM_LEXICON_PATH") or DEFAULT_SYMPTOM_LEXICON_PATH
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(text.lower().replace("’", "'").split())
+
+    def canonical(self, term: str) -> str:
+        # Canonical lexicon name for a symptom phrase, or the normalized phrase itself
+        normalized = self._normalize(term)
+        return self.synonyms.get(normalized, normalized)
+
+    def extract(self, message: str) -> dict:
+        text = message.lower().replace("’", "'")
+        covered = bytearray(len(text))
+
+        def cover(match):
+            covered[match.start():match.end()] = b"\x01" * (match.end() - match.start())
+
+        age = None
+        for match in AGE_PATTERN.finditer(text):
+            value = parse_number(match.group("stated") or match.group("years") or match.group("short"))
+            if value is not None and 0 < value <= 120:
+                age = str(value)
+                cover(match)
+                break
+
+        duration = None
+        for match in DURATION_PATTERN.finditer(text):
+            if covered[match.start()]:
+                continue
+            duration = format_duration(match.group("quantity"), match.group("unit"))
+            cover(match)
+            break
+        if duration is None:
+            match = RELATIVE_PATTERN.search(text)
+            if match:
+                duration = RELATIVE_DURATIONS[" ".join(match.group(0).split())]
+                cover(match)
+
+        symptoms = []
+        negated = []
+        for match in self.pattern.finditer(text):
+            if covered[match.start()]:
+                continue
+            cover(match)
+            term = match.group(0)
+            canonical = self.synonyms.get(term) or self.synonyms[self._normalize(term)]
+            if self.negation and self.negation.search(text, max(0, match.start() - 60), match.start()):
+                negated.append(canonical)
+                continue
+            if canonical not in symptoms:
+                symptoms.append(canonical)
+
+        tokens = 0
+        unknown = []
+        for token in TOKEN_PATTERN.finditer(text):
+            tokens += 1
+            word = token.group(0)
+            if not covered[token.start()] and word not in self.filler and not word.isdigit():
+                unknown.append(word)
+        confidence = (tokens - len(unknown)) / tokens if tokens else 0.0
+        return {
+            "age": age,
+            "symptoms": symptoms,
+            "negated": negated,
+            "duration": duration,
+            "confidence": confidence,
+            "unknown": unknown,
+        }
+
+    def is_confident(self, extraction: dict) -> bool:
+        found = extraction["symptoms"] or extraction["duration"] or extraction["age"]
+        if extraction["negated"] and not extraction["symptoms"]:
+            # Only denials matched: reading them as "no symptoms" is the costly mistake
+            return False
+        return bool(found) and extraction["confidence"] >= self.min_confidence
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+
+class SessionLocks:
+    """One asyncio.Lock per active session so turns apply in arrival order.
+
+    asyncio.Lock wakes waiters FIFO, which gives per-session ordering. Locks
+    are reference counted and dropped once nobody holds or waits on them, so
+    the map only ever holds sessions with a request in flight.
+    """
+
+    def __init__(self):
+        self._locks: dict[str, list] = {}  # session_id -> [lock, users]
+        self.metrics = {"acquired": 0, "contended": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+
+    @asynccontextmanager
+    async def hold(self, session_id: str):
+        entry = self._locks.get(session_id)
+        if entry is None:
+            entry = self._locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        lock = entry[0]
+        contended = lock.locked()
+        start = time.perf_counter()
+        try:
+            async with lock:
+                waited = time.perf_counter() - start
+                self.metrics["acquired"] += 1
+                if contended:
+                    self.metrics["contended"] += 1
+                    self.metrics["wait_seconds_total"] += waited
+                    self.metrics["wait_seconds_max"] = max(self.metrics["wait_seconds_max"], waited)
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[session_id]
+
+    def stats(self) -> dict:
+        return {**self.metrics, "active_sessions": len(self._locks)}
+
+
+class EventReplay:
+    """Events of one in-flight stream, replayed from the start to each subscriber."""
+
+    def __init__(self):
+        self.events: list = []
+        self.finished = False
+        self.error: BaseException | None = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event):
+        self.events.append(event)
+        self._notify()
+
+    def finish(self, error: BaseException | None = None):
+        self.finished = True
+        self.error = error
+        self._notify()
+
+    def _notify(self):
+        # A fresh Event per change, so subscribers never miss or re-see a wakeup
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def replay(self):
+        index = 0
+        while True:
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class RequestCoalescer:
+    """Runs identical in-flight requests once and fans the result out to every caller.
+
+    run() shares a coroutine's result; stream() shares an async generator's
+    events, replaying those already produced to a late duplicate. Both use
+    one key space, so a streamed and a plain request for the same key also
+    share one execution when the caller passes converters between the two.
+    """
+
+    def __init__(self):
+        self._inflight: dict[tuple, asyncio.Future | EventReplay] = {}
+        self.metrics = {"executed": 0, "coalesced": 0}
+
+    async def run(self, key: tuple, make_coro, from_events=None):
+        shared = self._inflight.get(key)
+        if isinstance(shared, EventReplay) and from_events is not None:
+            self.metrics["coalesced"] += 1
+            return from_events([event async for event in shared.replay()])
+        if isinstance(shared, asyncio.Future):
+            self.metrics["coalesced"] += 1
+            # shield: one waiter being cancelled must not cancel the shared run
+            return await asyncio.shield(shared)
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark a failure as retrieved even when no duplicate was waiting on it
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        self.metrics["executed"] += 1
+        try:
+            result = await make_coro()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def stream(self, key: tuple, make_agen, from_result=None):
+        shared = self._inflight.get(key)
+        if isinstance(shared, asyncio.Future) and from_result is not None:
+            self.metrics["coalesced"] += 1
+            for event in from_result(await asyncio.shield(shared)):
+                yield event
+            return
+        if isinstance(shared, EventReplay):
+            self.metrics["coalesced"] += 1
+            async for event in shared.replay():
+                yield event
+            return
+
+        replay = self._inflight[key] = EventReplay()
+        self.metrics["executed"] += 1
+        try:
+            async for event in make_agen():
+                replay.publish(event)
+                yield event
+        except BaseException as e:
+            # The first caller going away (GeneratorExit) ends the stream for everyone
+            replay.finish(e if isinstance(e, Exception) else asyncio.CancelledError())
+            raise
+        else:
+            replay.finish()
+        finally:
+            if self._inflight.get(key) is replay:
+                del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {**self.metrics, "in_flight": len(self._inflight)}
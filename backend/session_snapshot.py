@@ -0,0 +1,242 @@
+import asyncio
+import contextvars
+import os
+import struct
+import threading
+import time
+import zlib
+from dotenv import load_dotenv
+from session_state import decode_session, encode_session
+from session_store import InMemorySessionStore
+from telemetry import log_event, tracer
+
+load_dotenv()
+
+MAGIC = b"SESSLOG1"
+# Record: body length and crc32 of the body, then the body: written_at (unix
+# time), session id length, session id, encode_session bytes (empty: deleted)
+_HEADER = struct.Struct("<II")
+_ENTRY = struct.Struct("<dH")
+# Below this the log is not compacted just for being twice its live size
+MIN_COMPACT_BYTES = 1024 * 1024
+# Sessions encoded between yields to the event loop during a snapshot
+ENCODE_CHUNK = 1000
+
+
+def pack_record(session_id: str, data: bytes, written_at: float) -> bytes:
+    key = session_id.encode("utf-8")
+    if len(key) > 0xFFFF:
+        raise ValueError(f"session id of {len(key)} bytes does not fit a snapshot record")
+    body = _ENTRY.pack(written_at, len(key)) + key + data
+    return _HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+def scan_log(buffer: bytes) -> tuple[dict[str, tuple[float, int, int, int]], int]:
+    """Index a log image: session_id -> (written_at, start, data_start, end) of its
+    newest record, and the offset where the last intact record ends."""
+    if not buffer.startswith(MAGIC):
+        raise ValueError("not a session snapshot log")
+    view = memoryview(buffer)
+    latest = {}
+    offset = len(MAGIC)
+    while offset + _HEADER.size <= len(buffer):
+        length, crc = _HEADER.unpack_from(buffer, offset)
+        body_start = offset + _HEADER.size
+        end = body_start + length
+        if end > len(buffer) or length < _ENTRY.size or zlib.crc32(view[body_start:end]) != crc:
+            # Torn or corrupt tail, e.g. a crash in the middle of an append
+            break
+        written_at, key_length = _ENTRY.unpack_from(buffer, body_start)
+        key_start = body_start + _ENTRY.size
+        data_start = key_start + key_length
+        latest[str(view[key_start:data_start], "utf-8")] = (written_at, offset, data_start, end)
+        offset = end
+    return latest, offset
+
+
+class SessionSnapshotter:
+    """Persists an InMemorySessionStore to an append-only log so restarts lose no sessions.
+
+    Every SESSION_SNAPSHOT_INTERVAL_SECONDS the sessions written, deleted or
+    evicted since the last snapshot are appended as CRC-checked records and
+    fsynced, and close() appends a last one on shutdown. restore() replays the
+    log at startup, keeping the newest record per session and skipping
+    tombstones and sessions idle past the store's TTL; a torn record at the
+    end is cut off. When the log grows past twice its last compacted size it
+    is rewritten with live records only, in a worker thread; if those exceed
+    half of SESSION_SNAPSHOT_MAX_MB the least recently written are dropped.
+    """
+
+    def __init__(self, store: InMemorySessionStore, path: str | None = None, interval: float | None = None,
+                 max_bytes: int | None = None, clock=time.time):
+        self.store = store
+        self.path = path or os.getenv("SESSION_SNAPSHOT_PATH")
+        self.interval = interval or float(os.getenv("SESSION_SNAPSHOT_INTERVAL_SECONDS", 5))
+        self.max_bytes = max_bytes or int(float(os.getenv("SESSION_SNAPSHOT_MAX_MB", 256)) * 1024 * 1024)
+        self._clock = clock
+        # Appends (via to_thread) and compaction (worker thread) share the file
+        self._file_lock = threading.Lock()
+        self._snapshot_lock: asyncio.Lock | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self._log_bytes = 0
+        self._compacted_bytes = 0
+        self.metrics = {
+            "restored": 0, "restore_seconds": 0.0, "snapshots": 0, "records": 0, "bytes_written": 0,
+            "last_snapshot_seconds": 0.0, "compactions": 0, "dropped": 0, "errors": 0,
+        }
+
+    @classmethod
+    def from_env(cls, store) -> "SessionSnapshotter | None":
+        # Shared stores (SQLite) already outlive the process
+        if not os.getenv("SESSION_SNAPSHOT_PATH") or not isinstance(store, InMemorySessionStore):
+            return None
+        return cls(store)
+
+    def restore(self) -> int:
+        """Load the log into the store and return how many sessions came back.
+
+        Blocking; call it before the app takes traffic and before start().
+        """
+        start = time.perf_counter()
+        if not os.path.exists(self.path):
+            return 0
+        with self._file_lock:
+            with open(self.path, "rb") as f:
+                buffer = f.read()
+            if not buffer:
+                return 0
+            latest, end = scan_log(buffer)
+            if end < len(buffer):
+                log_event("session_snapshot.torn_tail", dropped_bytes=len(buffer) - end)
+                with open(self.path, "r+b") as f:
+                    f.truncate(end)
+        cutoff = self._clock() - self.store.ttl_seconds
+        live = [
+            (written_at, session_id, data_start, record_end)
+            for session_id, (written_at, _, data_start, record_end) in latest.items()
+            if data_start < record_end and written_at >= cutoff
+        ]
+        # Oldest first, so the store's LRU order follows when sessions were last written
+        live.sort()
+        for _, session_id, data_start, record_end in live:
+            self.store.set(session_id, decode_session(buffer[data_start:record_end]))
+        self._log_bytes = self._compacted_bytes = end
+        seconds = time.perf_counter() - start
+        self.metrics["restored"] = len(live)
+        self.metrics["restore_seconds"] = round(seconds, 3)
+        log_event("session_snapshot.restored", sessions=len(live), seconds=round(seconds, 3), log_bytes=end)
+        return len(live)
+
+    def start(self):
+        self.store.track_changes()
+        if self._snapshot_lock is None:
+            self._snapshot_lock = asyncio.Lock()
+            self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            # Fresh context so snapshots are not tagged with a request id
+            self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.snapshot()
+            except Exception as e:
+                self.metrics["errors"] += 1
+                log_event("session_snapshot.failed", error=str(e))
+
+    async def snapshot(self) -> int:
+        """Append everything changed since the last snapshot; returns the record count."""
+        if self._snapshot_lock is None:
+            self._snapshot_lock = asyncio.Lock()
+        async with self._snapshot_lock:
+            start = time.perf_counter()
+            changes = self.store.take_changes()
+            if changes:
+                written_at = self._clock()
+                records = []
+                try:
+                    for index, (session_id, state) in enumerate(changes.items()):
+                        if index and index % ENCODE_CHUNK == 0:
+                            await asyncio.sleep(0)
+                        records.append(pack_record(session_id, b"" if state is None else encode_session(state), written_at))
+                    blob = b"".join(records)
+                    await asyncio.to_thread(self._append, blob)
+                except BaseException:
+                    # Encoding, the write or a cancellation: these changes go in the next snapshot
+                    self.store.requeue_changes(changes)
+                    raise
+                self.metrics["records"] += len(changes)
+                self.metrics["bytes_written"] += len(blob)
+            if self._log_bytes > max(2 * self._compacted_bytes, MIN_COMPACT_BYTES) or self._log_bytes > self.max_bytes:
+                await asyncio.to_thread(self.compact)
+            seconds = time.perf_counter() - start
+            self.metrics["snapshots"] += 1
+            self.metrics["last_snapshot_seconds"] = round(seconds, 4)
+            tracer.observe("session_snapshot.write", seconds)
+            return len(changes)
+
+    def _append(self, blob: bytes):
+        with self._file_lock:
+            with open(self.path, "ab") as f:
+                if f.tell() == 0:
+                    f.write(MAGIC)
+                f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+                self._log_bytes = f.tell()
+
+    def compact(self):
+        """Rewrite the log with the newest live record per session (blocking)."""
+        start = time.perf_counter()
+        with self._file_lock:
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, "rb") as f:
+                buffer = f.read()
+            latest, _ = scan_log(buffer)
+            cutoff = self._clock() - self.store.ttl_seconds
+            live = sorted(
+                record for record in latest.values() if record[2] < record[3] and record[0] >= cutoff
+            )
+            # Keep room to append before the log reaches max_bytes again
+            size, budget, first = len(MAGIC), self.max_bytes // 2, len(live)
+            while first > 0 and size + live[first - 1][3] - live[first - 1][1] <= budget:
+                first -= 1
+                size += live[first][3] - live[first][1]
+            view = memoryview(buffer)
+            tmp_path = self.path + ".compact"
+            with open(tmp_path, "wb") as f:
+                f.write(MAGIC)
+                for _, record_start, _, record_end in live[first:]:
+                    f.write(view[record_start:record_end])
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._log_bytes = self._compacted_bytes = size
+        seconds = time.perf_counter() - start
+        self.metrics["compactions"] += 1
+        self.metrics["dropped"] += first
+        tracer.observe("session_snapshot.compact", seconds)
+        log_event("session_snapshot.compacted", before_bytes=len(buffer), after_bytes=size,
+                  sessions=len(live) - first, dropped=first, seconds=round(seconds, 3))
+
+    async def close(self):
+        # Stopped rather than cancelled so an in-flight append completes; the
+        # final snapshot then picks up whatever changed while it ran
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._closing = False
+        await self.snapshot()
+
+    def stats(self) -> dict:
+        return {**self.metrics, "path": self.path, "log_bytes": self._log_bytes, "max_bytes": self.max_bytes}
@@ -0,0 +1,277 @@
+import json
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+
+
+def estimate_tokens(text: str) -> int:
+    # Gemini averages about four characters per token for English text; close
+    # enough for budgeting without a tokenizer or a countTokens round trip
+    return (len(text) + 3) // 4
+
+
+class MessageLog:
+    """Append-only message history with copy-on-write views.
+
+    Appending to a log that ends at the tip of its buffer shares the buffer
+    with the previous version, so a turn costs O(1) regardless of history
+    length. Appending to an older view forks the buffer first. Token counts
+    are estimated once per message and kept as prefix sums next to the
+    buffer, so the token total of any window is a subtraction.
+    """
+
+    __slots__ = ("_items", "_tokens", "_start", "_stop", "content_bytes")
+
+    def __init__(self, messages=None):
+        self._items = list(messages or [])
+        self._tokens = [0]
+        for message in self._items:
+            self._tokens.append(self._tokens[-1] + estimate_tokens(message.get("content", "")))
+        self._start = 0
+        self._stop = len(self._items)
+        self.content_bytes = sum(len(m.get("content", "")) for m in self._items)
+
+    @classmethod
+    def _view(cls, items: list, tokens: list, start: int, stop: int, content_bytes: int) -> "MessageLog":
+        log = cls.__new__(cls)
+        log._items = items
+        log._tokens = tokens
+        log._start = start
+        log._stop = stop
+        log.content_bytes = content_bytes
+        return log
+
+    def _detach(self) -> tuple[list, list]:
+        # Copy just this view's messages (and rebased prefix sums) into new buffers
+        base = self._tokens[self._start]
+        return (
+            self._items[self._start:self._stop],
+            [count - base for count in self._tokens[self._start:self._stop + 1]],
+        )
+
+    def append(self, message: dict) -> "MessageLog":
+        items, tokens = self._items, self._tokens
+        start, stop = self._start, self._stop
+        if stop != len(items):
+            items, tokens = self._detach()
+            start, stop = 0, stop - start
+        items.append(message)
+        tokens.append(tokens[-1] + estimate_tokens(message.get("content", "")))
+        return MessageLog._view(items, tokens, start, stop + 1, self.content_bytes + len(message.get("content", "")))
+
+    def tail(self, count: int) -> "MessageLog":
+        if len(self) <= count:
+            return self
+        start = self._stop - count
+        dropped = sum(len(m.get("content", "")) for m in self._items[self._start:start])
+        view = MessageLog._view(self._items, self._tokens, start, self._stop, self.content_bytes - dropped)
+        # Compact once the dead prefix outweighs the live window.
+        if start > count:
+            view._items, view._tokens = view._detach()
+            view._start, view._stop = 0, count
+        return view
+
+    @property
+    def tokens(self) -> int:
+        return self._tokens[self._stop] - self._tokens[self._start]
+
+    def tail_within(self, max_tokens: int) -> int:
+        """Number of newest messages whose combined tokens fit in max_tokens."""
+        floor = self._tokens[self._stop] - max_tokens
+        return self._stop - max(self._start, bisect_left(self._tokens, floor, self._start, self._stop + 1))
+
+    def to_list(self) -> list:
+        return self._items[self._start:self._stop]
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __iter__(self):
+        for index in range(self._start, self._stop):
+            yield self._items[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.to_list()[index]
+        length = self._stop - self._start
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("message index out of range")
+        return self._items[self._start + index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, MessageLog):
+            other = other.to_list()
+        return self.to_list() == other
+
+    def __repr__(self) -> str:
+        return f"MessageLog({self.to_list()!r})"
+
+
+
+# Field order of the encoded session tuple; append new fields at the end
+SESSION_FIELDS = (
+    "session_id", "category", "age", "symptoms", "duration",
+    "risk_level", "clarification_needed", "all_collected", "guidance",
+    "history_summary",
+)
+_PLAIN = b"J"
+_ZLIB = b"Z"
+COMPRESS_THRESHOLD = 512
+
+
+def encode_session(state) -> bytes:
+    """Serialize a SymptomState (or SessionRecord) to compact bytes for out-of-process storage.
+
+    Fields are written positionally and messages as flat role/content pairs,
+    so no key names are repeated per session or per message. Payloads over
+    COMPRESS_THRESHOLD bytes are zlib-compressed when that makes them smaller.
+    """
+    if isinstance(state, SessionRecord):
+        return _pack(state.flat_messages(), state.field_values())
+    messages = []
+    for message in state.get("messages", ()):
+        messages.append(message.get("role"))
+        messages.append(message.get("content", ""))
+    return _pack(messages, [state.get(field) for field in SESSION_FIELDS])
+
+
+def _pack(messages: list, values: list) -> bytes:
+    record = [messages]
+    record.extend(values)
+    raw = json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(raw) > COMPRESS_THRESHOLD:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return _ZLIB + packed
+    return _PLAIN + raw
+
+
+def decode_session(data: bytes) -> dict:
+    body = data[1:]
+    if data[:1] == _ZLIB:
+        body = zlib.decompress(body)
+    elif data[:1] != _PLAIN:
+        raise ValueError("unknown session encoding")
+    record = json.loads(body)
+    # Fields missing from older records come back as None
+    state = dict.fromkeys(SESSION_FIELDS)
+    state.update(zip(SESSION_FIELDS, record[1:]))
+    state["symptoms"] = state.get("symptoms") or []
+    state["all_collected"] = bool(state.get("all_collected"))
+    flat = record[0]
+    state["messages"] = MessageLog(
+        {"role": flat[i], "content": flat[i + 1]} for i in range(0, len(flat), 2)
+    )
+    return state
+
+
+# Small-int codes for the closed vocabularies; values outside them (e.g. a
+# category added to lexicons.json) are kept as plain strings
+CATEGORY_CODES = (None, "general_symptom", "urgent_symptom", "mental_wellbeing_symptom")
+RISK_LEVEL_CODES = (None, "low", "moderate", "high")
+ROLE_CODES = ("user", "assistant", "system")
+_CATEGORY_INDEX = {value: code for code, value in enumerate(CATEGORY_CODES)}
+_RISK_LEVEL_INDEX = {value: code for code, value in enumerate(RISK_LEVEL_CODES)}
+_ROLE_INDEX = {value: code for code, value in enumerate(ROLE_CODES)}
+
+
+class SessionRecord:
+    """Compact in-memory form of a SymptomState.
+
+    Category and risk level are small-int codes, symptoms an interned tuple,
+    and the messages one text arena (all contents joined) with end offsets
+    and a byte of role code per message, instead of a dict and a string per
+    message. from_state and to_state convert at the store boundary, so the
+    graph still sees a plain SymptomState.
+    """
+
+    __slots__ = (
+        "session_id", "category", "age", "symptoms", "duration", "risk_level",
+        "clarification_needed", "all_collected", "guidance", "history_summary",
+        "roles", "text", "ends",
+    )
+
+    @classmethod
+    def from_state(cls, state: dict) -> "SessionRecord":
+        record = cls.__new__(cls)
+        record.session_id = state.get("session_id")
+        category = state.get("category")
+        record.category = _CATEGORY_INDEX.get(category, category)
+        record.age = state.get("age")
+        record.symptoms = tuple(sys.intern(symptom) for symptom in state.get("symptoms") or ())
+        record.duration = state.get("duration")
+        risk_level = state.get("risk_level")
+        record.risk_level = _RISK_LEVEL_INDEX.get(risk_level, risk_level)
+        record.clarification_needed = state.get("clarification_needed")
+        record.all_collected = bool(state.get("all_collected"))
+        record.guidance = state.get("guidance")
+        record.history_summary = state.get("history_summary")
+        roles, contents = [], []
+        for message in state.get("messages", ()):
+            roles.append(message.get("role"))
+            contents.append(message.get("content", ""))
+        codes = [_ROLE_INDEX.get(role) for role in roles]
+        record.roles = tuple(roles) if None in codes else bytes(codes)
+        record.text = "".join(contents)
+        record.ends = array("I")
+        end = 0
+        for content in contents:
+            end += len(content)
+            record.ends.append(end)
+        return record
+
+    def _roles(self):
+        roles = self.roles
+        return [ROLE_CODES[code] for code in roles] if isinstance(roles, bytes) else roles
+
+    def _contents(self):
+        text, start = self.text, 0
+        for end in self.ends:
+            yield text[start:end]
+            start = end
+
+    def messages(self) -> list[dict]:
+        return [{"role": role, "content": content} for role, content in zip(self._roles(), self._contents())]
+
+    def flat_messages(self) -> list:
+        # role, content, role, content, ... as encode_session writes them
+        flat = []
+        for role, content in zip(self._roles(), self._contents()):
+            flat.append(role)
+            flat.append(content)
+        return flat
+
+    def field_values(self) -> list:
+        """The SESSION_FIELDS values, in order."""
+        category, risk_level = self.category, self.risk_level
+        return [
+            self.session_id,
+            CATEGORY_CODES[category] if isinstance(category, int) else category,
+            self.age,
+            list(self.symptoms),
+            self.duration,
+            RISK_LEVEL_CODES[risk_level] if isinstance(risk_level, int) else risk_level,
+            self.clarification_needed,
+            self.all_collected,
+            self.guidance,
+            self.history_summary,
+        ]
+
+    def to_state(self) -> dict:
+        state = dict(zip(SESSION_FIELDS, self.field_values()))
+        state["messages"] = MessageLog(self.messages())
+        return state
+
+    def estimated_bytes(self) -> int:
+        # Interned symptoms and coded fields are shared, so only the record's
+        # own containers and strings are counted
+        size = sys.getsizeof(self) + sys.getsizeof(self.symptoms) + sys.getsizeof(self.roles)
+        size += sys.getsizeof(self.text) + sys.getsizeof(self.ends)
+        for value in (self.session_id, self.age, self.duration, self.clarification_needed,
+                      self.guidance, self.history_summary):
+            if value:
+                size += sys.getsizeof(value)
+        return size
@@ -0,0 +1,513 @@
+import asyncio
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from session_state import MessageLog, SessionRecord, decode_session, encode_session
+from telemetry import log_event
+
+load_dotenv()
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(__file__), "data", "sessions.sqlite3")
+# Enforced where requests come in; storage keys and snapshot records assume it
+MAX_SESSION_ID_LENGTH = 256
+
+
+class SessionConflict(Exception):
+    """Another worker wrote the session after this one read it."""
+
+
+def estimate_session_bytes(state: dict) -> int:
+    # Cheap approximation of the memory held by a session: container overhead
+    # plus the string payloads, without walking every object with getsizeof.
+    size = sys.getsizeof(state)
+    messages = state.get("messages", [])
+    if isinstance(messages, MessageLog):
+        size += 232 * len(messages) + messages.content_bytes
+    else:
+        for message in messages:
+            size += 232 + len(message.get("content", ""))
+    for symptom in state.get("symptoms", []):
+        size += 49 + len(symptom)
+    for key in ("session_id", "age", "duration", "clarification_needed", "history_summary"):
+        value = state.get(key)
+        if value:
+            size += 49 + len(value)
+    return size
+
+
+def trim_messages(state: dict, max_messages: int) -> None:
+    messages = state.get("messages")
+    if messages and len(messages) > max_messages:
+        if isinstance(messages, MessageLog):
+            state["messages"] = messages.tail(max_messages)
+        else:
+            state["messages"] = messages[-max_messages:]
+
+
+class SessionStore:
+    """Interface for session state storage.
+
+    The workflow only talks to sessions through these methods, so an
+    out-of-process backend can be swapped in without touching the graph.
+    Request handlers use aget/aset; backends that do blocking I/O override
+    them to run it off the event loop.
+    """
+
+    def get(self, session_id: str) -> dict | None:
+        raise NotImplementedError
+
+    def set(self, session_id: str, state: dict) -> None:
+        raise NotImplementedError
+
+    async def aget(self, session_id: str) -> dict | None:
+        return self.get(session_id)
+
+    async def aset(self, session_id: str, state: dict) -> None:
+        self.set(session_id, state)
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+
+class InMemorySessionStore(SessionStore):
+    """In-process LRU store with idle-TTL eviction and a memory budget.
+
+    With SESSION_COMPACT_RECORDS (the default) the SESSION_HOT_SESSIONS most
+    recently used sessions are kept as the SymptomState passed to set(), so a
+    turn's get() and set() cost the same at any history length. A session
+    leaving that window is converted to a SessionRecord, and turned back into
+    a SymptomState by the next get() for it.
+
+    After track_changes(), every write, delete and eviction is recorded until
+    the next take_changes(), which is how snapshots stay incremental.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int | None = None,
+        ttl_seconds: float | None = None,
+        max_messages: int | None = None,
+        memory_budget_bytes: int | None = None,
+        compact_records: bool | None = None,
+        hot_sessions: int | None = None,
+        clock=time.monotonic,
+    ):
+        self.max_sessions = max_sessions or int(os.getenv("SESSION_MAX_SESSIONS", 10000))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("SESSION_TTL_SECONDS", 1800))
+        self.max_messages = max_messages or int(os.getenv("SESSION_MAX_MESSAGES", 50))
+        self.memory_budget_bytes = memory_budget_bytes or int(
+            float(os.getenv("SESSION_MEMORY_BUDGET_MB", 256)) * 1024 * 1024
+        )
+        if compact_records is None:
+            compact_records = os.getenv("SESSION_COMPACT_RECORDS", "true").lower() == "true"
+        self.compact_records = compact_records
+        self.hot_sessions = hot_sessions or int(os.getenv("SESSION_HOT_SESSIONS", 1000))
+        self._clock = clock
+        # session_id -> (state or SessionRecord, last_access, estimated_bytes)
+        self._entries: OrderedDict[str, tuple[dict | SessionRecord, float, int]] = OrderedDict()
+        self._total_bytes = 0
+        # Ids of the sessions held as states, least recently used first
+        self._hot: OrderedDict[str, None] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {"lru": 0, "ttl": 0, "memory": 0}
+        # session_id -> stored state or record, or None once removed; None while nobody tracks
+        self._changes: dict[str, dict | SessionRecord | None] | None = None
+
+    def get(self, session_id: str) -> dict | None:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        state, last_access, size = entry
+        now = self._clock()
+        if now - last_access > self.ttl_seconds:
+            self._remove(session_id)
+            self.evictions["ttl"] += 1
+            self.misses += 1
+            return None
+        if isinstance(state, SessionRecord):
+            state, previous = state.to_state(), size
+            size = estimate_session_bytes(state)
+            self._total_bytes += size - previous
+        self._entries[session_id] = (state, now, size)
+        self._entries.move_to_end(session_id)
+        self.hits += 1
+        if self.compact_records:
+            self._touch(session_id)
+        return state
+
+    def set(self, session_id: str, state: dict) -> None:
+        trim_messages(state, self.max_messages)
+        if session_id in self._entries:
+            self._remove(session_id)
+        size = estimate_session_bytes(state)
+        self._entries[session_id] = (state, self._clock(), size)
+        self._total_bytes += size
+        if self._changes is not None:
+            self._changes[session_id] = state
+        if self.compact_records:
+            self._touch(session_id)
+        self._evict()
+
+    def _touch(self, session_id: str) -> None:
+        self._hot[session_id] = None
+        self._hot.move_to_end(session_id)
+        while len(self._hot) > self.hot_sessions:
+            self._compact(self._hot.popitem(last=False)[0])
+
+    def _compact(self, session_id: str) -> None:
+        state, last_access, size = self._entries[session_id]
+        record = SessionRecord.from_state(state)
+        compact_size = record.estimated_bytes()
+        # Replacing the value keeps the entry's place in the LRU order
+        self._entries[session_id] = (record, last_access, compact_size)
+        self._total_bytes += compact_size - size
+        if self._changes is not None and self._changes.get(session_id) is state:
+            self._changes[session_id] = record
+
+    def delete(self, session_id: str) -> None:
+        if session_id in self._entries:
+            self._remove(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, session_id: str) -> None:
+        _, _, size = self._entries.pop(session_id)
+        self._total_bytes -= size
+        self._hot.pop(session_id, None)
+        if self._changes is not None:
+            self._changes[session_id] = None
+
+    def track_changes(self) -> None:
+        if self._changes is None:
+            self._changes = {}
+
+    def take_changes(self) -> dict[str, dict | SessionRecord | None]:
+        # Values are what the store holds; encode_session takes either kind
+        if not self._changes:
+            return {}
+        changes, self._changes = self._changes, {}
+        return changes
+
+    def requeue_changes(self, changes: dict[str, dict | SessionRecord | None]) -> None:
+        # Changes that failed to persist; anything recorded since is newer and wins
+        if self._changes is not None:
+            for session_id, state in changes.items():
+                self._changes.setdefault(session_id, state)
+
+    def _evict(self) -> None:
+        now = self._clock()
+        # Entries are kept in access order, so expired ones sit at the front.
+        while self._entries:
+            oldest_id, (_, last_access, _) = next(iter(self._entries.items()))
+            if now - last_access <= self.ttl_seconds:
+                break
+            self._remove(oldest_id)
+            self.evictions["ttl"] += 1
+        while len(self._entries) > self.max_sessions:
+            self._remove(next(iter(self._entries)))
+            self.evictions["lru"] += 1
+        while self._total_bytes > self.memory_budget_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+            self.evictions["memory"] += 1
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._entries),
+            "estimated_bytes": self._total_bytes,
+            "compact_records": self.compact_records,
+            "hot_sessions": len(self._hot),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": dict(self.evictions),
+        }
+
+
+class PersistentSessionStore(SessionStore):
+    """Base for stores shared between worker processes.
+
+    Sessions are written with encode_session under a version number the
+    backend bumps on every write. A local LRU keeps decoded sessions, and a
+    read only transfers and decodes the payload when the stored version no
+    longer matches the cached one, i.e. when another worker wrote the session
+    since this worker last saw it. Writing back a state returned by get(), or
+    a new one after get() found none, is a compare-and-swap on the version
+    read: if another worker wrote in between, set() raises SessionConflict
+    and the caller re-reads and retries. Any other write is unconditional.
+    """
+
+    backend = "persistent"
+
+    def __init__(
+        self,
+        ttl_seconds: float | None = None,
+        max_messages: int | None = None,
+        cache_size: int | None = None,
+    ):
+        self.ttl_seconds = ttl_seconds or float(os.getenv("SESSION_TTL_SECONDS", 1800))
+        self.max_messages = max_messages or int(os.getenv("SESSION_MAX_MESSAGES", 50))
+        self.cache_size = cache_size or int(os.getenv("SESSION_CACHE_SIZE", 1000))
+        # session_id -> (version, state); (0, None) after a miss
+        self._cache: OrderedDict[str, tuple[int, dict | None]] = OrderedDict()
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "cache_hits": 0,
+            "loads": 0,
+            "writes": 0,
+            "bytes_read": 0,
+            "bytes_written": 0,
+            "conflicts": 0,
+        }
+
+    def _fetch(self, session_id: str, known_version: int | None) -> tuple[int, bytes | None] | None:
+        # (version, payload) for a live session; payload is None when
+        # known_version is still current. None when missing or expired.
+        raise NotImplementedError
+
+    def _store(self, session_id: str, data: bytes, expected_version: int | None) -> int | None:
+        # Writes the payload and returns the new version, or None without
+        # writing when expected_version (0: no live session) is not current
+        raise NotImplementedError
+
+    def _remove(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> dict | None:
+        cached = self._cache.get(session_id)
+        return self._loaded(session_id, cached, self._fetch(session_id, cached[0] if cached else None))
+
+    async def aget(self, session_id: str) -> dict | None:
+        cached = self._cache.get(session_id)
+        row = await asyncio.to_thread(self._fetch, session_id, cached[0] if cached else None)
+        return self._loaded(session_id, cached, row)
+
+    def _loaded(self, session_id: str, cached: tuple[int, dict | None] | None, row) -> dict | None:
+        if row is None:
+            self._remember(session_id, 0, None)
+            self.metrics["misses"] += 1
+            return None
+        self.metrics["hits"] += 1
+        version, data = row
+        if data is None:
+            self.metrics["cache_hits"] += 1
+            # Re-inserted rather than moved: aget may have yielded while it was evicted
+            self._remember(session_id, version, cached[1])
+            return cached[1]
+        state = decode_session(data)
+        self.metrics["loads"] += 1
+        self.metrics["bytes_read"] += len(data)
+        self._remember(session_id, version, state)
+        return state
+
+    def set(self, session_id: str, state: dict) -> None:
+        data, expected = self._prepare(session_id, state)
+        self._stored(session_id, state, data, self._store(session_id, data, expected))
+
+    async def aset(self, session_id: str, state: dict) -> None:
+        data, expected = self._prepare(session_id, state)
+        version = await asyncio.to_thread(self._store, session_id, data, expected)
+        self._stored(session_id, state, data, version)
+
+    def _prepare(self, session_id: str, state: dict) -> tuple[bytes, int | None]:
+        trim_messages(state, self.max_messages)
+        cached = self._cache.get(session_id)
+        expected = cached[0] if cached is not None and (cached[1] is None or cached[1] is state) else None
+        return encode_session(state), expected
+
+    def _stored(self, session_id: str, state: dict, data: bytes, version: int | None) -> None:
+        if version is None:
+            self._cache.pop(session_id, None)
+            self.metrics["conflicts"] += 1
+            raise SessionConflict(session_id)
+        self.metrics["writes"] += 1
+        self.metrics["bytes_written"] += len(data)
+        self._remember(session_id, version, state)
+
+    def delete(self, session_id: str) -> None:
+        self._cache.pop(session_id, None)
+        self._remove(session_id)
+
+    def _remember(self, session_id: str, version: int, state: dict) -> None:
+        self._cache[session_id] = (version, state)
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "cached_sessions": len(self._cache), **self.metrics}
+
+
+class SQLiteSessionStore(PersistentSessionStore):
+    """Sessions in an embedded SQLite database shared by every worker on the host.
+
+    WAL mode lets readers proceed while another process writes. Expiry uses
+    wall-clock time since the last write so all processes agree on it. aget
+    and aset run queries in worker threads, one at a time on the connection.
+    """
+
+    backend = "sqlite"
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str | None = None, clock=time.time, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path or os.getenv("SESSION_SQLITE_PATH") or DEFAULT_SQLITE_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._clock = clock
+        self._writes_since_purge = 0
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+            "updated_at REAL NOT NULL, data BLOB NOT NULL) WITHOUT ROWID"
+        )
+
+    def _fetch(self, session_id, known_version):
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT version, CASE WHEN version = ? THEN NULL ELSE data END "
+                "FROM sessions WHERE session_id = ? AND updated_at >= ?",
+                (known_version if known_version is not None else -1, session_id, self._clock() - self.ttl_seconds),
+            ).fetchone()
+
+    def _store(self, session_id, data, expected_version):
+        with self._db_lock:
+            return self._store_locked(session_id, data, expected_version)
+
+    def _store_locked(self, session_id, data, expected_version):
+        now = self._clock()
+        if expected_version:
+            row = self._db.execute(
+                "UPDATE sessions SET version = version + 1, updated_at = ?, data = ? "
+                "WHERE session_id = ? AND version = ? RETURNING version",
+                (now, data, session_id, expected_version),
+            ).fetchone()
+        else:
+            # Expected absent (0): an expired row counts as absent and is replaced
+            row = self._db.execute(
+                "INSERT INTO sessions (session_id, version, updated_at, data) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET version = version + 1, "
+                "updated_at = excluded.updated_at, data = excluded.data "
+                "WHERE ? IS NULL OR sessions.updated_at < ? RETURNING version",
+                (session_id, now, data, expected_version, now - self.ttl_seconds),
+            ).fetchone()
+        if row is None:
+            return None
+        version = row[0]
+        self._writes_since_purge += 1
+        if self._writes_since_purge >= self.PURGE_EVERY:
+            self._writes_since_purge = 0
+            self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl_seconds,))
+        return version
+
+    def _remove(self, session_id):
+        with self._db_lock:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def __len__(self) -> int:
+        with self._db_lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._db.close()
+
+
+# Writes unless ARGV[3] is set and is not the current version ('0': missing);
+# returns the new version, or nil without writing
+_REDIS_STORE = """
+local version = redis.call('HGET', KEYS[1], 'v') or '0'
+if ARGV[3] ~= '' and version ~= ARGV[3] then return nil end
+local new = redis.call('HINCRBY', KEYS[1], 'v', 1)
+redis.call('HSET', KEYS[1], 'd', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return new
+"""
+
+# Returns [version] when the caller's version is current, else [version, data]
+_REDIS_FETCH = """
+local version = redis.call('HGET', KEYS[1], 'v')
+if not version then return nil end
+if version == ARGV[1] then return {version} end
+return {version, redis.call('HGET', KEYS[1], 'd')}
+"""
+
+
+class RedisSessionStore(PersistentSessionStore):
+    """Sessions in Redis hashes (version + payload) with a per-key idle TTL.
+
+    Needs the optional redis package; pass client= to reuse a connection.
+    aget and aset run the (thread-safe) client's calls in worker threads.
+    """
+
+    backend = "redis"
+
+    def __init__(self, url: str | None = None, client=None, key_prefix: str = "session:", **kwargs):
+        super().__init__(**kwargs)
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url or os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        self._redis = client
+        self.key_prefix = key_prefix
+        self._fetch_script = client.register_script(_REDIS_FETCH)
+        self._store_script = client.register_script(_REDIS_STORE)
+
+    def ping(self) -> bool:
+        return bool(self._redis.ping())
+
+    def _fetch(self, session_id, known_version):
+        result = self._fetch_script(
+            keys=[self.key_prefix + session_id],
+            args=[known_version if known_version is not None else -1],
+        )
+        if not result:
+            return None
+        return int(result[0]), (result[1] if len(result) > 1 else None)
+
+    def _store(self, session_id, data, expected_version):
+        # One script, so the version check and the write are atomic
+        version = self._store_script(
+            keys=[self.key_prefix + session_id],
+            args=[data, int(self.ttl_seconds), "" if expected_version is None else expected_version],
+        )
+        return int(version) if version is not None else None
+
+    def _remove(self, session_id):
+        self._redis.delete(self.key_prefix + session_id)
+
+
+def create_session_store() -> SessionStore:
+    # SESSION_BACKEND: memory (single process) | sqlite | redis
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    if backend == "redis":
+        try:
+            store = RedisSessionStore()
+            store.ping()
+            return store
+        except Exception as e:
+            log_event("session_store.redis_unavailable", error=str(e), fallback="sqlite")
+            backend = "sqlite"
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "memory":
+        return InMemorySessionStore()
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
@@ -1,46 +1,237 @@
+import asyncio
+import contextvars
+import json
 import os
 from dotenv import load_dotenv
-from typing import TypedDict
-from datetime import datetime
+from datetime import datetime, timezone
 
 # Set environment variable to disable proxy BEFORE importing supabase
 os.environ['SUPABASE_DISABLE_PROXY'] = 'true'
 
-from supabase import create_client, Client
+from resilience import CircuitBreaker
+from telemetry import log_event, tracer
 
 load_dotenv()
 
+DEFAULT_JOURNAL_PATH = os.path.join(os.path.dirname(__file__), "data", "interactions_journal.jsonl")
+
 class SupabaseClient:
-    def __init__(self):
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_KEY")
-        
-        if not url or not key:
-            print("Warning: Supabase credentials not found. Data storage will be disabled.")
-            self.client = None
-        else:
-            self.client = create_client(url, key)
-    
+    """Write-behind storage for completed interactions.
+
+    store_interaction only buffers the row. A background task coalesces rows
+    into bulk inserts once SUPABASE_BATCH_SIZE rows are waiting or every
+    SUPABASE_FLUSH_INTERVAL_SECONDS, running the synchronous SDK call in a
+    worker thread so the event loop never blocks on the network. Rows that
+    cannot be inserted are appended to a local JSONL journal and replayed
+    after the next successful flush; if the journal cannot be written either,
+    the rows stay buffered for the next flush. While a circuit breaker is open after
+    repeated failures, flushes go straight to the journal instead of waiting
+    on a database that is down; one probe insert per CIRCUIT_RESET_SECONDS
+    finds out when it is back. A journal being replayed is renamed to
+    .replaying and only removed once every row is in, so a crash mid-replay
+    costs duplicate rows at worst, never lost ones; start() picks it up again
+    on the next boot. The SDK is imported and the client created on the first
+    flush, off the request path.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        batch_size: int | None = None,
+        flush_interval: float | None = None,
+        journal_path: str | None = None,
+    ):
+        self.client = client
+        self._credentials = None
+        if client is None:
+            url = os.getenv("SUPABASE_URL")
+            key = os.getenv("SUPABASE_KEY")
+
+            if not url or not key:
+                # Logged once here rather than on every completed turn
+                log_event("supabase.disabled", reason="SUPABASE_URL or SUPABASE_KEY not set")
+            else:
+                self._credentials = (url, key)
+
+        self.batch_size = batch_size or int(os.getenv("SUPABASE_BATCH_SIZE", 50))
+        self.flush_interval = flush_interval or float(os.getenv("SUPABASE_FLUSH_INTERVAL_SECONDS", 1.0))
+        self.journal_path = journal_path or os.getenv("SUPABASE_JOURNAL_PATH") or DEFAULT_JOURNAL_PATH
+        self._buffer: list[dict] = []
+        self._lock: asyncio.Lock | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._flusher: asyncio.Task | None = None
+        self._closing = False
+        self.breaker = CircuitBreaker("supabase")
+        self.metrics = {
+            "buffered": 0,
+            "inserted": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "short_circuited": 0,
+            "journaled": 0,
+            "replayed": 0,
+            "flush_errors": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.client is not None or self._credentials is not None
+
+    def connect(self):
+        # Blocking: importing the SDK takes ~0.5s, so flushes call this in a worker thread
+        if self.client is None and self._credentials is not None:
+            from supabase import create_client
+
+            self.client = create_client(*self._credentials)
+        return self.client
+
+    @staticmethod
+    def build_row(state: dict) -> dict:
+        # Anonymized data - no PII
+        return {
+            "session_id": state.get("session_id", "unknown"),
+            "category": state.get("category"),
+            "age": state.get("age"),  # Optional, may be null
+            "symptoms": list(state.get("symptoms", [])),
+            "duration": state.get("duration"),
+            "risk_level": state.get("risk_level"),
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+
+    def _ensure_started(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+            self._wakeup = asyncio.Event()
+        if self._flusher is None or self._flusher.done():
+            # Fresh context so background flushes are not tagged with the
+            # request id of whichever request happened to start the task
+            self._flusher = asyncio.create_task(self._run(), context=contextvars.Context())
+
     async def store_interaction(self, state: dict):
-        if not self.client:
-            print("Supabase not configured, skipping data storage")
+        if not self.enabled:
             return
-        
+
+        self._ensure_started()
+        self._buffer.append(self.build_row(state))
+        self.metrics["buffered"] += 1
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # Unspilled rows are back on the buffer; keep the flusher alive for the next attempt
+                self.metrics["flush_errors"] += 1
+                log_event("supabase.flush_failed", pending=len(self._buffer), error=str(e))
+
+    async def flush(self):
+        if self._lock is None:
+            return
+        async with self._lock:
+            while self._buffer:
+                rows = self._buffer[:self.batch_size]
+                del self._buffer[:self.batch_size]
+                if not await self._insert(rows):
+                    # Database unavailable: spill this batch and everything behind it
+                    rows.extend(self._buffer)
+                    self._buffer.clear()
+                    try:
+                        await asyncio.to_thread(self._append_journal, rows)
+                    except BaseException:
+                        # Journal unwritable: keep the rows, ahead of any buffered since
+                        self._buffer[:0] = rows
+                        raise
+                    return
+            await self._replay_journal()
+
+    async def _insert(self, rows: list[dict]) -> bool:
+        if not self.breaker.allow():
+            self.metrics["short_circuited"] += 1
+            return False
         try:
-            # Anonymized data - no PII
-            data = {
-                "session_id": state.get("session_id", "unknown"),
-                "category": state.get("category"),
-                "age": state.get("age"),  # Optional, may be null
-                "symptoms": state.get("symptoms", []),
-                "duration": state.get("duration"),
-                "risk_level": state.get("risk_level"),
-                "created_at": datetime.utcnow().isoformat()
-            }
-            
             # Insert into interactions table
             # Note: Table should be created in Supabase with these columns
-            self.client.table("interactions").insert(data).execute()
+            with tracer.span("supabase.insert", rows=len(rows)):
+                await asyncio.to_thread(lambda: self.connect().table("interactions").insert(rows).execute())
         except Exception as e:
-            print(f"Error storing interaction: {e}")
+            log_event("supabase.insert_failed", rows=len(rows), error=str(e))
+            self.metrics["failed_batches"] += 1
+            self.breaker.record_failure()
+            return False
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        self.metrics["inserted"] += len(rows)
+        self.metrics["batches"] += 1
+        return True
+
+    def _append_journal(self, rows: list[dict]):
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        self.metrics["journaled"] += len(rows)
+
+    @property
+    def replay_path(self) -> str:
+        return self.journal_path + ".replaying"
+
+    def _take_journal(self) -> list[dict]:
+        # The journal is renamed, not deleted, while its rows are replayed: a
+        # crash mid-replay leaves the .replaying file for the next attempt
+        if not os.path.exists(self.replay_path):
+            if not os.path.exists(self.journal_path):
+                return []
+            os.replace(self.journal_path, self.replay_path)
+        with open(self.replay_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _rewrite_replay(self, rows: list[dict]):
+        # Keep only the rows not inserted yet, swapped in atomically
+        tmp_path = self.replay_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        os.replace(tmp_path, self.replay_path)
+
+    async def _replay_journal(self):
+        if self.breaker.retry_after() > 0:
+            return  # circuit open: leave the journal alone until a probe may run
+        rows = await asyncio.to_thread(self._take_journal)
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            if not await self._insert(batch):
+                if start:
+                    await asyncio.to_thread(self._rewrite_replay, rows[start:])
+                return
+            self.metrics["replayed"] += len(batch)
+        if rows:
+            os.remove(self.replay_path)
+
+    def start(self):
+        # At startup: replay rows journaled (or left mid-replay) by a previous run
+        if self.enabled and (os.path.exists(self.journal_path) or os.path.exists(self.replay_path)):
+            self._ensure_started()
+            self._wakeup.set()
+
+    async def close(self):
+        # Flush buffered rows (or spill them to the journal) before exiting.
+        # The flusher is stopped rather than cancelled so an in-flight insert completes.
+        if self._flusher is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._flusher
+            self._flusher = None
+            self._closing = False
+        await self.flush()
 
+    def stats(self) -> dict:
+        return {**self.metrics, "pending": len(self._buffer), "circuit": self.breaker.stats()}
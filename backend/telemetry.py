@@ -0,0 +1,153 @@
+import contextvars
+import json
+import os
+import sys
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+request_id_var: contextvars.ContextVar[str | None] = contextvars.ContextVar("request_id", default=None)
+
+
+def log_event(event: str, **fields):
+    # One JSON object per line, tagged with the current request id
+    record = {"ts": datetime.now(timezone.utc).isoformat(), "event": event, "request_id": request_id_var.get()}
+    record.update(fields)
+    print(json.dumps(record, default=str), file=sys.stdout, flush=True)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        # label value -> [bucket counts..., sum, count]
+        self._series: dict[str, list] = {}
+
+    def observe(self, label_value: str, value: float):
+        series = self._series.get(label_value)
+        if series is None:
+            series = self._series[label_value] = [0] * len(self.buckets) + [0.0, 0]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_value, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{self.label}="{label_value}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{self.label}="{label_value}",le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{self.label}="{label_value}"}} {series[-2]}')
+            lines.append(f'{self.name}_count{{{self.label}="{label_value}"}} {series[-1]}')
+        return lines
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "attrs", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        self.tracer.spans.observe(self.name, elapsed)
+        if exc_type is not None:
+            self.tracer.errors[self.name] = self.tracer.errors.get(self.name, 0) + 1
+        if self.tracer.log_spans:
+            log_event(
+                "span", span=self.name, duration_ms=round(elapsed * 1000, 3),
+                error=exc_type.__name__ if exc_type else None, **self.attrs
+            )
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Span timing into per-span histograms, exported in Prometheus text format.
+
+    With TRACING_ENABLED=false, span() hands back a shared no-op context
+    manager, so instrumented code pays a single attribute check. Set
+    TRACE_LOG_SPANS=true to also emit one JSON log line per span.
+    """
+
+    def __init__(self, enabled: bool | None = None, log_spans: bool | None = None):
+        if enabled is None:
+            enabled = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+        if log_spans is None:
+            log_spans = os.getenv("TRACE_LOG_SPANS", "false").lower() == "true"
+        self.enabled = enabled
+        self.log_spans = log_spans
+        self.spans = Histogram("span_duration_seconds", "Duration of traced operations.", "span")
+        self.errors: dict[str, int] = {}
+        self._collectors = []
+
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, attrs)
+
+    def observe(self, name: str, seconds: float):
+        # For timings measured outside a span
+        if self.enabled:
+            self.spans.observe(name, seconds)
+
+    def register_collector(self, prefix: str, collect):
+        # collect() returns a stats dict; numeric leaves are exported as gauges
+        self._collectors.append((prefix, collect))
+
+    def render_prometheus(self) -> str:
+        lines = self.spans.render()
+        if self.errors:
+            lines.append("# HELP span_errors_total Traced operations that raised.")
+            lines.append("# TYPE span_errors_total counter")
+            for name, count in sorted(self.errors.items()):
+                lines.append(f'span_errors_total{{span="{name}"}} {count}')
+        for prefix, collect in self._collectors:
+            for key, value in _flatten(collect()):
+                metric = f"{prefix}_{key}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _flatten(stats: dict, prefix: str = ""):
+    for key, value in stats.items():
+        name = f"{prefix}{key}".replace(":", "_").replace("-", "_").replace(".", "_")
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{name}_")
+        elif isinstance(value, bool):
+            yield name, int(value)
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+
+tracer = Tracer()
@@ -0,0 +1,86 @@
+"""
+Train the local risk classifier offline from logged interactions.
+
+Rows come from the Supabase interactions table and/or JSONL files in the same
+shape (for example the write-behind journal). A random holdout is scored
+before the model is written to RISK_MODEL_PATH (default backend/models/risk_model.json),
+where the API loads it at startup.
+
+Usage:
+    python train_risk_model.py --supabase
+    python train_risk_model.py --jsonl data/interactions_journal.jsonl --holdout 0.2
+"""
+import argparse
+import json
+import os
+import random
+
+from dotenv import load_dotenv
+from risk_model import DEFAULT_RISK_MODEL_PATH, evaluate, train
+from rule_extractor import RuleExtractor
+
+load_dotenv()
+
+COLUMNS = "category,age,symptoms,duration,risk_level"
+
+
+def load_jsonl(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_supabase(page_size: int = 1000) -> list[dict]:
+    from supabase_client import SupabaseClient
+
+    client = SupabaseClient().connect()
+    if client is None:
+        raise SystemExit("SUPABASE_URL / SUPABASE_KEY are not set")
+    rows = []
+    while True:
+        page = (
+            client.table("interactions").select(COLUMNS)
+            .range(len(rows), len(rows) + page_size - 1).execute().data
+        )
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jsonl", action="append", default=[], help="JSONL file of interactions rows (repeatable)")
+    parser.add_argument("--supabase", action="store_true", help="read the interactions table")
+    parser.add_argument("--output", default=os.getenv("RISK_MODEL_PATH") or DEFAULT_RISK_MODEL_PATH)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = []
+    for path in args.jsonl:
+        rows.extend(load_jsonl(path))
+    if args.supabase:
+        rows.extend(load_supabase())
+    if not rows:
+        raise SystemExit("No rows: pass --jsonl and/or --supabase")
+
+    random.Random(args.seed).shuffle(rows)
+    split = int(len(rows) * (1 - args.holdout))
+    train_rows, holdout_rows = rows[:split], rows[split:]
+    canonicalize = RuleExtractor.from_file().canonical
+    model = train(train_rows, epochs=args.epochs, seed=args.seed, canonicalize=canonicalize)
+    print(f"Trained on {model.metadata['rows']} rows, {len(model.weights)} features")
+    if holdout_rows:
+        result = evaluate(model, holdout_rows)
+        model.metadata["holdout"] = result
+        print(
+            f"Holdout ({result['rows']} rows): accuracy {result['accuracy']:.1%}, "
+            f"confident on {result['confident_share']:.0%} at {model.min_confidence} "
+            f"with accuracy {result['confident_accuracy']:.1%}"
+        )
+    model.save(args.output)
+    print(f"✅ Model written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
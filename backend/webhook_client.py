@@ -1,43 +1,204 @@
-import httpx
+import asyncio
+import contextvars
+import random
 import os
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
-from typing import TypedDict
+from resilience import CircuitBreaker
+from telemetry import log_event, request_id_var, tracer
+
+if TYPE_CHECKING:
+    import httpx  # imported on first delivery, off the import path
 
 load_dotenv()
 
+CATEGORY_MAP = {
+    "general_symptom": "general",
+    "urgent_symptom": "urgent",
+    "mental_wellbeing_symptom": "mental_wellbeing"
+}
+
 class WebhookClient:
-    def __init__(self):
-        self.webhook_url = os.getenv("WEBHOOK_URL")
-    
-    async def send_webhook(self, state: dict):
+    """Delivers webhook payloads from a background queue over one pooled client.
+
+    send_webhook only enqueues, so the downstream timeout never adds to the
+    chat response. A worker task drains the queue, optionally grouping up to
+    WEBHOOK_BATCH_SIZE payloads into one JSON array POST, and retries
+    transport errors, 429s and 5xx responses with exponential backoff. After
+    repeated failed deliveries a circuit breaker opens and the worker holds
+    queued payloads until it may probe again, instead of burning each one's
+    retries against a receiver that is down.
+    """
+
+    def __init__(
+        self,
+        webhook_url: str | None = None,
+        timeout: float | None = None,
+        max_retries: int | None = None,
+        backoff_base: float | None = None,
+        queue_size: int | None = None,
+        batch_size: int | None = None,
+        batch_window: float | None = None,
+        overflow_policy: str | None = None,
+    ):
+        self.webhook_url = webhook_url if webhook_url is not None else os.getenv("WEBHOOK_URL")
         if not self.webhook_url:
-            print("Warning: Webhook URL not configured. Skipping webhook call.")
-            return
-        
-        # Prepare payload
-        category_map = {
-            "general_symptom": "general",
-            "urgent_symptom": "urgent",
-            "mental_wellbeing_symptom": "mental_wellbeing"
+            # Logged once here rather than on every completed turn
+            log_event("webhook.disabled", reason="WEBHOOK_URL not set")
+        self.timeout = timeout or float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", 10.0))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("WEBHOOK_MAX_RETRIES", 3))
+        self.backoff_base = backoff_base if backoff_base is not None else float(os.getenv("WEBHOOK_BACKOFF_SECONDS", 0.5))
+        self.queue_size = queue_size or int(os.getenv("WEBHOOK_QUEUE_SIZE", 1000))
+        self.batch_size = batch_size or int(os.getenv("WEBHOOK_BATCH_SIZE", 1))
+        self.batch_window = batch_window if batch_window is not None else float(os.getenv("WEBHOOK_BATCH_WINDOW_SECONDS", 0.05))
+        # drop_newest | drop_oldest | block
+        self.overflow_policy = overflow_policy or os.getenv("WEBHOOK_OVERFLOW_POLICY", "drop_newest")
+        if self.overflow_policy not in ("drop_newest", "drop_oldest", "block"):
+            raise ValueError(f"Unknown WEBHOOK_OVERFLOW_POLICY: {self.overflow_policy}")
+        self._client: httpx.AsyncClient | None = None
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self.breaker = CircuitBreaker("webhook")
+        self.metrics = {
+            "enqueued": 0,
+            "delivered": 0,
+            "failed": 0,
+            "retries": 0,
+            "dropped": 0,
+            "batches": 0,
+            "circuit_waits": 0,
         }
-        
-        payload = {
+
+    @staticmethod
+    def build_payload(state: dict) -> dict:
+        return {
             "age": state.get("age"),
-            "symptoms": state.get("symptoms", []),
+            "symptoms": list(state.get("symptoms", [])),
             "duration": state.get("duration"),
             "risk_level": state.get("risk_level"),
-            "category": category_map.get(state.get("category"), "general")
+            "category": CATEGORY_MAP.get(state.get("category"), "general")
         }
-        
+
+    def _ensure_started(self):
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+            )
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if self._worker is None or self._worker.done():
+            # Fresh context: each payload carries its own request id instead
+            self._worker = asyncio.create_task(self._run(), context=contextvars.Context())
+
+    async def send_webhook(self, state: dict):
+        if not self.webhook_url:
+            return
+
+        self._ensure_started()
+        item = (self.build_payload(state), request_id_var.get())
+        if self._queue.full():
+            if self.overflow_policy == "drop_newest":
+                self.metrics["dropped"] += 1
+                return
+            if self.overflow_policy == "drop_oldest":
+                self._queue.get_nowait()
+                self._queue.task_done()
+                self.metrics["dropped"] += 1
+        # With the block policy this waits for the worker to free a slot
+        await self._queue.put(item)
+        self.metrics["enqueued"] += 1
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while not self.breaker.allow():
+                self.metrics["circuit_waits"] += 1
+                await asyncio.sleep(max(self.breaker.retry_after(), 0.01))
+            if self.batch_size > 1:
+                deadline = asyncio.get_running_loop().time() + self.batch_window
+                while len(batch) < self.batch_size:
+                    remaining = deadline - asyncio.get_running_loop().time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+            try:
+                await self._deliver(batch)
+            finally:
+                # No-op after a verdict; frees the probe if delivery was cancelled
+                self.breaker.release()
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _deliver(self, batch: list[tuple]):
+        import httpx
+
+        payloads = [payload for payload, _ in batch]
+        body = payloads if self.batch_size > 1 else payloads[0]
+        request_ids = [request_id for _, request_id in batch]
+        request_id_var.set(request_ids[0] if len(request_ids) == 1 else None)
+        for attempt in range(self.max_retries + 1):
+            try:
+                with tracer.span("webhook.post", attempt=attempt, request_ids=request_ids):
+                    response = await self._client.post(self.webhook_url, json=body)
+                    response.raise_for_status()
+                self.metrics["delivered"] += len(batch)
+                self.metrics["batches"] += 1
+                self.breaker.record_success()
+                return
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                if status != 429 and status < 500:
+                    # The receiver is up and answered; the payload is the problem
+                    self.breaker.record_success()
+                    log_event("webhook.rejected", status=status, request_ids=request_ids)
+                    break
+                error = e
+            except httpx.TransportError as e:
+                error = e
+            except Exception as e:
+                self.breaker.record_failure()
+                log_event("webhook.error", error=str(e), request_ids=request_ids)
+                break
+            if attempt < self.max_retries:
+                self.metrics["retries"] += 1
+                delay = self.backoff_base * (2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
+        else:
+            self.breaker.record_failure()
+            log_event("webhook.failed", attempts=self.max_retries + 1, error=str(error), request_ids=request_ids)
+        self.metrics["failed"] += len(batch)
+
+    async def drain(self, timeout: float | None = None):
+        if self._queue is None:
+            return
+        await asyncio.wait_for(self._queue.join(), timeout)
+
+    async def close(self, timeout: float = 10.0):
+        # Flush queued payloads before tearing down the worker and the pool
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.webhook_url,
-                    json=payload,
-                    timeout=10.0
-                )
-                response.raise_for_status()
-                print(f"Webhook sent successfully: {response.status_code}")
-        except Exception as e:
-            print(f"Error sending webhook: {e}")
+            await self.drain(timeout)
+        except asyncio.TimeoutError:
+            log_event("webhook.drain_timeout", lost=self._queue.qsize())
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "circuit": self.breaker.stats(),
+        }
@@ -7,6 +7,34 @@ const API_URL = import.meta.env.VITE_API_URL ||
     ? 'https://hospital-ai-agent-backend.vercel.app/chat'
     : 'http://localhost:8000/chat')
 
+const STREAM_URL = `${API_URL}/stream`
+
+// Parse Server-Sent Events from a fetch response body, calling onEvent(event, data)
+async function readEventStream(response, onEvent) {
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    let boundary
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      let event = 'message'
+      let data = ''
+      frame.split('\n').forEach(line => {
+        if (line.startsWith('event: ')) event = line.slice(7)
+        else if (line.startsWith('data: ')) data += line.slice(6)
+      })
+      if (data) onEvent(event, JSON.parse(data))
+    }
+  }
+}
+
 // Ultra Modern Healthcare AI Assistant v3.0 - Complete Implementation
 
 class SymptomAnalyzer {
@@ -359,17 +387,66 @@ Hi there! I'm here to help you navigate health concerns with confidence and care
       timestamp: new Date().toLocaleTimeString()
     }])
 
+    const requestBody = JSON.stringify({
+      message: userMessage,
+      session_id: sessionId.current
+    })
+
+    // Update the assistant message that is being streamed in
+    const updateStreamingMessage = (update) => {
+      setMessages(prev => {
+        const last = prev[prev.length - 1]
+        if (!last || !last.streaming) return prev
+        return [...prev.slice(0, -1), { ...last, ...update(last) }]
+      })
+    }
+
     try {
-      // First try to use the backend API
-      const response = await fetch(API_URL, {
+      // First try the streaming endpoint so guidance renders token by token
+      const streamResponse = await fetch(STREAM_URL, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({
-          message: userMessage,
-          session_id: sessionId.current
+        body: requestBody
+      })
+
+      if (streamResponse.ok && streamResponse.body) {
+        setMessages(prev => [...prev, {
+          role: 'assistant',
+          content: '',
+          riskLevel: null,
+          streaming: true,
+          timestamp: new Date().toLocaleTimeString()
+        }])
+
+        await readEventStream(streamResponse, (event, data) => {
+          if (event === 'risk_level') {
+            updateStreamingMessage(() => ({ riskLevel: data.risk_level || 'low' }))
+          } else if (event === 'token') {
+            updateStreamingMessage(last => ({ content: last.content + data.text }))
+          } else if (event === 'done') {
+            updateStreamingMessage(() => ({
+              content: data.response || 'Thank you for sharing your symptoms.',
+              riskLevel: data.risk_level || 'low',
+              streaming: false
+            }))
+          } else if (event === 'error') {
+            throw new Error(data.detail || 'Streaming failed')
+          }
         })
+        // Stream closed without a done event: keep whatever arrived
+        updateStreamingMessage(() => ({ streaming: false }))
+        return
+      }
+
+      // Older backends without /chat/stream: use the JSON endpoint
+      const response = await fetch(API_URL, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: requestBody
       })
 
       if (response.ok) {
@@ -384,6 +461,12 @@ Hi there! I'm here to help you navigate health concerns with confidence and care
         throw new Error('Backend not available')
       }
     } catch (error) {
+      // Drop a partially streamed message before falling back
+      setMessages(prev => {
+        const last = prev[prev.length - 1]
+        return last && last.streaming ? prev.slice(0, -1) : prev
+      })
+
       console.error('Backend error, using local analysis:', error)
 
       // Use local symptom analyzer as fallback
@@ -426,7 +509,11 @@ Hi there! I'm here to help you navigate health concerns with confidence and care
         {messages.map((msg, idx) => (
           <div key={idx} className={`message ${msg.role}`}>
             <div className="message-content">
-              {msg.content.split('\n').map((line, lineIdx) => (
+              {msg.streaming && !msg.content ? (
+                <span className="typing-indicator">
+                  Analyzing<span className="dots">...</span>
+                </span>
+              ) : msg.content.split('\n').map((line, lineIdx) => (
                 <span key={lineIdx}>
                   {line}
                   {lineIdx < msg.content.split('\n').length - 1 && <br />}
@@ -448,7 +535,7 @@ Hi there! I'm here to help you navigate health concerns with confidence and care
             </div>
           </div>
         ))}
-        {loading && (
+        {loading && !messages[messages.length - 1]?.streaming && (
           <div className="message assistant">
             <div className="message-content">
               <span className="typing-indicator">